@@ -1,6 +1,7 @@
 from collections import defaultdict
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from json import dumps, loads
 from logging import getLogger
 from math import sqrt
@@ -8,11 +9,13 @@ from os import listdir, walk, mkdir, remove
 from os.path import dirname, abspath, join as path_join, exists
 from warnings import warn
 import inquirer
+import numpy as np
 import pandas as pd
 import requests
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
+from nhl_model.archive import OLD_DATA_DIR, findArchives
 from nhl_model.dataset import (
     pullDatasetNewAPI,
     BASE_SAVE_DIR,
@@ -23,6 +26,8 @@ from nhl_model.features import (
     findFeaturesMRMR,
     findFeaturesF1Scores
 )
+from nhl_model.pipeline import readJsonArtifact, runCachedStage, runDataFrameStage, runJsonStage
+from nhl_model.workbook import readDataset
 
 
 # Common Keys used throughout this file
@@ -36,7 +41,10 @@ _FEATURE_SELECTION_KEY = "featureSelection"
 
 CONFIG_FILE = path_join(*[BASE_SAVE_DIR, "nhl_model_config.json"])
 FEATURE_FILE = path_join(*[BASE_SAVE_DIR, "features.json"])
-OLD_DATA_DIR = path_join(*[dirname(abspath(__file__)), "support", "data", "nhl_data"])
+MODEL_FILE = path_join(*[BASE_SAVE_DIR, "nhl_model.keras"])
+
+# Parameters (other than the algorithm) that alter the result of feature selection
+_FEATURE_PARAM_KEYS = ("K", "precision")
 
 logger = getLogger("nhl_neural_net")
 
@@ -61,10 +69,16 @@ def findFiles(version, startYear, endYear, playoffs=False):
         # NOTE: if the user wants to use the original version of the API, the
         # data must already exist. The API can no longer be reached. For this particular
         # task, the data is expected to exist in the `directory` location above.
+        # Seasons that have been packed into an archive (see `archive.py`) are read
+        # from the archive rather than the individual game files.
+        archives = findArchives(startYear, endYear)
+        validFiles.extend(archives.values())
+
         for root, _, files in walk(OLD_DATA_DIR):
             spDir = root.split("/")
             try:
-                if startYear <= int(spDir[len(spDir)-1]) <= endYear:
+                year = int(spDir[len(spDir)-1])
+                if startYear <= year <= endYear and year not in archives:
                     validFiles.extend([path_join(root, f) for f in files])
             except:
                 pass
@@ -144,8 +158,8 @@ def parseAnnArguments(config):  # pylint: disable=too-many-branches
 
     if loadModel == "yes":
 
-        if exists(path_join(*[BASE_SAVE_DIR, "nhl_model.keras"])):
-            outputs["savedModel"] = path_join(*[BASE_SAVE_DIR, "nhl_model.keras"])
+        if exists(MODEL_FILE):
+            outputs["savedModel"] = MODEL_FILE
         else:
             # logger.debug("failed to find model, asking to create a new one")
             # allow the user to create the model
@@ -380,55 +394,26 @@ def correctData(df, droppable=[]):
     """Alter the dataframe to remove categorical data. When item(s) are provided
     via the `droppable` argument, those columns will be removed from the dataframe too.
     """
-    df.drop(columns=df.columns[0], axis=1, inplace=True)
-
     # report the output values. This can be used as a prediction
     # value or a training data outcome
     output = df["winner"]
 
-    labelsToRemove = ["atTeamname", "atTricode", "htTeamname", "htTricode"] + droppable
+    # Drop the index column (first column), the output and the categorical data in a
+    # single pass, leaving the only data left as the dataset to train.
+    labelsToRemove = [df.columns[0], "winner"] + \
+        ["atTeamname", "atTricode", "htTeamname", "htTricode"] + droppable
+    df.drop(columns=labelsToRemove, inplace=True)
 
-    # Drop the output from the Dataframe, leaving the only data left as
-    # the dataset to train.
-    df.drop(labels=["winner"], axis=1,inplace=True)
-    df.drop(labels=labelsToRemove, axis=1, inplace=True)
-    df.fillna(0, inplace=True)
+    # only fill the columns that contain missing values
+    missingColumns = df.columns[df.isna().any()]
+    if len(missingColumns) > 0:
+        df[missingColumns] = df[missingColumns].fillna(0)
 
     return df, output
 
 
-def createModel(analysisFile, featureSelection, **kwargs):
-    """Create the model that will be used for predicting future games. If the user has 
-    selected this function then a new model is created. 
-
-    :param analysisFile: Filename of the input to the model. This can be any number of records.
-    These records are expected to be created using the functions in `dataset.py`.
-
-    :param featureSelection: Algorithm used for selecting the features used during 
-    model training as well as output prediction.
-
-    :kwargs:
-    - numEpochs - number of epochs to be run during model training
-    - batchSize - batch size input for model training
-    - other - please see the feature selection algorithms in `features.py` for more information
-    as inputs to the algorithms.
-    """
-    logger.debug("creating new model")
-    trainDF = pd.read_excel(analysisFile)
-
-    # filter out the output/winner and a few categorical columns
-    trainDF, trainOutput = correctData(trainDF, droppable=["atGoals", "htGoals", "atTeamid", "htTeamid"])
-
-    # use the default values for feature selection (when applicable).
-    logger.debug(f"feature selection algorithm: {featureSelection}")
-    features = FeatureSelectionData[featureSelection](trainDF, trainOutput, **kwargs)
-    logger.debug(f"selected features: {features}")
-
-    with open(FEATURE_FILE, "w") as jsonFile:
-        jsonFile.write(dumps({"features": features}, indent=2))
-
-    # only keep the features that we selected
-    trainDF = trainDF[features]
+def _trainModel(trainDF, trainOutput, numEpochs, batchSize):
+    """Create, train and save the model using the training data (selected features only)."""
     _, numLabels = trainDF.shape
 
     model = Sequential()
@@ -454,22 +439,116 @@ def createModel(analysisFile, featureSelection, **kwargs):
     model.compile(loss='binary_crossentropy', optimizer='adam', metrics=['accuracy'])
 
     # tensorflow requires data in a specific format. convert this the expected format
-    dfTensor = tf.convert_to_tensor(trainDF.to_numpy())
-    outputTensor = tf.convert_to_tensor(trainOutput.to_numpy())
+    dfTensor = tf.convert_to_tensor(trainDF.to_numpy(dtype=np.float32))
+    outputTensor = tf.convert_to_tensor(trainOutput.to_numpy(dtype=np.float32))
 
     logger.debug("fitting and training model")
-    model.fit(dfTensor, outputTensor, epochs=kwargs[_EPOCHS_KEY],
-              batch_size=kwargs[_BATCH_SIZE_KEY])
+    model.fit(dfTensor, outputTensor, epochs=numEpochs, batch_size=batchSize)
     _, accuracy = model.evaluate(dfTensor,  outputTensor)
     logger.debug(f"model accuracy: {accuracy}")
 
     # attempt to save the model
     logger.debug(f"saving model as nhl_model, this will override the current model")
-    model.save(path_join(*[BASE_SAVE_DIR, "nhl_model.keras"]))
+    model.save(MODEL_FILE)
 
     return model
 
 
+@lru_cache(maxsize=1)
+def _readTrainingData(analysisFile):
+    """Read the training data from the analysis file, the data is shared by the feature
+    selection and training stages.
+
+    :return: Tuple of the training data and the output (winner) of each record.
+    """
+    trainDF = readDataset(analysisFile)
+    # filter out the output/winner and a few categorical columns
+    return correctData(trainDF, droppable=["atGoals", "htGoals", "atTeamid", "htTeamid"])
+
+
+def _readFeatures():
+    """Read the selected features from the features file (see `createModel`)."""
+    features = readJsonArtifact(FEATURE_FILE, "features", [])
+    if not features:
+        logger.critical(f"failed to access features in {FEATURE_FILE}")
+    return features
+
+
+def createModel(analysisFile, featureSelection, force=False, **kwargs):
+    """Create the model that will be used for predicting future games. If the user has 
+    selected this function then a new model is created. 
+
+    Feature selection and training are stages of the pipeline (see `pipeline.py`). When
+    the analysis file and parameters have not changed since the last execution, the
+    saved features and/or model are used instead.
+
+    :param analysisFile: Filename of the input to the model. This can be any number of records.
+    These records are expected to be created using the functions in `dataset.py`.
+
+    :param featureSelection: Algorithm used for selecting the features used during 
+    model training as well as output prediction.
+
+    :param force: When true, the features are selected and the model is trained even when
+    the inputs have not changed.
+
+    :kwargs:
+    - numEpochs - number of epochs to be run during model training
+    - batchSize - batch size input for model training
+    - other - please see the feature selection algorithms in `features.py` for more information
+    as inputs to the algorithms.
+    """
+    def _selectFeatures():
+        trainDF, trainOutput = _readTrainingData(analysisFile)
+
+        # use the default values for feature selection (when applicable).
+        logger.debug(f"feature selection algorithm: {featureSelection}")
+        return FeatureSelectionData[featureSelection](trainDF, trainOutput, **kwargs)
+
+    def _trainSelectedModel():
+        logger.debug("creating new model")
+        trainDF, trainOutput = _readTrainingData(analysisFile)
+
+        # only keep the features that we selected
+        return _trainModel(
+            trainDF[features], trainOutput, kwargs[_EPOCHS_KEY], kwargs[_BATCH_SIZE_KEY]
+        )
+
+    featureParams = {"featureSelection": featureSelection}
+    featureParams.update({x: kwargs.get(x) for x in _FEATURE_PARAM_KEYS})
+    try:
+        features = runJsonStage(
+            "features", _selectFeatures, "features", FEATURE_FILE,
+            inputs=[analysisFile], params=featureParams, force=force
+        )
+        logger.debug(f"selected features: {features}")
+
+        return runCachedStage(
+            "model", _trainSelectedModel, lambda: tf.keras.models.load_model(MODEL_FILE),
+            inputs=[analysisFile, FEATURE_FILE],
+            params={_EPOCHS_KEY: kwargs[_EPOCHS_KEY], _BATCH_SIZE_KEY: kwargs[_BATCH_SIZE_KEY]},
+            artifacts=[MODEL_FILE], force=force
+        )
+    finally:
+        # the training data is only shared by the stages of this execution
+        _readTrainingData.cache_clear()
+
+
+def _prepareComparisonData(predictFile, comparisonFunction, createFunc):
+    """Create the averages (or head to head) data from the prediction file. The prepared
+    data is a stage of the pipeline (see `pipeline.py`) and it is saved, so the data is
+    only recreated when the prediction file changes.
+    """
+    preparedFile = path_join(*[BASE_SAVE_DIR, f"prepared-{comparisonFunction.name}.pkl"])
+
+    # the file to compare predicted vs actual data to will always be present
+    # the model has been loaded/created
+    return runDataFrameStage(
+        f"prepared:{comparisonFunction.name}",
+        lambda: createFunc(correctData(readDataset(predictFile))[0]), preparedFile,
+        inputs=[predictFile], params={_COMPARE_FUNC_KEY: comparisonFunction.name}
+    )
+
+
 def prepareDataForPredictionsByDate(predictFile, comparisonFunction, day, month, year):
     """Prepare the data for predicting the outcomes of the games that will be played today.
     
@@ -504,13 +583,8 @@ def prepareDataForPredictions(predictFile, comparisonFunction, gameData):
 
     :return: Dataframe containing records for the home and away teams that will play today.
     """
-    # the file to compare predicted vs actual data to will always be present
-    # the model has been loaded/created
-    predictDF = pd.read_excel(predictFile)
-    predictDF, _ = correctData(predictDF)
-
     if comparisonFunction == CompareFunction.AVERAGES:
-        dataPointDF = _createAverages(predictDF)
+        dataPointDF = _prepareComparisonData(predictFile, comparisonFunction, _createAverages)
 
         futrData = []
         for game in gameData["games"]:
@@ -532,7 +606,7 @@ def prepareDataForPredictions(predictFile, comparisonFunction, gameData):
         return pd.concat(futrData)
 
     if comparisonFunction == CompareFunction.DIRECT:
-        dataPointDF = _createHeadToHead(predictDF)
+        dataPointDF = _prepareComparisonData(predictFile, comparisonFunction, _createHeadToHead)
 
         futrData = []
         for game in gameData["games"]:
@@ -633,6 +707,17 @@ def _setPredictions(todaysData):
 
 
 #pylint: disable=too-many-positional-arguments
+def _predictOutcomes(model, preparedDF, features):
+    """Predict the outcome of each record using only the selected features.
+
+    :return: Tuple of the model output (home win probability) and the predicted outcome
+    (1 = home win) of each record.
+    """
+    # ensure that only the selected feature found above are present in the dataframe
+    predicted = model.predict(preparedDF[features].to_numpy(dtype=np.float32))
+    return predicted, [int(round(x[0], 2)) for x in predicted]
+
+
 def _execAnnCommon(model, predictionFile, comparisonFunction, day, month, year):
     """Execute the model using the values used for prediction.
 
@@ -645,18 +730,8 @@ def _execAnnCommon(model, predictionFile, comparisonFunction, day, month, year):
     :param month: Month of the year for prediction.
     :param year: Year used for predicting games on a specific date.
     """
-    if not exists(FEATURE_FILE):
-        logger.critical(f"failed to find features file {FEATURE_FILE}")
-        return
-
-    features = []
-    with open(FEATURE_FILE, 'rb') as jsonFile:
-        jsonData = loads(jsonFile.read())
-
-        features = jsonData.get("features", [])
-
+    features = _readFeatures()
     if not features:
-        logger.critical("failed to access features")
         return
 
     preparedDF = prepareDataForPredictionsByDate(
@@ -675,38 +750,19 @@ def _execAnnCommon(model, predictionFile, comparisonFunction, day, month, year):
         logger.debug("creating future.xlsx")
         preparedDF.to_excel(path_join(*[BASE_SAVE_DIR, "future.xlsx"]))
 
-    # ensure that only the selected feature found above are present in the dataframe
-    preparedDF = preparedDF[features]
-
-    predicted = model.predict(preparedDF)
-    predictedOutcomes = [int(round(x[0], 2)) for x in predicted]
+    predicted, predictedOutcomes = _predictOutcomes(model, preparedDF, features)
 
     # extract metadata for comparison
-    teams = _getTeamNames()
+    teams = {x["id"]: x["fullName"] for x in _getTeamNames()}
     todaysGameData = findGamesByDate(day, month, year)
     outputForDF = []
 
-    print(dumps(todaysGameData, indent=2))
+    logger.debug(dumps(todaysGameData, indent=2))
 
     for index, game in enumerate(todaysGameData["games"]):
-        print("homeTeam data")
-        for x in teams:
-            if x['id'] == game['homeTeam']['id']:
-                print(x['fullName'])
-        print("awayTeam data")
-        for x in teams:
-            if x['id'] == game['awayTeam']['id']:
-                print(x['fullName'])
-        homeTeam = [x["fullName"] for x in teams if x["id"] == game['homeTeam']['id']]
-        if len(homeTeam) > 0:
-            homeTeam = homeTeam[0]
-        else:
-            continue
-
-        awayTeam = [x["fullName"] for x in teams if x["id"] == game['awayTeam']['id']]
-        if len(awayTeam) > 0:
-            awayTeam = awayTeam[0]
-        else:
+        homeTeam = teams.get(game['homeTeam']['id'])
+        awayTeam = teams.get(game['awayTeam']['id'])
+        if homeTeam is None or awayTeam is None:
             continue
 
         predictedWinner = homeTeam if predictedOutcomes[index] == 1 else awayTeam
@@ -716,6 +772,9 @@ def _execAnnCommon(model, predictionFile, comparisonFunction, day, month, year):
             "gameDate": datetime(year, month, day).strftime("%Y-%m-%d"),
             "datePredicted": datetime.now().strftime("%Y-%m-%d"),
             "predictedWinner": predictedWinner,
+            # probability of a home win, used to evaluate the calibration of the model
+            # (see `evaluation.annForecasts`)
+            "homeWinProbability": round(float(predicted[index][0]), 4),
             # Leave the 'correct' field as None until the games are played and
             # the user has elected to set the value using analyze functionality
             "correct": None,
@@ -743,18 +802,8 @@ def _execAnnPlayoffs(model, predictionFile, comparisonFunction, playoffMetadata)
     :param playoffMetadata: Group of games consisting of the team that will play the best of 7 
     game series.
     """
-    if not exists(FEATURE_FILE):
-        logger.critical(f"failed to find features file {FEATURE_FILE}")
-        return
-
-    features = []
-    with open(FEATURE_FILE, 'rb') as jsonFile:
-        jsonData = loads(jsonFile.read())
-
-        features = jsonData.get("features", [])
-
+    features = _readFeatures()
     if not features:
-        logger.critical("failed to access features")
         return
 
     playoffData = {}
@@ -770,11 +819,7 @@ def _execAnnPlayoffs(model, predictionFile, comparisonFunction, playoffMetadata)
             logger.error("failed to prepare data for predictions")
             return
 
-        # ensure that only the selected feature found above are present in the dataframe
-        preparedDF = preparedDF[features]
-
-        predicted = model.predict(preparedDF)
-        predictedOutcomes = [int(round(x[0], 2)) for x in predicted]
+        _, predictedOutcomes = _predictOutcomes(model, preparedDF, features)
 
         # The key is the triCode for the team. When one team has a
         # value of 4 then the series is over and a winner is predicted.
@@ -783,17 +828,13 @@ def _execAnnPlayoffs(model, predictionFile, comparisonFunction, playoffMetadata)
         for index, game in enumerate(playoffMetadata[letter]["games"]):
             homeTeam = game["homeTeam"]["triCode"]
             awayTeam = game["awayTeam"]["triCode"]
-            if homeTeam not in wins:
-                wins[homeTeam] = 0
-            if awayTeam not in wins:
-                wins[awayTeam] = 0
+            wins.setdefault(homeTeam, 0)
+            wins.setdefault(awayTeam, 0)
 
             predictedWinner = homeTeam if predictedOutcomes[index] == 1 else awayTeam
             wins[predictedWinner] += 1
 
             if max(wins.values()) == 4:
-                # otherTeam = awayTeam if homeTeam == predictedWinner else homeTeam
-
                 playoffData[letter] = wins
                 break
 
@@ -810,8 +851,10 @@ def _createArtifactDir():
         mkdir(BASE_SAVE_DIR)
 
 
-def execAnn(override=False, playoffData=None):
-    '''main execution point for the artificial neural network.'''
+def execAnn(override=False, playoffData=None, force=False):
+    '''main execution point for the artificial neural network. When `force` is true,
+    the features are selected and the model is trained even when nothing changed.
+    '''
     _createArtifactDir()
 
     inputs = _loadConfig(override=override)
@@ -823,7 +866,7 @@ def execAnn(override=False, playoffData=None):
 
     model = None
     if _ANALYSIS_FILE_KEY in outputs:
-        model = createModel(**outputs)
+        model = createModel(force=force, **outputs)
     elif "savedModel" in outputs:
         logger.debug(f"loading saved model from {outputs['savedModel']}")
         model = tf.keras.models.load_model(outputs["savedModel"])
@@ -859,12 +902,11 @@ def execAnnSpecificDate(day, month, year):
     outputs = _askForCommonData(inputs)
 
     # load the model
-    expectedModelPath = path_join(*[BASE_SAVE_DIR, "nhl_model.keras"])
-    if not exists(expectedModelPath):
-        logger.critical(f"failed to find model {expectedModelPath}")
+    if not exists(MODEL_FILE):
+        logger.critical(f"failed to find model {MODEL_FILE}")
         return
 
-    model = tf.keras.models.load_model(expectedModelPath)
+    model = tf.keras.models.load_model(MODEL_FILE)
 
     compareFunc = [x for x in CompareFunction if x.name == outputs[_COMPARE_FUNC_KEY]][0]
 
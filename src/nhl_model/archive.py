@@ -0,0 +1,187 @@
+"""The original version of the API stored the data for each game in its own file. A
+season contains over a thousand of these files, and all of history contains tens of
+thousands. The archive consolidates all game files for a season into a single file.
+
+Archive format (all integers are little endian):
+- magic value `NHLPACK1`
+- season (int32)
+- compressed (zlib) json records, one per game
+- index table, one entry per game: gameId (int64), offset (uint64), length (uint32)
+- footer: index table offset (uint64), number of records (uint32)
+"""
+from json import loads
+from logging import getLogger
+from os import listdir, makedirs, replace, walk
+from os.path import abspath, basename, dirname, exists, join as path_join
+from struct import calcsize, pack, unpack, iter_unpack
+from zlib import compress, decompress
+
+
+logger = getLogger("nhl_neural_net")
+
+
+OLD_DATA_DIR = path_join(*[dirname(abspath(__file__)), "support", "data", "nhl_data"])
+OLD_ARCHIVE_DIR = path_join(*[dirname(abspath(__file__)), "support", "data", "nhl_archive"])
+
+ARCHIVE_EXTENSION = ".nhlpack"
+
+_MAGIC = b"NHLPACK1"
+_HEADER_FORMAT = "<i"
+_INDEX_FORMAT = "<qQI"
+_FOOTER_FORMAT = "<QI"
+
+
+def archiveFilename(year, archiveDir=OLD_ARCHIVE_DIR):
+    '''Get the name of the archive file for the season.'''
+    return path_join(archiveDir, f"{year}{ARCHIVE_EXTENSION}")
+
+
+def isArchive(filename):
+    '''Returns true when the file is a season archive.'''
+    return filename.endswith(ARCHIVE_EXTENSION)
+
+
+def archiveYear(filename):
+    '''Get the season (year) from the name of the archive file.'''
+    return int(basename(filename)[:-len(ARCHIVE_EXTENSION)])
+
+
+class SeasonArchive:
+    '''Read the games from a season archive. The index table is read when the
+    archive is opened, so each game is a single seek and read.
+
+    with SeasonArchive(filename) as archive:
+        for gameId, jsonData in archive:
+            ...
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")  # pylint: disable=consider-using-with
+
+        if self._file.read(len(_MAGIC)) != _MAGIC:
+            self.close()
+            raise ValueError(f"{filename} is not a valid season archive")
+
+        self.year = unpack(_HEADER_FORMAT, self._file.read(calcsize(_HEADER_FORMAT)))[0]
+
+        self._file.seek(-calcsize(_FOOTER_FORMAT), 2)
+        indexOffset, numRecords = unpack(_FOOTER_FORMAT, self._file.read(calcsize(_FOOTER_FORMAT)))
+
+        self._file.seek(indexOffset)
+        indexData = self._file.read(numRecords * calcsize(_INDEX_FORMAT))
+        self.index = {gameId: (offset, length) for gameId, offset, length in
+                      iter_unpack(_INDEX_FORMAT, indexData)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        '''Iterate over the gameId and json data for all games in gameId order.'''
+        for gameId in self.gameIds:
+            yield gameId, self.read(gameId)
+
+    @property
+    def gameIds(self):
+        '''Sorted list of all game ids in the archive.'''
+        return sorted(self.index.keys())
+
+    def read(self, gameId):
+        '''Read the json data for a single game.'''
+        offset, length = self.index[gameId]
+        self._file.seek(offset)
+        return loads(decompress(self._file.read(length)))
+
+    def close(self):
+        '''Close the archive file.'''
+        if not self._file.closed:
+            self._file.close()
+
+
+def packSeason(year, files, filename):
+    '''Pack the game files for a single season into an archive. The archive is
+    written to a temporary file first and moved into place once complete.
+
+    :param year: Season (year) of the games.
+    :param files: List of the game files (old version of the API).
+    :param filename: Name of the archive file.
+    :return: Number of games in the archive.
+    '''
+    tmpFilename = f"{filename}.tmp"
+
+    index = []
+    with open(tmpFilename, "wb") as archiveFile:
+        archiveFile.write(_MAGIC)
+        archiveFile.write(pack(_HEADER_FORMAT, year))
+
+        for fname in sorted(files):
+            with open(fname, "rb") as jsonFile:
+                rawData = jsonFile.read()
+
+            jsonData = loads(rawData)
+            if not jsonData:
+                continue
+
+            record = compress(rawData)
+            index.append((jsonData["gameData"]["game"]["pk"], archiveFile.tell(), len(record)))
+            archiveFile.write(record)
+
+        indexOffset = archiveFile.tell()
+        for entry in sorted(index):
+            archiveFile.write(pack(_INDEX_FORMAT, *entry))
+        archiveFile.write(pack(_FOOTER_FORMAT, indexOffset, len(index)))
+
+    replace(tmpFilename, filename)
+    return len(index)
+
+
+def packOldData(dataDir=OLD_DATA_DIR, archiveDir=OLD_ARCHIVE_DIR, startYear=None, endYear=None):
+    '''Pack all of the game files (old version of the API) into one archive per season.
+    The data is expected to be located in season (year) subdirectories of `dataDir`.
+
+    :return: List of archive files that were created.
+    '''
+    if not exists(archiveDir):
+        makedirs(archiveDir)
+
+    archives = []
+    for root, _, files in walk(dataDir):
+        try:
+            year = int(basename(root))
+        except ValueError:
+            continue
+
+        if (startYear is not None and year < startYear) or \
+            (endYear is not None and year > endYear):
+            continue
+
+        filename = archiveFilename(year, archiveDir)
+        numGames = packSeason(year, [path_join(root, f) for f in files], filename)
+        logger.debug(f"packed {numGames} games into {filename}")
+        archives.append(filename)
+
+    return archives
+
+
+def findArchives(startYear, endYear, archiveDir=OLD_ARCHIVE_DIR):
+    '''Find the season archives for all seasons from the start to end year (inclusive).
+
+    :return: Dictionary where the keys are the seasons and the values are the archive files.
+    '''
+    if not exists(archiveDir):
+        return {}
+
+    archives = {}
+    for fname in listdir(archiveDir):
+        if isArchive(fname):
+            year = archiveYear(fname)
+            if startYear <= year <= endYear:
+                archives[year] = path_join(archiveDir, fname)
+
+    return archives
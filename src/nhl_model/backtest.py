@@ -0,0 +1,161 @@
+"""Evaluate the Poisson model over a range of (past) seasons. Each season is evaluated
+in its own process, and the results are saved as a columnar table with one record per
+season.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from logging import getLogger
+from os import makedirs
+from os.path import dirname
+from time import perf_counter
+import numpy as np
+from nhl_model.dataset import newAPIFile
+from nhl_model.poisson import parseSeasonEvents
+from nhl_model.schedules import loadScheduleArchive
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Columns (and types) of the backtest table
+BACKTEST_COLUMNS = {
+    "season": np.int16,
+    "games": np.int32,
+    "correct": np.int32,
+    "accuracy": np.float64,
+    "meanPredictedHomeGoals": np.float64,
+    "meanActualHomeGoals": np.float64,
+    "meanPredictedAwayGoals": np.float64,
+    "meanActualAwayGoals": np.float64,
+}
+
+
+def backtestSeason(year, halfLife=None, window=None, adjusted=False):
+    '''Evaluate the Poisson model for a single season.
+
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
+    :return: Dictionary containing the `BACKTEST_COLUMNS` for the season. None is
+    returned when the season (or previous season) could not be found.
+    '''
+    homeTeamEvents, _ = parseSeasonEvents(year, halfLife, window, adjusted)
+    if homeTeamEvents is None:
+        return None
+
+    games = [x for events in homeTeamEvents.values() for x in events]
+    if not games:
+        return None
+
+    predictedHome = np.array([x.homeTeamGoalsPrediction for x in games], dtype=float)
+    actualHome = np.array([x.homeTeamGoalsActual for x in games], dtype=float)
+    predictedAway = np.array([x.awayTeamGoalsPrediction for x in games], dtype=float)
+    actualAway = np.array([x.awayTeamGoalsActual for x in games], dtype=float)
+    correct = sum(1 for x in games if x.winnerPredicted)
+
+    return {
+        "season": year,
+        "games": len(games),
+        "correct": correct,
+        "accuracy": round(float(correct) / float(len(games)) * 100.0, 2),
+        "meanPredictedHomeGoals": float(predictedHome.mean()),
+        "meanActualHomeGoals": float(actualHome.mean()),
+        "meanPredictedAwayGoals": float(predictedAway.mean()),
+        "meanActualAwayGoals": float(actualAway.mean()),
+    }
+
+
+# pylint: disable-next=too-many-positional-arguments
+def runBacktest(startYear=None, endYear=None, workers=None, halfLife=None, window=None,
+                adjusted=False):
+    '''Evaluate the Poisson model for all seasons from the start to end year (inclusive)
+    using a pool of processes.
+
+    :param startYear: First season. Defaults to the second season in the schedule
+    archive (the first season does not have a previous season).
+    :param endYear: Last season. Defaults to the last season in the schedule archive.
+    :param workers: Maximum number of worker processes.
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
+    :return: Dictionary where the keys are the `BACKTEST_COLUMNS` and the values are
+    arrays with a value per season, as well as the total (wall) time in seconds.
+    '''
+    startTime = perf_counter()
+
+    if None in (startYear, endYear):
+        archive = loadScheduleArchive()
+        seasons = archive.seasons if archive is not None else []
+        if not seasons:
+            logger.error("failed to find the seasons in the schedule archive")
+            seasons = [0]
+        startYear = seasons[0] + 1 if startYear is None else startYear
+        endYear = seasons[-1] if endYear is None else endYear
+
+    years = list(range(min(startYear, endYear), max(startYear, endYear) + 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        records = [x for x in executor.map(
+            partial(backtestSeason, halfLife=halfLife, window=window, adjusted=adjusted), years
+        ) if x is not None]
+
+    missing = len(years) - len(records)
+    if missing:
+        logger.warning(f"skipped {missing} season(s) without a schedule")
+
+    table = {
+        name: np.array([x[name] for x in records], dtype=dtype)
+        for name, dtype in BACKTEST_COLUMNS.items()
+    }
+
+    return table, perf_counter() - startTime
+
+
+def saveBacktest(table, filename):
+    '''Save the backtest table to a (numpy) columnar file.'''
+    if dirname(filename):
+        makedirs(dirname(filename), exist_ok=True)
+    np.savez(filename, **table)
+    logger.debug(f"saved backtest for {len(table['season'])} season(s) to {filename}")
+
+
+def loadBacktest(filename):
+    '''Load the backtest table saved with `saveBacktest`.'''
+    with np.load(filename) as data:
+        return {name: data[name] for name in BACKTEST_COLUMNS}
+
+
+def printBacktest(table, wallTime):
+    '''Print the backtest table and totals.'''
+    print(f"{'season':>6} {'games':>6} {'accuracy':>9} "
+          f"{'home pred':>10} {'home act':>9} {'away pred':>10} {'away act':>9}")
+    for index, season in enumerate(table["season"].tolist()):
+        print(
+            f"{season:>6} {table['games'][index]:>6} {table['accuracy'][index]:>9.2f} "
+            f"{table['meanPredictedHomeGoals'][index]:>10.3f} "
+            f"{table['meanActualHomeGoals'][index]:>9.3f} "
+            f"{table['meanPredictedAwayGoals'][index]:>10.3f} "
+            f"{table['meanActualAwayGoals'][index]:>9.3f}"
+        )
+
+    totalGames = int(table["games"].sum())
+    totalCorrect = int(table["correct"].sum())
+    accuracy = round(float(totalCorrect) / float(totalGames) * 100.0, 2) if totalGames else 0.0
+    print(f"Correct Predictions {totalCorrect}/{totalGames} ({accuracy}%)")
+    print(f"Evaluated {len(table['season'])} season(s) in {wallTime:.2f} seconds")
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def execBacktest(startYear=None, endYear=None, workers=None, halfLife=None, window=None,
+                 adjusted=False, output=None):
+    '''Evaluate the Poisson model for the seasons (see `runBacktest`), print the table
+    and save it to the output file, Backtest-<start>-<end>.npz in the save directory by
+    default.
+    '''
+    table, wallTime = runBacktest(
+        startYear, endYear, workers=workers, halfLife=halfLife, window=window, adjusted=adjusted
+    )
+    printBacktest(table, wallTime)
+    seasons = table["season"].tolist()
+    saveBacktest(table, output or newAPIFile(
+        f"Backtest-{min(seasons, default=0)}-{max(seasons, default=0)}.npz"
+    ))
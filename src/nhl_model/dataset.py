@@ -1,14 +1,28 @@
 from json import loads, dumps
 from logging import getLogger
 from os import mkdir, remove
-from os.path import exists, join as path_join
+from os.path import exists, join as path_join, splitext
 from warnings import warn
 from datetime import datetime
 from requests import get
 import pandas as pd
 from nhl_core.endpoints import MAX_GAME_NUMBER
+from nhl_model.archive import SeasonArchive, archiveYear, isArchive
 from nhl_model.enums import Version
-from nhl_model.poisson import parseSeasonEvents
+from nhl_model.players import PlayerStatStore, PlayerStoreWriter, parsePlayerGamesNew
+from nhl_model.poisson import clearSeasonCache, parseSeasonEvents
+from nhl_model.schedules import (
+    SEASON_SCHEDULE_DIR,
+    appendSeasonSchedule,
+    loadScheduleArchive,
+)
+from nhl_model.warehouse import (
+    createGameRecords,
+    insertRecords,
+    queryGameIds,
+    querySeasonSchedule,
+)
+from nhl_model.workbook import prepareDataset, writeDatasetChunked
 
 # Each of the playoff rounds consists of a maximum of 7 games
 MAX_PLAYOFF_GAMES_PER_SEQUENCE = 7
@@ -20,6 +34,7 @@ BASE_SAVE_DIR = "/tmp/nhl_model"
 
 newAPIFile = lambda filename: path_join(*([BASE_SAVE_DIR, filename]))
 RecoveryFilename = path_join(*[BASE_SAVE_DIR, "recovery.json"])
+WAREHOUSE_FILE = path_join(*[BASE_SAVE_DIR, "nhl_warehouse.db"])
 
 
 logger = getLogger("nhl_neural_net")
@@ -436,6 +451,75 @@ def parseBoxScoreNewSplit(boxscore):
     return homeTeamData, awayTeamData
 
 
+def parseWarehouseRecordsNew(boxscore):
+    """Parse the box score (new version) into the records stored in the warehouse.
+
+    :return: game, teams, team games and player games records. None is returned when
+    the box score is not a completed game.
+    """
+    if any(x not in boxscore for x in ("id", "homeTeam", "awayTeam")):
+        return None
+    if boxscore.get("gameState", "OFF") not in ("OFF", "FINAL"):
+        return None
+
+    return createGameRecords(
+        boxscore,
+        _parseInternalBoxScoreTeamsNew(boxscore["homeTeam"]),
+        _parseInternalBoxScoreTeamsNew(boxscore["awayTeam"]),
+        parsePlayerGamesNew(boxscore),
+    )
+
+
+def ingestBoxScores(boxScores, filename=None):
+    """Add the box scores (new version) to the warehouse. Games that already
+    exist in the warehouse are skipped.
+
+    :param boxScores: Dictionary of box scores, see `pullDatasetNewAPI`.
+    :param filename: Filename of the warehouse, `WAREHOUSE_FILE` by default.
+    :return: Number of games added to the warehouse.
+    """
+    _filename = WAREHOUSE_FILE if filename is None else filename
+
+    if not exists(BASE_SAVE_DIR):
+        mkdir(BASE_SAVE_DIR)
+
+    knownGameIds = queryGameIds(_filename)
+
+    records = (
+        parseWarehouseRecordsNew(x) for x in boxScores.values()
+        if x.get("id") not in knownGameIds
+    )
+    return insertRecords(_filename, [x for x in records if x is not None])
+
+
+def updateSeasonSchedule(year, filename=None, scheduleDir=None):
+    """Append the final games of the season that were ingested into the warehouse to the
+    schedule of the season (see `schedules.appendSeasonSchedule`), so that the Poisson
+    model can be executed for seasons that are not packaged. Packaged seasons are skipped.
+
+    :param filename: Filename of the warehouse, `WAREHOUSE_FILE` by default.
+    :param scheduleDir: Directory of the schedules, `SEASON_SCHEDULE_DIR` by default.
+    :return: Number of games appended to the schedule.
+    """
+    _filename = WAREHOUSE_FILE if filename is None else filename
+    _scheduleDir = SEASON_SCHEDULE_DIR if scheduleDir is None else scheduleDir
+
+    archive = loadScheduleArchive()
+    if archive is not None and int(year) in archive:
+        return 0
+    if not exists(_filename):
+        logger.debug(f"failed to find the warehouse {_filename}")
+        return 0
+
+    added = appendSeasonSchedule(
+        int(year), querySeasonSchedule(_filename, int(year)), _scheduleDir
+    )
+    if added:
+        clearSeasonCache()
+    logger.debug(f"added {added} games to the {year} schedule")
+    return added
+
+
 def parseRecentData(data, maxRecords=None, gameType=""):
     """Parse the results of games and return the wins, losses, winPercent, streak
     from that period indicated by maxRecords. The winPercent will always be greater
@@ -488,6 +572,9 @@ def parseRecentData(data, maxRecords=None, gameType=""):
         teamRecentWinPercents[homeTeamData["teamId"]].insert(0, ["L", "H"])
         teamRecentWinPercents[awayTeamData["teamId"]].insert(0, ["W", "A"])
 
+    NOTE: the list of results must be rescanned for each call. When games are processed
+    one at a time (streaming), use `RecentFormTracker` (form.py) which provides the same
+    results in O(1).
     """
     _maxRecords = len(data) if maxRecords is None else maxRecords
 
@@ -555,6 +642,17 @@ def pullPlayoffDataNewAPI(year):
 
     jsonGameData["boxScores"] = playoffGameData
 
+    # the warehouse only adds the games that it does not have, so the games are ingested
+    # even when the file is unchanged (the file may exist before the warehouse).
+    ingestBoxScores(playoffGameData)
+
+    if exists(playoffFilename):
+        with open(playoffFilename, "rb") as jsonFile:
+            if loads(jsonFile.read()).get("boxScores") == playoffGameData:
+                # skip rewriting the file so that the content (fingerprint) is unchanged
+                logger.debug(f"no new playoff data, keeping {playoffFilename}")
+                return playoffFilename
+
     if not exists(BASE_SAVE_DIR):
         mkdir(BASE_SAVE_DIR)
 
@@ -620,9 +718,10 @@ def pullDatasetNewAPI(year):
     }
 
     jsonData = None
+    loadedFromFile = exists(currYearFilename)
 
     # Load the file if it exists, use this data as a starting point
-    if exists(currYearFilename):
+    if loadedFromFile:
         with open(currYearFilename, "rb") as jsonFile:
             jsonData = loads(jsonFile.read())
     elif exists(RecoveryFilename):
@@ -639,6 +738,9 @@ def pullDatasetNewAPI(year):
         logger.error(f"No more regular season games to evaluate for {_year}.")
         return currYearFilename
 
+    lastRegisteredGame = currentGame
+    numLoadedGames = len(jsonGameData["boxScores"])
+
     # increase the starting point by 1
     currentGame += 1
 
@@ -669,6 +771,17 @@ def pullDatasetNewAPI(year):
         jsonGameData["boxScores"][currentGame] = jsonRequest
         currentGame += 1
 
+    # the warehouse and the season schedule only add the games that they do not have, so
+    # they are updated even when the file is unchanged (the file may exist before them).
+    ingestBoxScores(jsonGameData["boxScores"])
+    updateSeasonSchedule(_year)
+
+    if loadedFromFile and len(jsonGameData["boxScores"]) == numLoadedGames and \
+        jsonGameData["metadata"]["lastRegisteredGame"] == lastRegisteredGame:
+        # skip rewriting the file so that the content (fingerprint) is unchanged
+        logger.debug(f"no new games found, keeping {currYearFilename}")
+        return currYearFilename
+
     if not exists(BASE_SAVE_DIR):
         mkdir(BASE_SAVE_DIR)
 
@@ -690,56 +803,63 @@ def pullDatasetNewAPI(year):
     return currYearFilename
 
 
-#pylint: disable=too-many-positional-arguments
-def generateDataset(version, startYear, endYear,
-        validFiles=[], dropScoreData=False, playoffs=False
-):
-    """Generate the Dataset that will be used as input to the neural net. This
-    ultimately becomes the training data for the model. 
+def _iterOldGameData(files):
+    """Internal generator that reads the json data for each game from the files
+    (old version of the API). The files can be individual game files or season archives.
     """
-    if not exists(BASE_SAVE_DIR):
-        logger.debug(f"creating base directory {BASE_SAVE_DIR}")
-        mkdir(BASE_SAVE_DIR)
+    for fname in files:
+        if isArchive(fname):
+            with SeasonArchive(fname) as archive:
+                for _, jsonData in archive:
+                    yield jsonData
+        else:
+            with open(fname) as jsonFile:
+                yield loads(jsonFile.read())
 
-    totalData = []
 
-    seasonParsedEvents = {}
+def _iterSeasonData(version, validFiles, playerWriter=None):
+    """Internal generator that parses the valid files one season at a time. Each
+    iteration yields the season (year) and the list of parsed game records for that
+    season. Only a single season worth of raw data is held in memory at once.
 
+    When `playerWriter` is provided (new version only), a `PlayerStatStore` containing
+    the player records of each season is written with the writer (see `PlayerStoreWriter`).
+    """
     if version == Version.OLD.value:
         warn("generating a dataset using the old API")
 
+        # group the files by season, each of the files in the old version
+        # of the API represents a single game while an archive represents a season
+        seasonFiles = {}
         for fname in validFiles:
-
-            # find the directory and parse the events for this data
-            splitPath = fname.split("/")
-            year = int(splitPath[len(splitPath)-2])
-
-            if year not in seasonParsedEvents:
-                parsedHomeTeamEvents, _ = parseSeasonEvents(year)
-                if None in (parsedHomeTeamEvents, ):
-                    logger.warning(f"failed to find data for {year}")
-                    seasonParsedEvents[year] = {}
-                else:
-                    seasonParsedEvents[year] = parsedHomeTeamEvents
-
-            parsedHomeTeamEvents = seasonParsedEvents.get(year, {})
-
-            jsonData = None
-            with open(fname) as jsonFile:
-                jsonData = loads(jsonFile.read())
-
-            if jsonData:
-
-                gameInfo = jsonData["gameData"]
-                boxScore = jsonData["liveData"]["boxscore"]
-                gameData = parseBoxScore(boxScore)
-
-                gameData.update({
-                    "gameId": gameInfo["game"]["pk"], 
-                    "winner": bool(gameData["htGoals"] > gameData["atGoals"])
-                })
-
-                totalData.append(gameData)
+            if isArchive(fname):
+                year = archiveYear(fname)
+            else:
+                splitPath = fname.split("/")
+                year = int(splitPath[len(splitPath)-2])
+            seasonFiles.setdefault(year, []).append(fname)
+
+        for year, files in seasonFiles.items():
+            parsedHomeTeamEvents, _ = parseSeasonEvents(year)
+            if None in (parsedHomeTeamEvents, ):
+                logger.warning(f"failed to find data for {year}")
+
+            seasonData = []
+            for jsonData in _iterOldGameData(files):
+                if jsonData:
+
+                    gameInfo = jsonData["gameData"]
+                    boxScore = jsonData["liveData"]["boxscore"]
+                    gameData = parseBoxScore(boxScore)
+
+                    gameData.update({
+                        "gameId": gameInfo["game"]["pk"], 
+                        "winner": bool(gameData["htGoals"] > gameData["atGoals"])
+                    })
+
+                    seasonData.append(gameData)
+
+            yield year, seasonData
     else:
         for filename in validFiles:
             jsonData = None
@@ -752,27 +872,77 @@ def generateDataset(version, startYear, endYear,
 
             # grab all boxscores from all files that were created
             if jsonData:
-                for _, boxscore in jsonData["boxScores"].items():
-                    totalData.append(parseBoxScoreNew(boxscore))
+                year = jsonData.get("metadata", {}).get("year", filename)
+                seasonData = [
+                    parseBoxScoreNew(boxscore) for _, boxscore in jsonData["boxScores"].items()
+                ]
+                if playerWriter is not None:
+                    playerWriter.write(PlayerStatStore.fromRecords([
+                        record for _, boxscore in jsonData["boxScores"].items()
+                        for record in parsePlayerGamesNew(boxscore)
+                    ]))
+                yield year, seasonData
+
+
+def datasetFile(startYear, endYear, playoffs=False):
+    """Get the name of the dataset file created by `generateDataset`."""
+    if playoffs:
+        return newAPIFile(f"Playoffs-{startYear}-{endYear}.xlsx")
+    return newAPIFile(f"ANNDataset-{startYear}-{endYear}.xlsx")
 
-    # generate the dataframe and add to a spreadsheet
-    df = pd.DataFrame(totalData)
-    if dropScoreData:
-        logger.debug("Dropping score data from the dataset")
-        df = df.drop(columns=['winner'], errors='ignore')
 
-    if playoffs:
-        datasetFilename = newAPIFile(f"Playoffs-{startYear}-{endYear}.xlsx")
-    else:
-        datasetFilename = newAPIFile(f"ANNDataset-{startYear}-{endYear}.xlsx")
+#pylint: disable=too-many-positional-arguments
+def generateDataset(version, startYear, endYear,
+        validFiles=[], dropScoreData=False, playoffs=False, memoryLimit=None
+):
+    """Generate the Dataset that will be used as input to the neural net. This
+    ultimately becomes the training data for the model. 
+
+    When `memoryLimit` (megabytes) is provided, the dataset is generated in chunks
+    of seasons. Each chunk is written to the dataset file before the next chunk is
+    parsed, so the full dataset is never held in memory.
+
+    The player records of each game (new version only) are saved to a
+    `PlayerStatStore` file next to the dataset (see `playerStoreFilename`). The records
+    are written one season at a time, so they are not held in memory either.
+    """
+    if not exists(BASE_SAVE_DIR):
+        logger.debug(f"creating base directory {BASE_SAVE_DIR}")
+        mkdir(BASE_SAVE_DIR)
 
-    logger.debug(df.isna().sum())
+    datasetFilename = datasetFile(startYear, endYear, playoffs)
 
     if exists(datasetFilename):
         remove(datasetFilename)
-    df.to_excel(datasetFilename)
+
+    playerWriter = PlayerStoreWriter(playerStoreFilename(datasetFilename))
+    seasons = _iterSeasonData(version, validFiles, playerWriter=playerWriter)
+
+    if memoryLimit is not None:
+        nullCounts = writeDatasetChunked(
+            seasons, datasetFilename, memoryLimit, dropScoreData=dropScoreData
+        )
+        logger.debug(nullCounts)
+    else:
+        totalData = []
+        for _, seasonData in seasons:
+            totalData.extend(seasonData)
+
+        # generate the dataframe and add to a spreadsheet
+        df = prepareDataset(pd.DataFrame(totalData), dropScoreData)
+
+        logger.debug(df.isna().sum())
+
+        df.to_excel(datasetFilename)
+
+    playerWriter.close()
+
+    return datasetFilename
 
 
+def playerStoreFilename(datasetFilename):
+    """Get the name of the player store file that belongs to the dataset file."""
+    return f"{splitext(datasetFilename)[0]}-Players.npz"
 
 
 def parseBoxScorePlayoffNew(boxscore):
@@ -0,0 +1,239 @@
+"""Elo ratings for every team over the entire history of the league. The seasons are
+replayed in a single pass: each game predicts the home win probability from the ratings
+before the game and then moves the ratings of both teams by the result. The update
+includes a home advantage, a margin of victory multiplier and a regression of every
+rating towards the mean at the start of each season.
+
+The pre-game probabilities are in the same form as `Game.homeTeamWinPercent` and
+`Game.awayTeamWinPercent`, so the Elo predictions are scored with `Game.winnerPredicted`.
+"""
+from datetime import datetime
+from logging import getLogger
+from math import log
+from time import perf_counter
+import numpy as np
+from nhl_model.event import Game
+from nhl_model.poisson import getSchedule
+from nhl_model.schedules import loadScheduleArchive, loadSeasonSchedule
+
+
+logger = getLogger("nhl_neural_net")
+
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 6.0
+HOME_ADVANTAGE = 50.0
+# Fraction of the difference to the mean rating that is removed at the start of a season
+SEASON_REVERSION = 0.3
+
+# Columns (and types) of the table of replayed games, the goals are NaN for games
+# that have not been played.
+ELO_COLUMNS = {
+    "season": np.int16,
+    "gameId": np.int64,
+    "homeTeamId": np.int16,
+    "awayTeamId": np.int16,
+    "homeTeamGoalsActual": np.float64,
+    "awayTeamGoalsActual": np.float64,
+    "homeTeamWinPercent": np.float64,
+    "awayTeamWinPercent": np.float64,
+}
+
+
+class EloRatings:
+    '''Ratings of each team, updated one game at a time.'''
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, kFactor=K_FACTOR, homeAdvantage=HOME_ADVANTAGE,
+                 reversion=SEASON_REVERSION, initialRating=INITIAL_RATING):
+        self.kFactor = kFactor
+        self.homeAdvantage = homeAdvantage
+        self.reversion = reversion
+        self.initialRating = initialRating
+        self.ratings = {}
+        self.season = None
+
+    def rating(self, teamId):
+        '''Get the rating of the team, teams without a game have the initial rating.'''
+        return self.ratings.get(teamId, self.initialRating)
+
+    def startSeason(self, season):
+        '''Move every rating towards the mean rating for the start of a new season.'''
+        if self.season is not None and season != self.season and self.ratings:
+            mean = sum(self.ratings.values()) / len(self.ratings)
+            for teamId, rating in self.ratings.items():
+                self.ratings[teamId] = rating - self.reversion * (rating - mean)
+        self.season = season
+
+    def homeWinProbability(self, homeTeamId, awayTeamId):
+        '''Get the probability (0-1) that the home team wins.'''
+        difference = self.rating(homeTeamId) + self.homeAdvantage - self.rating(awayTeamId)
+        return 1.0 / (1.0 + 10.0 ** (-difference / 400.0))
+
+    def addGame(self, homeTeamId, awayTeamId, homeGoals, awayGoals):
+        '''Predict the game and update the ratings with the result. Games without a
+        result (None) are predicted, but the ratings are not updated.
+
+        :return: Probability (0-1) that the home team wins from the ratings before the game.
+        '''
+        homeRating = self.rating(homeTeamId)
+        awayRating = self.rating(awayTeamId)
+        difference = homeRating + self.homeAdvantage - awayRating
+        expected = 1.0 / (1.0 + 10.0 ** (-difference / 400.0))
+
+        if homeGoals is None or awayGoals is None:
+            return expected
+
+        margin = homeGoals - awayGoals
+        if margin == 0:
+            # ties (before the shootout) are half a win for each team
+            result, multiplier = 0.5, 1.0
+        else:
+            result = 1.0 if margin > 0 else 0.0
+            # larger wins count for more, but less so when the winner was the favorite
+            winnerDifference = difference if margin > 0 else -difference
+            multiplier = (0.6686 * log(abs(margin)) + 0.8048) * \
+                2.05 / (winnerDifference * 0.001 + 2.05)
+
+        shift = self.kFactor * multiplier * (result - expected)
+        self.ratings[homeTeamId] = homeRating + shift
+        self.ratings[awayTeamId] = awayRating - shift
+        return expected
+
+
+def eloSeasons():
+    '''Get the seasons with a schedule, the packaged seasons followed by the seasons
+    built from the ingested games (see `schedules.appendSeasonSchedule`).
+    '''
+    archive = loadScheduleArchive()
+    seasons = archive.seasons if archive is not None else []
+    nextSeason = seasons[-1] + 1 if seasons else datetime.now().year
+    seasons.extend(
+        x for x in range(nextSeason, datetime.now().year + 1) if loadSeasonSchedule(x)
+    )
+    return seasons
+
+
+def _seasonRecords(year):
+    '''Get the games for the season as (gameId, home team id, away team id, home goals,
+    away goals), the goals are None when the game has not been played.
+    '''
+    archive = loadScheduleArchive()
+    if archive is not None and year in archive:
+        teamIds = [x[0] for x in archive.teams]
+        return [
+            (gameId, teamIds[home], teamIds[away],
+             None if homeGoals < 0 else homeGoals, None if awayGoals < 0 else awayGoals)
+            for gameId, home, away, homeGoals, awayGoals, _ in archive.seasonGames(year).tolist()
+        ]
+
+    return [
+        (x["gameId"], x["homeTeamId"], x["awayTeamId"],
+         x["homeTeamGoalsActual"], x["awayTeamGoalsActual"])
+        for x in getSchedule(year) or []
+    ]
+
+
+def replayElo(years=None, elo=None):
+    '''Replay the seasons in order, each game is predicted before the ratings are
+    updated with the result.
+
+    :param years: Seasons to replay. Defaults to all seasons (see `eloSeasons`).
+    :param elo: Ratings to start from (see `EloRatings`). New ratings are created by default.
+    :return: The ratings after the last game, and a dictionary where the keys are the
+    `ELO_COLUMNS` and the values are arrays with a value per game.
+    '''
+    elo = EloRatings() if elo is None else elo
+    years = eloSeasons() if years is None else years
+
+    columns = {name: [] for name in ELO_COLUMNS}
+    for year in years:
+        records = _seasonRecords(year)
+        if not records:
+            # the season was not played (2004)
+            logger.debug(f"failed to find the games for {year}")
+            continue
+
+        elo.startSeason(year)
+        addGame = elo.addGame
+        probabilities = [addGame(x[1], x[2], x[3], x[4]) for x in records]
+
+        gameIds, homeTeamIds, awayTeamIds, homeGoals, awayGoals = zip(*records)
+        columns["season"].extend([year] * len(records))
+        columns["gameId"].extend(gameIds)
+        columns["homeTeamId"].extend(homeTeamIds)
+        columns["awayTeamId"].extend(awayTeamIds)
+        columns["homeTeamGoalsActual"].extend(np.nan if x is None else x for x in homeGoals)
+        columns["awayTeamGoalsActual"].extend(np.nan if x is None else x for x in awayGoals)
+        columns["homeTeamWinPercent"].extend(probabilities)
+
+    table = {name: np.array(columns[name], dtype=dtype) for name, dtype in ELO_COLUMNS.items()
+             if name != "awayTeamWinPercent"}
+    homeWin = table["homeTeamWinPercent"]
+    table["homeTeamWinPercent"] = np.round(homeWin * 100.0, 2)
+    table["awayTeamWinPercent"] = np.round((1.0 - homeWin) * 100.0, 2)
+    return elo, {name: table[name] for name in ELO_COLUMNS}
+
+
+def eloSeasonGames(year, elo=None):
+    '''Predict the games of the season with the ratings of every season before it.
+
+    :return: List of games (see `Game`) where the win percentages are the Elo predictions.
+    '''
+    if elo is None:
+        elo, _ = replayElo([x for x in eloSeasons() if x < year])
+    _, table = replayElo([year], elo)
+
+    games = []
+    for index, gameId in enumerate(table["gameId"].tolist()):
+        gameObj = Game(gameId, int(table["homeTeamId"][index]), int(table["awayTeamId"][index]))
+        homeGoals = table["homeTeamGoalsActual"][index]
+        awayGoals = table["awayTeamGoalsActual"][index]
+        gameObj.fromJson({
+            "homeTeamGoalsActual": None if np.isnan(homeGoals) else int(homeGoals),
+            "awayTeamGoalsActual": None if np.isnan(awayGoals) else int(awayGoals),
+            "homeTeamWinPercent": float(table["homeTeamWinPercent"][index]),
+            "awayTeamWinPercent": float(table["awayTeamWinPercent"][index]),
+        })
+        games.append(gameObj)
+    return games
+
+
+def eloAccuracy(table):
+    '''Get the number of games that were played and the number of games where the
+    predicted winner won (see `Game.winnerPredicted`).
+    '''
+    homeGoals, awayGoals = table["homeTeamGoalsActual"], table["awayTeamGoalsActual"]
+    played = ~(np.isnan(homeGoals) | np.isnan(awayGoals))
+    homePredicted = table["homeTeamWinPercent"] > table["awayTeamWinPercent"]
+    awayPredicted = table["awayTeamWinPercent"] > table["homeTeamWinPercent"]
+    correct = (homePredicted & (homeGoals > awayGoals)) | (awayPredicted & (awayGoals > homeGoals))
+    return int(played.sum()), int((correct & played).sum())
+
+
+def execElo(startYear=None, endYear=None, top=10):
+    '''Replay the history and print the accuracy of the seasons from the start to end
+    year (inclusive), as well as the best rated teams.
+    '''
+    startTime = perf_counter()
+    elo, table = replayElo([x for x in eloSeasons() if endYear is None or x <= endYear])
+    wallTime = perf_counter() - startTime
+
+    seasons = table["season"]
+    selected = np.ones(len(seasons), dtype=bool) if startYear is None else seasons >= startYear
+    print(f"{'season':>6} {'games':>6} {'accuracy':>9}")
+    for season in np.unique(seasons[selected]).tolist():
+        played, correct = eloAccuracy({k: v[seasons == season] for k, v in table.items()})
+        accuracy = round(float(correct) / float(played) * 100.0, 2) if played else 0.0
+        print(f"{season:>6} {played:>6} {accuracy:>9.2f}")
+
+    played, correct = eloAccuracy({k: v[selected] for k, v in table.items()})
+    accuracy = round(float(correct) / float(played) * 100.0, 2) if played else 0.0
+    print(f"Correct Predictions {correct}/{played} ({accuracy}%)")
+    print(f"Replayed {len(seasons)} games in {wallTime:.2f} seconds")
+
+    archive = loadScheduleArchive()
+    names = {} if archive is None else {x[0]: x[1] for x in archive.teams}
+    ranked = sorted(elo.ratings.items(), key=lambda x: x[1], reverse=True)[:top]
+    for teamId, rating in ranked:
+        print(f"{names.get(teamId, teamId)!s:>24} {rating:>8.1f}")
@@ -0,0 +1,360 @@
+"""Evaluate the forecasts of any of the models from arrays of the predicted home win
+probabilities and the outcomes (1 when the home team won). The accuracy, Brier score,
+log loss and reliability (calibration) bins are calculated for all games and for each
+season, team and month with a single pass (`numpy.bincount`) per grouping.
+
+Games that were not played and games that ended in a tie (before the shootout was
+introduced) do not have a binary outcome, so they are not evaluated.
+"""
+from logging import getLogger
+from os import makedirs
+from os.path import dirname, exists, join as path_join
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from nhl_model.dataset import BASE_SAVE_DIR, newAPIFile
+from nhl_model.elo import eloSeasons, replayElo
+from nhl_model.poisson import parseSeasonEvents
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Number of equal width probability bins used for the reliability
+RELIABILITY_BINS = 10
+
+# Probabilities are clipped to this value (and 1 - value) for the log loss
+_EPSILON = 1e-15
+
+# Metrics saved for each grouping, the reliability metrics have a value per bin
+EVALUATION_METRICS = (
+    "games", "accuracy", "brier", "logLoss",
+    "binGames", "binPredicted", "binObserved",
+)
+
+EVALUATION_GROUPS = ("season", "team", "month")
+
+PREDICTIONS_FILE = path_join(*[BASE_SAVE_DIR, "predictions.xlsx"])
+
+
+def forecastArrays(homeWinPercent, awayWinPercent, homeGoals, awayGoals):
+    '''Convert the win percentages (see `Game.homeTeamWinPercent`) and the goals to the
+    home win probabilities and outcomes. The probability of a regulation tie is removed,
+    so the predicted winner is the same as `Game.winnerPredicted`.
+
+    :return: Array of the home win probabilities, and the array of outcomes where 1 is a
+    home win, 0 is an away win and NaN is a tie or a game that was not played.
+    '''
+    homeWinPercent = np.asarray(homeWinPercent, dtype=float)
+    awayWinPercent = np.asarray(awayWinPercent, dtype=float)
+    homeGoals = np.asarray(homeGoals, dtype=float)
+    awayGoals = np.asarray(awayGoals, dtype=float)
+
+    total = homeWinPercent + awayWinPercent
+    probabilities = np.divide(
+        homeWinPercent, total, out=np.full(total.shape, 0.5), where=total > 0
+    )
+    outcomes = np.where(homeGoals > awayGoals, 1.0, 0.0)
+    outcomes[(homeGoals == awayGoals) | np.isnan(homeGoals) | np.isnan(awayGoals)] = np.nan
+    return probabilities, outcomes
+
+
+def _groupMetrics(probabilities, outcomes, groups, bins):
+    '''Calculate the `EVALUATION_METRICS` for each unique group.
+
+    :return: Dictionary containing the sorted unique groups ("group") and the metrics.
+    '''
+    keys, index = np.unique(groups, return_inverse=True)
+    numGroups = len(keys)
+
+    games = np.bincount(index, minlength=numGroups)
+    correct = (probabilities > 0.5) == (outcomes == 1.0)
+    # a probability of exactly 0.5 does not predict a winner (see `Game.winnerPredicted`)
+    correct &= probabilities != 0.5
+    clipped = np.clip(probabilities, _EPSILON, 1.0 - _EPSILON)
+    losses = -(outcomes * np.log(clipped) + (1.0 - outcomes) * np.log(1.0 - clipped))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics = {
+            "group": keys,
+            "games": games,
+            "accuracy": np.bincount(index, correct, numGroups) / games * 100.0,
+            "brier": np.bincount(index, (probabilities - outcomes) ** 2, numGroups) / games,
+            "logLoss": np.bincount(index, losses, numGroups) / games,
+        }
+
+        # the reliability bins for every group are counted at once (group x bin)
+        binIndex = np.minimum((probabilities * bins).astype(int), bins - 1)
+        flatIndex = index * bins + binIndex
+        size = numGroups * bins
+        binGames = np.bincount(flatIndex, minlength=size).reshape(numGroups, bins)
+        metrics["binGames"] = binGames
+        metrics["binPredicted"] = \
+            np.bincount(flatIndex, probabilities, size).reshape(numGroups, bins) / binGames
+        metrics["binObserved"] = \
+            np.bincount(flatIndex, outcomes, size).reshape(numGroups, bins) / binGames
+
+    return metrics
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def evaluateForecasts(probabilities, outcomes, seasons=None, homeTeams=None, awayTeams=None,
+                      months=None, bins=RELIABILITY_BINS):
+    '''Evaluate the forecasts for all games, and by season, team and month when the
+    values are provided.
+
+    :param probabilities: Array of the predicted home win probabilities (0-1).
+    :param outcomes: Array of outcomes, 1 is a home win, 0 is an away win and NaN is not
+    evaluated (see `forecastArrays`).
+    :param seasons: Array of the season of each game.
+    :param homeTeams: Array of the home team (id or name) of each game.
+    :param awayTeams: Array of the away team of each game. Each game is evaluated for both
+    teams, from the point of view of the team.
+    :param months: Array of the month (1-12) of each game.
+    :param bins: Number of equal width probability bins for the reliability.
+    :return: Dictionary where the keys are "overall" and the `EVALUATION_GROUPS` that were
+    provided, and the values are dictionaries of the `EVALUATION_METRICS`.
+    '''
+    probabilities = np.asarray(probabilities, dtype=float)
+    outcomes = np.asarray(outcomes, dtype=float)
+    valid = ~(np.isnan(probabilities) | np.isnan(outcomes))
+    probabilities, outcomes = probabilities[valid], outcomes[valid]
+
+    report = {
+        "overall": _groupMetrics(
+            probabilities, outcomes, np.zeros(len(probabilities), dtype=int), bins
+        )
+    }
+    if seasons is not None:
+        report["season"] = _groupMetrics(
+            probabilities, outcomes, np.asarray(seasons)[valid], bins
+        )
+    if homeTeams is not None and awayTeams is not None:
+        report["team"] = _groupMetrics(
+            np.concatenate([probabilities, 1.0 - probabilities]),
+            np.concatenate([outcomes, 1.0 - outcomes]),
+            np.concatenate([np.asarray(homeTeams)[valid], np.asarray(awayTeams)[valid]]),
+            bins
+        )
+    if months is not None:
+        report["month"] = _groupMetrics(
+            probabilities, outcomes, np.asarray(months)[valid], bins
+        )
+
+    return report
+
+
+def saveEvaluationReport(report, filename):
+    '''Save the report to a (numpy) file, the arrays are named <grouping>-<metric>.'''
+    if dirname(filename):
+        makedirs(dirname(filename), exist_ok=True)
+    np.savez(filename, **{
+        f"{grouping}-{name}": values
+        for grouping, metrics in report.items() for name, values in metrics.items()
+    })
+    logger.debug(f"saved evaluation report to {filename}")
+
+
+def loadEvaluationReport(filename):
+    '''Load the report saved with `saveEvaluationReport`.'''
+    report = {}
+    with np.load(filename) as data:
+        for key in data.files:
+            grouping, _, name = key.partition("-")
+            report.setdefault(grouping, {})[name] = data[key]
+    return report
+
+
+def poissonForecasts(years, halfLife=None, window=None, adjusted=False):
+    '''Get the forecasts of the Poisson model for the seasons (see `parseSeasonEvents`).
+
+    :return: Dictionary containing the probabilities, outcomes, seasons, homeTeams and
+    awayTeams arrays. The schedules do not contain the dates, so there are no months.
+    '''
+    columns = {"homeWinPercent": [], "awayWinPercent": [], "homeGoals": [], "awayGoals": [],
+               "seasons": [], "homeTeams": [], "awayTeams": []}
+    for year in years:
+        homeTeamEvents, _ = parseSeasonEvents(year, halfLife, window, adjusted)
+        if homeTeamEvents is None:
+            continue
+
+        games = sorted((x for events in homeTeamEvents.values() for x in events),
+                       key=lambda x: x.gameId)
+        columns["homeWinPercent"].extend(x.homeTeamWinPercent for x in games)
+        columns["awayWinPercent"].extend(x.awayTeamWinPercent for x in games)
+        columns["homeGoals"].extend(
+            np.nan if x.homeTeamGoalsActual is None else x.homeTeamGoalsActual for x in games
+        )
+        columns["awayGoals"].extend(
+            np.nan if x.awayTeamGoalsActual is None else x.awayTeamGoalsActual for x in games
+        )
+        columns["seasons"].extend([int(year)] * len(games))
+        columns["homeTeams"].extend(x.homeTeamId for x in games)
+        columns["awayTeams"].extend(x.awayTeamId for x in games)
+
+    probabilities, outcomes = forecastArrays(
+        columns["homeWinPercent"], columns["awayWinPercent"],
+        columns["homeGoals"], columns["awayGoals"]
+    )
+    return {
+        "probabilities": probabilities,
+        "outcomes": outcomes,
+        "seasons": np.array(columns["seasons"], dtype=np.int16),
+        "homeTeams": np.array(columns["homeTeams"], dtype=np.int16),
+        "awayTeams": np.array(columns["awayTeams"], dtype=np.int16),
+    }
+
+
+def eloForecasts(table):
+    '''Get the forecasts from the table of replayed Elo games (see `elo.replayElo`).'''
+    probabilities, outcomes = forecastArrays(
+        table["homeTeamWinPercent"], table["awayTeamWinPercent"],
+        table["homeTeamGoalsActual"], table["awayTeamGoalsActual"]
+    )
+    return {
+        "probabilities": probabilities,
+        "outcomes": outcomes,
+        "seasons": table["season"],
+        "homeTeams": table["homeTeamId"],
+        "awayTeams": table["awayTeamId"],
+    }
+
+
+def annForecasts(filename=PREDICTIONS_FILE):
+    '''Get the forecasts from the predictions of the artificial neural network. Older
+    predictions do not contain the home win probability, the predicted winner has a
+    probability of 1. Predictions without a winner are not evaluated.
+
+    :return: Dictionary containing the probabilities, outcomes, seasons, homeTeams,
+    awayTeams and months arrays. None is returned when the file does not exist.
+    '''
+    if not exists(filename):
+        logger.debug(f"failed to find file: {filename}")
+        return None
+
+    df = pd.read_excel(filename)
+    homeTeams = df["homeTeam"].astype(str).to_numpy()
+    predictedHome = (df["predictedWinner"].astype(str) == df["homeTeam"].astype(str)).to_numpy()
+
+    if "homeWinProbability" in df.columns:
+        probabilities = df["homeWinProbability"].to_numpy(dtype=float)
+        probabilities = np.where(np.isnan(probabilities), predictedHome, probabilities)
+    else:
+        probabilities = predictedHome.astype(float)
+
+    winners = df["winner"]
+    outcomes = np.where(winners.astype(str).to_numpy() == homeTeams, 1.0, 0.0)
+    outcomes[winners.isna().to_numpy()] = np.nan
+
+    # the season starts in the fall
+    dates = pd.to_datetime(df["gameDate"])
+    months = dates.dt.month.to_numpy()
+    seasons = np.where(months >= 9, dates.dt.year, dates.dt.year - 1)
+
+    return {
+        "probabilities": probabilities.astype(float),
+        "outcomes": outcomes,
+        "seasons": seasons.astype(np.int16),
+        "homeTeams": homeTeams,
+        "awayTeams": df["awayTeam"].astype(str).to_numpy(),
+        "months": months.astype(np.int8),
+    }
+
+
+def printEvaluationReport(report, wallTime=None):
+    '''Print the overall and per season metrics of the report.'''
+    def _printMetrics(label, metrics, index):
+        print(
+            f"{label!s:>8} {metrics['games'][index]:>7} {metrics['accuracy'][index]:>9.2f} "
+            f"{metrics['brier'][index]:>7.4f} {metrics['logLoss'][index]:>8.4f}"
+        )
+
+    print(f"{'group':>8} {'games':>7} {'accuracy':>9} {'brier':>7} {'log loss':>8}")
+    for index, season in enumerate(report.get("season", {}).get("group", [])):
+        _printMetrics(season, report["season"], index)
+    _printMetrics("all", report["overall"], 0)
+
+    overall = report["overall"]
+    print(f"{'bin':>11} {'games':>7} {'predicted':>10} {'observed':>9}")
+    bins = overall["binGames"].shape[1]
+    for index in range(bins):
+        if overall["binGames"][0, index] == 0:
+            continue
+        print(
+            f"{index / bins:>5.2f}-{(index + 1) / bins:<5.2f} {overall['binGames'][0, index]:>7} "
+            f"{overall['binPredicted'][0, index]:>10.4f} {overall['binObserved'][0, index]:>9.4f}"
+        )
+
+    if wallTime is not None:
+        print(f"Evaluated in {wallTime * 1000.0:.2f} milliseconds")
+
+
+def execEvaluation(forecasts, output=None, bins=RELIABILITY_BINS):
+    '''Evaluate the forecasts (see `poissonForecasts`, `eloForecasts` and `annForecasts`),
+    print the report and save it when the output file is provided.
+
+    :return: The report (see `evaluateForecasts`).
+    '''
+    startTime = perf_counter()
+    report = evaluateForecasts(
+        forecasts["probabilities"],
+        forecasts["outcomes"],
+        seasons=forecasts.get("seasons"),
+        homeTeams=forecasts.get("homeTeams"),
+        awayTeams=forecasts.get("awayTeams"),
+        months=forecasts.get("months"),
+        bins=bins,
+    )
+    wallTime = perf_counter() - startTime
+
+    printEvaluationReport(report, wallTime)
+    if output is not None:
+        saveEvaluationReport(report, output)
+    return report
+
+
+def modelForecasts(model, startYear=None, endYear=None):
+    '''Get the forecasts of the model (poisson, elo or ann) for the seasons from the
+    start to end year (inclusive). The Poisson model is evaluated for every season that
+    has a previous season.
+
+    :return: Dictionary of the forecasts (see `poissonForecasts`), None when the forecasts
+    could not be found.
+    '''
+    if model == "ann":
+        forecasts = annForecasts()
+    elif model == "elo":
+        forecasts = eloForecasts(replayElo()[1])
+    else:
+        forecasts = poissonForecasts([
+            x for x in eloSeasons()[1:] if (startYear is None or x >= startYear) and
+            (endYear is None or x <= endYear)
+        ])
+    if forecasts is None:
+        return None
+
+    # the seasons outside of the range are not evaluated
+    seasons = forecasts["seasons"]
+    selected = np.ones(len(seasons), dtype=bool)
+    if startYear is not None:
+        selected &= seasons >= startYear
+    if endYear is not None:
+        selected &= seasons <= endYear
+    return {k: v[selected] for k, v in forecasts.items()}
+
+
+def execModelEvaluation(model, startYear=None, endYear=None, output=None,
+                        bins=RELIABILITY_BINS):
+    '''Evaluate the forecasts of the model (see `modelForecasts`), print the report and
+    save it to the output file, Evaluation-<model>.npz in the save directory by default.
+
+    :return: The report (see `evaluateForecasts`), None when the forecasts could not be found.
+    '''
+    forecasts = modelForecasts(model, startYear, endYear)
+    if forecasts is None:
+        logger.error(f"failed to find the forecasts for {model}")
+        return None
+
+    return execEvaluation(
+        forecasts, output=output or newAPIFile(f"Evaluation-{model}.npz"), bins=bins
+    )
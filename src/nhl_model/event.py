@@ -1,7 +1,13 @@
+from logging import getLogger
+import numpy as np
+from scipy.stats import poisson
 from nhl_core import NHLData
 from nhl_model.enums import EventType
 
 
+logger = getLogger("nhl_neural_net")
+
+
 # List of all shot event types
 ShotEvents = [x.value for x in EventType]
 
@@ -9,16 +15,53 @@ ShotEvents = [x.value for x in EventType]
 class Game:
     '''A Game contains all home and away team events that have occurred during
     an NHL game.
+
+    The attributes are stored in slots since all games in history may be held in memory
+    at once. The Poisson PDF is not stored, it is calculated from the predicted goals
+    when it is accessed (see `poissonPDF`).
     '''
 
     # pylint: disable=too-many-instance-attributes
 
+    __slots__ = (
+        "gameId",
+        "homeTeamId",
+        "awayTeamId",
+        "homeTeamName",
+        "awayTeamName",
+        "homeTeamTriCode",
+        "awayTeamTriCode",
+        "_homeTeamEvents",
+        "_awayTeamEvents",
+        "homeTeamWinPercent",
+        "awayTeamWinPercent",
+        "regulationTiePercent",
+        "homeTeamGoalsPrediction",
+        "homeTeamGoalsActual",
+        "awayTeamGoalsPrediction",
+        "awayTeamGoalsActual",
+        "homeAttackStrength",
+        "homeDefenseStrength",
+        "awayAttackStrength",
+        "awayDefenseStrength",
+        "maxGoals",
+    )
+
+    # values of the schedule files that are not stored with the game
+    _SCHEDULE_ONLY_KEYS = ("lastPeriodType",)
+
     def __init__(self, gameId, homeTeamId=None, awayTeamId=None):
         self.gameId = gameId
         self.homeTeamId = homeTeamId
         self.awayTeamId = awayTeamId
-        self.homeTeamEvents = []
-        self.awayTeamEvents = []
+        self.homeTeamName = None
+        self.awayTeamName = None
+        self.homeTeamTriCode = None
+        self.awayTeamTriCode = None
+
+        # the lists of events are only created when events are added
+        self._homeTeamEvents = None
+        self._awayTeamEvents = None
 
         # Values for prediction and analysis
         self.homeTeamWinPercent = 0.0
@@ -28,6 +71,55 @@ class Game:
         self.homeTeamGoalsActual = 0
         self.awayTeamGoalsPrediction = 0
         self.awayTeamGoalsActual = 0
+        self.homeAttackStrength = None
+        self.homeDefenseStrength = None
+        self.awayAttackStrength = None
+        self.awayDefenseStrength = None
+
+        # Maximum number of goals included in the poisson PDF
+        self.maxGoals = None
+
+    @property
+    def homeTeamEvents(self):
+        '''List of events that occurred due to actions performed by the home team.'''
+        if self._homeTeamEvents is None:
+            self._homeTeamEvents = []
+        return self._homeTeamEvents
+
+    @homeTeamEvents.setter
+    def homeTeamEvents(self, events):
+        self._homeTeamEvents = events
+
+    @property
+    def awayTeamEvents(self):
+        '''List of events that occurred due to actions performed by the away team.'''
+        if self._awayTeamEvents is None:
+            self._awayTeamEvents = []
+        return self._awayTeamEvents
+
+    @awayTeamEvents.setter
+    def awayTeamEvents(self, events):
+        self._awayTeamEvents = events
+
+    @property
+    def poissonPDF(self):
+        '''The probability of the home and away team scoring 0 to `maxGoals` goals. The
+        values are calculated from the predicted goals. None is returned when the maximum
+        number of goals is not set.
+        '''
+        if self.maxGoals is None:
+            return None
+
+        goals = np.arange(self.maxGoals + 1)
+        return {
+            "home": poisson.pmf(goals, mu=self.homeTeamGoalsPrediction).tolist(),
+            "away": poisson.pmf(goals, mu=self.awayTeamGoalsPrediction).tolist(),
+        }
+
+    @poissonPDF.setter
+    def poissonPDF(self, pdfData):
+        # only the number of goals is kept, the values are calculated from the predictions
+        self.maxGoals = None if pdfData is None else len(pdfData["home"]) - 1
 
     def addHomeTeamEvent(self, event):
         '''Add an event that occurred due to actions performed by the home team.'''
@@ -92,10 +184,34 @@ class Game:
             "awayTeamGoalsActual": self.awayTeamGoalsActual,
         }
 
+    @classmethod
+    def _settable(cls, key):
+        '''Returns true when the key is a slot or a property that has a setter.'''
+        attribute = getattr(cls, key, None)
+        if isinstance(attribute, property):
+            return attribute.fset is not None
+        return key in cls.__slots__
+
+    @classmethod
+    def _readOnly(cls, key):
+        '''Returns true when the key is a value that is calculated (a property without
+        a setter or a method) or a value of the schedule that is not stored.
+        '''
+        attribute = getattr(cls, key, None)
+        return isinstance(attribute, property) or callable(attribute) or \
+            key in cls._SCHEDULE_ONLY_KEYS
+
     def fromJson(self, jsonData):
-        '''Set this instance from a valid json formatted dictionary.'''
+        '''Set this instance from a valid json formatted dictionary. Read only values
+        (such as the `winner`) are calculated, so they are skipped. Any other unknown
+        values are skipped with a warning.
+        '''
         for key, value in jsonData.items():
             if key in ("homeTeamEvents", "awayTeamEvents"):
                 setattr(self, key, [NHLData(x) for x in value])
-            else:
+            elif self._settable(key):
                 setattr(self, key, value)
+            elif self._readOnly(key):
+                logger.debug(f"skipping read only game attribute {key}")
+            else:
+                logger.warning(f"skipping unknown game attribute {key}")
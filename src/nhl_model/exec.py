@@ -1,19 +1,95 @@
 import argparse
 from datetime import datetime
+from functools import partial
 from logging import getLogger, basicConfig
+from nhl_model.archive import packOldData
 from nhl_model.ann import execAnn, findFiles, execAnnSpecificDate, determineWinners
-from nhl_model.dataset import generateDataset
+from nhl_model.backtest import execBacktest
+from nhl_model.dataset import (
+    datasetFile,
+    generateDataset,
+    playerStoreFilename,
+    updateSeasonSchedule,
+)
+from nhl_model.elo import execElo
+from nhl_model.enums import Version
+from nhl_model.evaluation import execModelEvaluation
+from nhl_model.live import execLive
+from nhl_model.matchups import execMatchups
+from nhl_model.pipeline import runStage
 from nhl_model.playoffs import (
+    execPlayoffProbabilities,
     getPlayoffMetadata,
     prepareResultsForNextRound,
     getTeamInfo,
     printPlayoffSeries
 )
 from nhl_model.poisson import execPoisson
+from nhl_model.simulate import execSimulate
+from nhl_model.snapshot import execSnapshot
 
 from nhl_model.standings import getStandings
 
 
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def execGenerate(version, startYear, endYear, dropScoreData=False, playoffs=False,
+                 memoryLimit=None, force=False):
+    '''Generate the dataset (see `generateDataset`) when the season files or parameters
+    changed since the dataset was last generated (see `pipeline.runStage`).
+    '''
+    validFiles = findFiles(version, startYear, endYear, playoffs=playoffs)
+    datasetFilename = datasetFile(startYear, endYear, playoffs)
+    artifacts = [datasetFilename]
+    if version == Version.NEW.value:
+        artifacts.append(playerStoreFilename(datasetFilename))
+    runStage(
+        f"dataset:{datasetFilename}",
+        partial(generateDataset, version, startYear, endYear,
+            validFiles=validFiles, dropScoreData=dropScoreData,
+            playoffs=playoffs, memoryLimit=memoryLimit
+        ),
+        inputs=validFiles,
+        params={"version": version, "dropScoreData": dropScoreData},
+        artifacts=artifacts,
+        force=force
+    )
+
+
+def execPlayoffs(year, playoffRound=0, exact=False):
+    '''Predict the series winner(s) for the round of the playoffs.
+
+    :param playoffRound: Round of the playoffs, when 0 the winners of every round are
+    predicted from the first round metadata.
+    :param exact: When true, print the exact series and bracket probabilities (see
+    `playoffs.execPlayoffProbabilities`) rather than executing the ANN.
+    '''
+    # When 0 is selected we will perform our best guess for each round, but only
+    # use the first round metadata. We will attempt to pick our winners for each
+    # round.
+    predictionRound = playoffRound if playoffRound > 0 else 1
+    if exact:
+        execPlayoffProbabilities(year, predictionRound)
+        return
+
+    metadata = getPlayoffMetadata(year, predictionRound)
+    output = execAnn(override=False, playoffData=metadata)
+    printPlayoffSeries(output, predictionRound)
+
+    if playoffRound == 0:
+        standings = getStandings()
+        if not standings:
+            return
+
+        teamData = getTeamInfo()
+        if teamData is None:
+            return
+
+        for r in range(2, 5, 1):
+            matchups = prepareResultsForNextRound(teamData, standings, output, r)
+            output = execAnn(override=False, playoffData=matchups)
+            printPlayoffSeries(output, r)
+
+
 def main():
     '''main execution point.'''
     parser = argparse.ArgumentParser()
@@ -32,6 +108,10 @@ def main():
     annSubParser.add_argument(
         '--override', action='store_true', help='override all values in the config'
     )
+    annSubParser.add_argument(
+        '--force', action='store_true',
+        help='Rerun feature selection and training even when nothing changed.'
+    )
 
     # Generate a dataset used for the artificial neural network. The training data for the
     # ANN should contain a start and end year that are different than the current year/season.
@@ -60,6 +140,30 @@ def main():
         '--playoffs', help='When true, collect information about the playoffs.',
         action='store_true'
     )
+    # Large year ranges can be generated in chunks of seasons so that the entire
+    # dataset is never held in memory. The value is the memory budget in megabytes.
+    generateSubParser.add_argument(
+        '--memory_limit', type=int, default=None,
+        help='Memory budget (MB) used to generate the dataset in chunks of seasons.'
+    )
+    # The dataset is only regenerated when the season files or parameters changed since the
+    # last time that the dataset was generated (see `pipeline.py`).
+    generateSubParser.add_argument(
+        '--force', action='store_true', help='Regenerate the dataset even when nothing changed.'
+    )
+
+    # The data from the original version of the API is stored as one file per game. Pack
+    # the files into a single (indexed) archive per season. This only needs to be done once,
+    # `generate` will read from the archives when they exist.
+    packSubParser = mainSubParsers.add_parser(
+        'pack', help='Pack the game files (old api) into season archives'
+    )
+    packSubParser.add_argument(
+        '-e', '--endYear', type=int, help='Last season to pack', default=None
+    )
+    packSubParser.add_argument(
+        '-s', '--startYear', type=int, help='First season to pack', default=None
+    )
 
     # Poisson distribution is used to predict the winner of a specific game based on the
     # number of goals that each team will likely score during the game. This method uses
@@ -70,6 +174,170 @@ def main():
         default=datetime.now().year
     )
 
+    # Evaluate the poisson distribution over a range of seasons. The seasons are evaluated
+    # in parallel and the results (per season) are saved to a columnar (numpy) file.
+    backtestSubParser = mainSubParsers.add_parser(
+        'backtest', help='Evaluate the Poisson Distribution over a range of seasons'
+    )
+    backtestSubParser.add_argument(
+        '-s', '--startYear', type=int, default=None,
+        help='First season to evaluate, defaults to the first season with a previous season'
+    )
+    backtestSubParser.add_argument(
+        '-e', '--endYear', type=int, default=None,
+        help='Last season to evaluate, defaults to the last season with a schedule'
+    )
+    backtestSubParser.add_argument(
+        '-w', '--workers', type=int, default=None, help='Maximum number of worker processes.'
+    )
+    backtestSubParser.add_argument(
+        '-o', '--output', default=None,
+        help='Output file (.npz), defaults to Backtest-<start>-<end>.npz in the save directory.'
+    )
+
+    # The poisson strengths weight every game of the season equally by default. The strengths
+    # can instead be weighted by recency (half life) or use the most recent games (window).
+    for subParser in (poissonSubParser, backtestSubParser):
+        strengthGroup = subParser.add_mutually_exclusive_group()
+        strengthGroup.add_argument(
+            '--half_life', type=float, default=None,
+            help='Weight the games of each team by recency with this half life (games).'
+        )
+        strengthGroup.add_argument(
+            '--window', type=int, default=None,
+            help='Only use the most recent number of games of each team for the strengths.'
+        )
+        strengthGroup.add_argument(
+            '--adjusted', action='store_true',
+            help='Adjust the strengths of each team for the strength of their opponents.'
+        )
+
+    # Update the saved Poisson model (snapshot) for a season with the games that have been
+    # ingested, and predict matchups from the snapshot.
+    snapshotSubParser = mainSubParsers.add_parser(
+        'snapshot', help='Update the Poisson snapshot for a season and predict matchups'
+    )
+    snapshotSubParser.add_argument(
+        '-y', '--year', type=int, help='Year for the start of the season',
+        default=datetime.now().year
+    )
+    snapshotSubParser.add_argument(
+        '-d', '--date', default=None,
+        help='Only add the games played on or before the date (YYYY-MM-DD).'
+    )
+    snapshotSubParser.add_argument(
+        '--schedule', action='store_true',
+        help='Add the games from the schedule of the season rather than the warehouse.'
+    )
+    snapshotSubParser.add_argument(
+        '-m', '--matchup', nargs=2, action='append', default=[], metavar=('HOME', 'AWAY'),
+        help='Home and away team (id or triCode) to predict, may be repeated.'
+    )
+
+    # Calculate the predictions for every home/away pairing of teams from the (updated)
+    # snapshot of the season and save the matrix.
+    matchupSubParser = mainSubParsers.add_parser(
+        'matchups', help='Create the Poisson predictions for every pairing of teams'
+    )
+    matchupSubParser.add_argument(
+        '-y', '--year', type=int, help='Year for the start of the season',
+        default=datetime.now().year
+    )
+    matchupSubParser.add_argument(
+        '--schedule', action='store_true',
+        help='Add the games from the schedule of the season rather than the warehouse.'
+    )
+    matchupSubParser.add_argument(
+        '-o', '--output', default=None,
+        help='Output file (.npz), defaults to <year>-Matchups.npz in the save directory.'
+    )
+    matchupSubParser.add_argument(
+        '-m', '--matchup', nargs=2, action='append', default=[], metavar=('HOME', 'AWAY'),
+        help='Home and away team (id or triCode) to print, may be repeated.'
+    )
+
+    # Simulate the remaining games of a season to project the final standings and the
+    # playoff odds of each team.
+    simulateSubParser = mainSubParsers.add_parser(
+        'simulate', help='Simulate the remainder of a season (standings and playoff odds)'
+    )
+    simulateSubParser.add_argument(
+        '-y', '--year', type=int, help='Year for the start of the season',
+        default=datetime.now().year
+    )
+    simulateSubParser.add_argument(
+        '-n', '--num_simulations', type=int, default=10000, help='Number of seasons to simulate.'
+    )
+    simulateSubParser.add_argument(
+        '-s', '--seed', type=int, default=None, help='Seed for reproducible simulations.'
+    )
+    simulateSubParser.add_argument(
+        '-w', '--workers', type=int, default=None, help='Maximum number of worker processes.'
+    )
+    simulateSubParser.add_argument(
+        '-p', '--played', type=int, default=None,
+        help='Only consider the first number of games of the schedule played.'
+    )
+    simulateSubParser.add_argument(
+        '--snapshot', action='store_true',
+        help='Use the games in the saved snapshot of the season as the played games.'
+    )
+    simulateSubParser.add_argument(
+        '--pull', action='store_true',
+        help='Pull the remaining games of a season that is not packaged from the NHL API.'
+    )
+
+    # Replay the Elo ratings over every season and print the accuracy of the predictions.
+    eloSubParser = mainSubParsers.add_parser(
+        'elo', help='Replay the Elo ratings over all seasons'
+    )
+    eloSubParser.add_argument(
+        '-s', '--startYear', type=int, default=None,
+        help='First season to print, defaults to the first season.'
+    )
+    eloSubParser.add_argument(
+        '-e', '--endYear', type=int, default=None,
+        help='Last season to replay, defaults to the last season.'
+    )
+    eloSubParser.add_argument(
+        '-t', '--top', type=int, default=10, help='Number of the best rated teams to print.'
+    )
+
+    # Evaluate the forecasts (accuracy, Brier score, log loss and calibration) of a model
+    # by season, team and month, and save the report.
+    evaluateSubParser = mainSubParsers.add_parser(
+        'evaluate', help='Evaluate the forecasts of a model'
+    )
+    evaluateSubParser.add_argument(
+        '-m', '--model', choices=['poisson', 'elo', 'ann'], default='poisson',
+        help='Model to evaluate, the ann predictions are read from the predictions file.'
+    )
+    evaluateSubParser.add_argument(
+        '-s', '--startYear', type=int, default=None, help='First season to evaluate.'
+    )
+    evaluateSubParser.add_argument(
+        '-e', '--endYear', type=int, default=None, help='Last season to evaluate.'
+    )
+    evaluateSubParser.add_argument(
+        '-b', '--bins', type=int, default=10, help='Number of reliability bins.'
+    )
+    evaluateSubParser.add_argument(
+        '-o', '--output', default=None,
+        help='Output file (.npz), defaults to Evaluation-<model>.npz in the save directory.'
+    )
+
+    # Update the win probabilities of the games in progress from a feed of events (json lines).
+    liveSubParser = mainSubParsers.add_parser(
+        'live', help='Update the win probabilities of games in progress from a feed of events'
+    )
+    liveSubParser.add_argument(
+        '-y', '--year', type=int, help='Year for the start of the season',
+        default=datetime.now().year
+    )
+    liveSubParser.add_argument(
+        '-f', '--feed', required=True, help='Feed file containing one json event per line.'
+    )
+
     # This form of execution asks for a specific date day-month-year to run the model against.
     # This will NOT [re]generate the model, it will only execute if the model is already
     # present in /tmp/nhl_model/nhl_model
@@ -102,6 +370,10 @@ def main():
     playoffSubParser.add_argument(
         '-y', '--year', help='Year for the playoff prediction', default=datetime.now().year
     )
+    playoffSubParser.add_argument(
+        '--exact', action='store_true',
+        help='Calculate the exact series and bracket probabilities from the Poisson matchups.'
+    )
 
     args = parser.parse_args()
 
@@ -112,41 +384,55 @@ def main():
     # execute the correct function from the execTypes dictionary.
     # Follow the imports to see what these functions actually do.
     if args.execType == 'generate':
-        validFiles = findFiles(args.version, args.startYear, args.endYear, playoffs=args.playoffs)
-        generateDataset(args.version, args.startYear, args.endYear,
-            validFiles=validFiles, dropScoreData=args.drop_score_data,
-            playoffs=args.playoffs
+        execGenerate(
+            args.version, args.startYear, args.endYear, dropScoreData=args.drop_score_data,
+            playoffs=args.playoffs, memoryLimit=args.memory_limit, force=args.force
         )
+    elif args.execType == 'pack':
+        archives = packOldData(startYear=args.startYear, endYear=args.endYear)
+        logger.info(f"created {len(archives)} season archives")
     elif args.execType == 'analyze':
         determineWinners()
     elif args.execType == 'ann':
-        execAnn(args.override)
+        execAnn(args.override, force=args.force)
     elif args.execType == 'poisson':
-        execPoisson(args.year)
+        # seasons that are not packaged are read from the games ingested so far, the
+        # previous season provides the starting strengths.
+        updateSeasonSchedule(int(args.year) - 1)
+        updateSeasonSchedule(int(args.year))
+        execPoisson(
+            args.year, halfLife=args.half_life, window=args.window, adjusted=args.adjusted
+        )
+    elif args.execType == 'backtest':
+        execBacktest(
+            args.startYear, args.endYear, workers=args.workers, halfLife=args.half_life,
+            window=args.window, adjusted=args.adjusted, output=args.output
+        )
+    elif args.execType == 'snapshot':
+        execSnapshot(
+            args.year, endDate=args.date, fromSchedule=args.schedule, matchups=args.matchup
+        )
+    elif args.execType == 'matchups':
+        execMatchups(
+            args.year, fromSchedule=args.schedule, output=args.output, matchups=args.matchup
+        )
+    elif args.execType == 'simulate':
+        execSimulate(
+            args.year, args.num_simulations, seed=args.seed, workers=args.workers,
+            numPlayed=args.played, fromSnapshot=args.snapshot, pullSchedule=args.pull
+        )
+    elif args.execType == 'elo':
+        execElo(args.startYear, args.endYear, top=args.top)
+    elif args.execType == 'evaluate':
+        execModelEvaluation(
+            args.model, args.startYear, args.endYear, output=args.output, bins=args.bins
+        )
+    elif args.execType == 'live':
+        execLive(args.year, args.feed)
     elif args.execType == 'date':
         execAnnSpecificDate(args.day, args.month, args.year)
     elif args.execType == 'playoffs':
-        # When 0 is selected we will perform our best guess for each round, but only
-        # use the first round metadata. We will attempt to pick our winners for each
-        # round.
-        predictionRound = args.round if args.round > 0 else 1
-        metadata = getPlayoffMetadata(args.year, predictionRound)
-        output = execAnn(override=False, playoffData=metadata)
-        printPlayoffSeries(output, predictionRound)
-
-        if args.round == 0:
-            standings = getStandings()
-            if not standings:
-                return
-
-            teamData = getTeamInfo()
-            if teamData is None:
-                return
-
-            for r in range(2, 5, 1):
-                matchups = prepareResultsForNextRound(teamData, standings, output, r)
-                output = execAnn(override=False, playoffData=matchups)
-                printPlayoffSeries(output, r)
+        execPlayoffs(args.year, args.round, exact=args.exact)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,252 @@
+from collections import deque
+from logging import getLogger
+import numpy as np
+import pandas as pd
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Number of previous games used for the `recent` win percentages
+DEFAULT_FORM_WINDOW = 10
+
+
+def _sortedGameOrder(df):
+    """Find the positions of the records in the dataframe in the order that the
+    games were played. When the date information is present (new version of the API)
+    the games are sorted by date, ties (and records without dates) are sorted by gameId.
+    """
+    sortKeys = [pd.to_numeric(df["gameId"], errors="coerce").fillna(0).to_numpy()]
+    for column in ("day", "month", "year"):
+        if column in df.columns:
+            sortKeys.append(pd.to_numeric(df[column], errors="coerce").fillna(0).to_numpy())
+
+    # np.lexsort uses the last key as the primary key
+    return np.lexsort(sortKeys)
+
+
+def _priorWinPercent(long, keys, window=None):
+    """Calculate the win percentage of the games played before each record in
+    the grouped data. When the `window` is provided only the last `window` games
+    are included in the calculation.
+    """
+    grouped = long.groupby(keys, sort=False)
+    priorGames = grouped.cumcount().to_numpy()
+    priorWins = (grouped["win"].cumsum() - long["win"]).to_numpy()
+
+    if window is not None:
+        # The wins in the window are the total wins before this game minus the
+        # total wins before the game that is `window` games earlier.
+        laggedWins = pd.Series(priorWins, index=long.index).groupby(
+            [long[k] for k in keys], sort=False
+        ).shift(window, fill_value=0).to_numpy()
+        priorWins = priorWins - laggedWins
+        priorGames = np.minimum(priorGames, window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        winPercent = np.where(
+            priorGames > 0, np.round(priorWins / priorGames * 100.0, 2), 0.0
+        )
+    return winPercent
+
+
+def _priorStreak(long, keys):
+    """Calculate the streak before each record in the grouped data. The streak is
+    positive for a winning streak and negative for a losing streak.
+    """
+    grouped = long.groupby(keys, sort=False)
+    newRun = long["win"].ne(grouped["win"].shift())
+    runId = newRun.groupby([long[k] for k in keys], sort=False).cumsum()
+    runLength = long.groupby(keys + [runId], sort=False).cumcount() + 1
+    signedRun = pd.Series(
+        np.where(long["win"], runLength, -runLength), index=long.index
+    )
+    return signedRun.groupby(
+        [long[k] for k in keys], sort=False
+    ).shift(fill_value=0).to_numpy()
+
+
+def addRecentFormFeatures(df, window=DEFAULT_FORM_WINDOW):
+    """Add the recent form of each team to the dataset. The values match those
+    described in `parseRecentData`, but they are calculated for all records at once
+    using grouped cumulative operations. Only the games played before each game (in the
+    same season) are used, so the values do not leak the result of the game.
+
+    The following values are added for the home (ht) and away (at) teams:
+    - recentWinPercent - win percentage over the last `window` games
+    - totalWinPercent - season to date win percentage
+    - gameTypeWinPercentRecent - home (or away) win percentage over the last `window` home
+    (or away) games
+    - gameTypeWinPercent - season to date home (or away) win percentage
+    - streak - positive for a winning streak and negative for a losing streak
+
+    :param df: Dataframe where each record is a game (see `parseBoxScoreNew`).
+    :param window: Number of previous games used for the recent values.
+    :return: Dataframe with the additional columns.
+    """
+    requiredColumns = ("gameId", "htTeamid", "atTeamid", "htGoals", "atGoals")
+    if df.empty or any(x not in df.columns for x in requiredColumns):
+        logger.debug("missing data, skipping the recent form features")
+        return df
+
+    order = _sortedGameOrder(df)
+    numGames = len(order)
+
+    gameIds = pd.to_numeric(df["gameId"], errors="coerce").fillna(0).to_numpy()[order]
+    homeWin = df["htGoals"].to_numpy()[order] > df["atGoals"].to_numpy()[order]
+
+    # Each game is split into a record for the home team and a record for the away team.
+    season = np.tile(gameIds.astype(np.int64) // 1000000, 2)
+    long = pd.DataFrame({
+        "sequence": np.tile(np.arange(numGames), 2),
+        "season": season,
+        "team": np.concatenate([
+            df["htTeamid"].to_numpy()[order], df["atTeamid"].to_numpy()[order]
+        ]),
+        "isHome": np.repeat([True, False], numGames),
+        "win": np.concatenate([homeWin, ~homeWin]),
+    })
+    long.sort_values(by="sequence", kind="stable", inplace=True)
+    long.reset_index(drop=True, inplace=True)
+
+    teamKeys = ["season", "team"]
+    gameTypeKeys = ["season", "team", "isHome"]
+    long["recentWinPercent"] = _priorWinPercent(long, teamKeys, window)
+    long["totalWinPercent"] = _priorWinPercent(long, teamKeys)
+    long["gameTypeWinPercentRecent"] = _priorWinPercent(long, gameTypeKeys, window)
+    long["gameTypeWinPercent"] = _priorWinPercent(long, gameTypeKeys)
+    long["streak"] = _priorStreak(long, teamKeys)
+
+    features = ["recentWinPercent", "totalWinPercent",
+                "gameTypeWinPercentRecent", "gameTypeWinPercent", "streak"]
+
+    formDF = df.copy()
+    for prefix, isHome in (("ht", True), ("at", False)):
+        teamRecords = long[long["isHome"] == isHome].sort_values(by="sequence")
+        for key in features:
+            values = np.empty(numGames, dtype=teamRecords[key].dtype)
+            values[order] = teamRecords[key].to_numpy()
+            formDF[f"{prefix}{key.capitalize()}"] = values
+
+    return formDF
+
+
+class _FormRecord:
+    '''Running counters for the results of a single team. A record is kept for all
+    games, home games and away games for each team.
+    '''
+
+    def __init__(self, windows):
+        self.wins = 0
+        self.losses = 0
+        self.streak = 0
+
+        # Each window is a ring buffer of the most recent results as well as
+        # the number of wins currently in the buffer.
+        self.windows = {window: [deque(maxlen=window), 0] for window in windows}
+
+    def add(self, won):
+        '''Add the result of a game to the record.'''
+        if won:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        else:
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+
+        for window in self.windows.values():
+            results = window[0]
+            if len(results) == results.maxlen and results[0]:
+                # the oldest result is about to be removed from the buffer
+                window[1] -= 1
+            results.append(won)
+            if won:
+                window[1] += 1
+
+    def recentData(self, maxRecords=None):
+        '''Return the wins, losses, win percentage and streak for the record. See
+        `parseRecentData` for more information.
+        '''
+        if maxRecords is None:
+            wins, losses, streak = self.wins, self.losses, self.streak
+        else:
+            results, wins = self.windows[maxRecords]
+            losses = len(results) - wins
+            # the streak can not extend past the window
+            streak = min(abs(self.streak), maxRecords)
+            streak = streak if self.streak >= 0 else -streak
+
+        numGames = wins + losses
+        winPercent = round((float(wins) / float(numGames)) * 100.0, 2) if numGames > 0 else 0.0
+
+        return wins, losses, winPercent, streak
+
+
+class RecentFormTracker:
+    '''Track the recent form of each team as games are played. This provides the
+    same results as `parseRecentData` without storing and rescanning the list of results
+    for each team. Adding a game and retrieving the data for a team are both O(1).
+
+    The `windows` are the values of `maxRecords` that the tracker can answer in addition
+    to `None` (all games).
+
+    Example usage:
+    tracker = RecentFormTracker(windows=(10,))
+    # NOTE: retrieve the data before the current game information is added
+    wins, losses, winPercent, _ = tracker.recentData(homeTeamData['teamId'], 10)
+    _, _, totalWinPercent, streak = tracker.recentData(homeTeamData['teamId'])
+    _, _, winPercentHomeRecent, _ = tracker.recentData(homeTeamData['teamId'], 10, "H")
+
+    tracker.addGame(
+        homeTeamData['teamId'],
+        awayTeamData['teamId'],
+        homeTeamData["goals"] > awayTeamData["goals"]
+    )
+    '''
+
+    def __init__(self, windows=(DEFAULT_FORM_WINDOW,)):
+        if any(window <= 0 for window in windows):
+            raise ValueError("windows must be positive")
+        self.windows = tuple(windows)
+        self.records = {}
+
+    def _records(self, teamId):
+        if teamId not in self.records:
+            self.records[teamId] = {
+                gameType: _FormRecord(self.windows) for gameType in ("", "H", "A")
+            }
+        return self.records[teamId]
+
+    def addResult(self, teamId, won, gameType):
+        '''Add the result for a single team. The `gameType` is "H" for a home
+        game or "A" for an away game.
+        '''
+        records = self._records(teamId)
+        records[""].add(won)
+        records[gameType].add(won)
+
+    def addGame(self, homeTeamId, awayTeamId, homeTeamWon):
+        '''Add the result of a game for both the home and away team.'''
+        self.addResult(homeTeamId, homeTeamWon, "H")
+        self.addResult(awayTeamId, not homeTeamWon, "A")
+
+    def recentData(self, teamId, maxRecords=None, gameType=""):
+        '''Return the wins, losses, win percentage and streak for the team. The
+        results are equal to `parseRecentData` for the list of results of the team.
+
+        :param teamId: Id of the team.
+        :param maxRecords: Number of recent games, this must be None or one of the
+        `windows` provided to the tracker.
+        :param gameType: "" for all games, "H" for home games or "A" for away games.
+        '''
+        if maxRecords is not None and maxRecords not in self.windows:
+            raise ValueError(f"{maxRecords} is not a window tracked by this instance")
+
+        if teamId not in self.records:
+            return 0, 0, 0.0, 0
+
+        return self.records[teamId][gameType].recentData(maxRecords)
+
+    def reset(self):
+        '''Remove all results, generally this is done at the start of a season.'''
+        self.records = {}
@@ -0,0 +1,303 @@
+"""In-game (live) win probabilities. The goals that each team scores in the remaining
+regulation time are Poisson distributed with the pre-game expected goals scaled by the
+fraction of regulation time that remains. Given the current score, the home team wins
+in regulation when the difference of the remaining goals (Skellam) is greater than the
+away team lead.
+
+The probabilities for every (remaining time, score difference) are calculated once when
+a game starts, so each event only updates the state of the game and reads the tables.
+Events are read from a feed of json lines (one event per line), for example:
+
+    {"gameId": 2022020001, "event": "START", "homeTeam": "TOR", "awayTeam": "MTL"}
+    {"gameId": 2022020001, "event": "GOAL", "team": "TOR", "period": 1, "timeInPeriod": "05:21"}
+    {"gameId": 2022020001, "event": "TIME", "period": 2, "timeInPeriod": "10:00"}
+    {"gameId": 2022020001, "event": "END"}
+"""
+from functools import partial
+from json import loads
+from logging import getLogger
+import numpy as np
+from nhl_model.poisson import maxGoalsForTailMass, poissonPMF
+from nhl_model.snapshot import createSnapshot, loadSnapshot
+
+
+logger = getLogger("nhl_neural_net")
+
+
+PERIOD_SECONDS = 1200
+REGULATION_PERIODS = 3
+REGULATION_SECONDS = PERIOD_SECONDS * REGULATION_PERIODS
+
+# Resolution (seconds) of the remaining time in the tables
+TIME_STEP = 10
+
+# Score differences beyond this value use the probabilities of this value
+MAX_SCORE_DIFFERENCE = 10
+
+
+def elapsedSeconds(period, timeInPeriod):
+    '''Get the number of seconds played in the game.
+
+    :param period: Period of the game (1-3 are regulation, 4+ are overtime).
+    :param timeInPeriod: Time played in the period as MM:SS or seconds.
+    '''
+    if isinstance(timeInPeriod, str):
+        minutes, _, seconds = timeInPeriod.partition(":")
+        timeInPeriod = int(minutes) * 60 + int(seconds or 0)
+    return (int(period) - 1) * PERIOD_SECONDS + int(timeInPeriod)
+
+
+def winProbabilityTables(homeTeamGoalsPredicted, awayTeamGoalsPredicted, timeStep=TIME_STEP,
+                         maxScoreDifference=MAX_SCORE_DIFFERENCE):
+    '''Calculate the regulation outcome probabilities for every remaining time and score.
+
+    :param homeTeamGoalsPredicted: Expected (pre-game) home goals.
+    :param awayTeamGoalsPredicted: Expected (pre-game) away goals.
+    :param timeStep: Resolution (seconds) of the remaining time.
+    :param maxScoreDifference: Largest score difference (home - away) in the tables.
+    :return: Array (time steps + 1 x 2 * maxScoreDifference + 1 x 3) of the home win, away
+    win and regulation tie probabilities, table[step, difference + maxScoreDifference]
+    where the step is the number of time steps that have been played.
+    '''
+    steps = int(np.ceil(REGULATION_SECONDS / timeStep))
+    remaining = (steps - np.arange(steps + 1)) / steps
+
+    maxGoals = maxGoalsForTailMass([homeTeamGoalsPredicted, awayTeamGoalsPredicted])
+    homePMF = poissonPMF(homeTeamGoalsPredicted * remaining, maxGoals)
+    awayPMF = poissonPMF(awayTeamGoalsPredicted * remaining, maxGoals)
+
+    # distribution of the remaining goal difference, column = home - away + maxGoals
+    goalDifference = np.zeros((steps + 1, 2 * maxGoals + 1))
+    for awayGoals in range(maxGoals + 1):
+        start = maxGoals - awayGoals
+        goalDifference[:, start:start + maxGoals + 1] += homePMF * awayPMF[:, [awayGoals]]
+    # cumulative[:, column] is the probability that the difference is below column - maxGoals
+    cumulative = np.pad(np.cumsum(goalDifference, axis=1), ((0, 0), (1, 0)))
+    total = cumulative[:, -1:]
+
+    # the home team wins when the remaining difference is greater than -(score difference)
+    scoreDifference = np.arange(-maxScoreDifference, maxScoreDifference + 1)
+    below = np.clip(maxGoals - scoreDifference, 0, 2 * maxGoals + 1)
+    upTo = np.clip(maxGoals - scoreDifference + 1, 0, 2 * maxGoals + 1)
+
+    awayWin = cumulative[:, below]
+    tie = cumulative[:, upTo] - awayWin
+    homeWin = total - cumulative[:, upTo]
+
+    return np.stack([homeWin, awayWin, tie], axis=-1) / total[:, :, np.newaxis]
+
+
+class LiveGame:
+    '''State and win probabilities of a game in progress. Each event is a lookup in the
+    tables created with `winProbabilityTables`.
+    '''
+
+    # pylint: disable=too-many-instance-attributes
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, gameId, homeTeamId, awayTeamId, homeTeamGoalsPredicted,
+                 awayTeamGoalsPredicted, timeStep=TIME_STEP):
+        self.gameId = gameId
+        self.homeTeamId = homeTeamId
+        self.awayTeamId = awayTeamId
+        self.homeTeamGoalsPredicted = homeTeamGoalsPredicted
+        self.awayTeamGoalsPredicted = awayTeamGoalsPredicted
+        self.timeStep = timeStep
+        self.tables = winProbabilityTables(
+            homeTeamGoalsPredicted, awayTeamGoalsPredicted, timeStep=timeStep
+        )
+
+        totalGoals = homeTeamGoalsPredicted + awayTeamGoalsPredicted
+        self.homeNextGoal = homeTeamGoalsPredicted / totalGoals if totalGoals > 0 else 0.5
+
+        self.homeTeamGoals = 0
+        self.awayTeamGoals = 0
+        self.elapsed = 0
+        self.final = False
+
+    def update(self, elapsed=None, homeGoal=False, awayGoal=False):
+        '''Update the state of the game.
+
+        :param elapsed: Seconds played in the game, the time never moves backwards.
+        :param homeGoal: When true, the home team scored.
+        :param awayGoal: When true, the away team scored.
+        '''
+        if elapsed is not None:
+            self.elapsed = max(self.elapsed, min(int(elapsed), REGULATION_SECONDS))
+        self.homeTeamGoals += int(homeGoal)
+        self.awayTeamGoals += int(awayGoal)
+
+    def end(self):
+        '''Mark the game as final, the remaining time is 0.'''
+        self.elapsed = REGULATION_SECONDS
+        self.final = True
+
+    @property
+    def probabilities(self):
+        '''The current regulation outcome probabilities (home win, away win, tie).'''
+        maxScoreDifference = (self.tables.shape[1] - 1) // 2
+        scoreDifference = min(
+            max(self.homeTeamGoals - self.awayTeamGoals, -maxScoreDifference), maxScoreDifference
+        )
+        step = min(-(-self.elapsed // self.timeStep), self.tables.shape[0] - 1)
+        return self.tables[step, scoreDifference + maxScoreDifference]
+
+    @property
+    def homeWinProbability(self):
+        '''The current probability that the home team wins, including overtime. The winner
+        in overtime is the team that is more likely to score the next goal.
+        '''
+        homeWin, _, tie = self.probabilities
+        if self.final and self.homeTeamGoals != self.awayTeamGoals:
+            return float(self.homeTeamGoals > self.awayTeamGoals)
+        return float(homeWin + tie * self.homeNextGoal)
+
+    @property
+    def json(self):
+        '''Return a dictionary that contains a valid json representation of the instance.'''
+        homeWin, awayWin, tie = self.probabilities.tolist()
+        return {
+            "gameId": self.gameId,
+            "homeTeamId": self.homeTeamId,
+            "awayTeamId": self.awayTeamId,
+            "homeTeamGoals": self.homeTeamGoals,
+            "awayTeamGoals": self.awayTeamGoals,
+            "elapsed": self.elapsed,
+            "final": self.final,
+            "homeTeamWinPercent": round(homeWin * 100.0, 2),
+            "awayTeamWinPercent": round(awayWin * 100.0, 2),
+            "regulationTiePercent": round(tie * 100.0, 2),
+            "homeWinProbability": round(self.homeWinProbability, 4),
+        }
+
+
+class LiveSlate:
+    '''The games in progress. Games are added with a START event, the expected goals are
+    read from the event or predicted with the snapshot (see `snapshot.PoissonSnapshot`).
+    '''
+
+    def __init__(self, snapshot=None, timeStep=TIME_STEP):
+        self.snapshot = snapshot
+        self.timeStep = timeStep
+        self.games = {}
+
+    def __len__(self):
+        return len(self.games)
+
+    def startGame(self, event):
+        '''Add the game from the START event.'''
+        homeTeamId, awayTeamId = event["homeTeam"], event["awayTeam"]
+        homeGoals = event.get("homeTeamGoalsPrediction")
+        awayGoals = event.get("awayTeamGoalsPrediction")
+        if self.snapshot is not None:
+            homeTeamId = self.snapshot.teamId(homeTeamId) or homeTeamId
+            awayTeamId = self.snapshot.teamId(awayTeamId) or awayTeamId
+            if None in (homeGoals, awayGoals):
+                prediction = self.snapshot.predict(homeTeamId, awayTeamId)
+                homeGoals = prediction["homeTeamGoalsPrediction"]
+                awayGoals = prediction["awayTeamGoalsPrediction"]
+
+        if None in (homeGoals, awayGoals):
+            raise ValueError(f"failed to find the expected goals for game {event['gameId']}")
+
+        game = LiveGame(
+            event["gameId"], homeTeamId, awayTeamId, homeGoals, awayGoals, timeStep=self.timeStep
+        )
+        self.games[game.gameId] = game
+        return game
+
+    def addEvent(self, event):
+        '''Update the game with the event.
+
+        :param event: Dictionary containing the gameId and event (START, GOAL, TIME or
+        END). GOAL events contain the team (id or triCode) that scored, GOAL and TIME
+        events contain the period and timeInPeriod.
+        :return: The updated game, None when the event is not for a game in the slate.
+        '''
+        eventType = str(event.get("event", "")).upper()
+        if eventType == "START":
+            return self.startGame(event)
+
+        game = self.games.get(event.get("gameId"))
+        if game is None:
+            logger.debug(f"skipping {eventType} event for unknown game {event.get('gameId')}")
+            return None
+
+        elapsed = None
+        if "period" in event:
+            elapsed = elapsedSeconds(event["period"], event.get("timeInPeriod", 0))
+
+        if eventType == "GOAL":
+            team = event["team"]
+            if self.snapshot is not None:
+                team = self.snapshot.teamId(team) or team
+            homeGoal = team == game.homeTeamId
+            if not homeGoal and team != game.awayTeamId:
+                raise ValueError(f"team {event['team']} is not playing in game {game.gameId}")
+            game.update(elapsed, homeGoal=homeGoal, awayGoal=not homeGoal)
+        elif eventType == "END":
+            game.end()
+        else:
+            game.update(elapsed)
+
+        return game
+
+
+def readEventFeed(filename):
+    '''Read the events (json lines) from the feed file. Empty lines are skipped.'''
+    with open(filename, "r") as feedFile:
+        for line in feedFile:
+            if line.strip():
+                yield loads(line)
+
+
+def runLiveFeed(events, slate, callback=None):
+    '''Update the slate with each of the events.
+
+    :param events: Iterable of events (see `LiveSlate.addEvent`).
+    :param callback: Function called with the event and the updated game.
+    :return: Number of events that updated a game.
+    '''
+    updated = 0
+    for event in events:
+        game = slate.addEvent(event)
+        if game is None:
+            continue
+        updated += 1
+        if callback is not None:
+            callback(event, game)
+    return updated
+
+
+def printLiveEvent(event, game, teams=None):
+    '''Print the win probabilities of the game after the event.
+
+    :param teams: Dictionary of team id -> (name, triCode) used for the team names.
+    '''
+    teams = teams or {}
+    homeTeam = teams.get(game.homeTeamId, (None, game.homeTeamId))[1]
+    awayTeam = teams.get(game.awayTeamId, (None, game.awayTeamId))[1]
+    values = game.json
+    minutes, seconds = divmod(game.elapsed, 60)
+    print(
+        f"{game.gameId} {str(event.get('event', '')).upper():>5} {minutes:>2}:{seconds:02d} "
+        f"{homeTeam:>4} {game.homeTeamGoals:>2} - {game.awayTeamGoals:<2} {awayTeam:<4} "
+        f"home {values['homeTeamWinPercent']:>6.2f} away {values['awayTeamWinPercent']:>6.2f} "
+        f"tie {values['regulationTiePercent']:>6.2f} home win (ot) "
+        f"{values['homeWinProbability'] * 100.0:>6.2f}"
+    )
+
+
+def execLive(year, feed):
+    '''Print the win probabilities of the games after each event of the feed file. The
+    saved snapshot of the season is not updated, so the expected goals do not change while
+    the games are in progress.
+
+    :return: Number of events that updated a game.
+    '''
+    snapshot = loadSnapshot(year) or createSnapshot(year)
+    return runLiveFeed(
+        readEventFeed(feed),
+        LiveSlate(snapshot),
+        callback=partial(printLiveEvent, teams=snapshot.teams if snapshot else None)
+    )
@@ -0,0 +1,223 @@
+"""The matchup matrix contains the Poisson predictions for every home/away pairing of
+teams, not only the scheduled games. The matrix is calculated in a single pass from a
+snapshot (see `snapshot.PoissonSnapshot`) and saved as a compact (numpy) array with a team
+index, so that any pairing is a lookup rather than running the model.
+"""
+from logging import getLogger
+from os import makedirs
+from os.path import dirname, join as path_join
+import numpy as np
+from nhl_model.dataset import BASE_SAVE_DIR
+from nhl_model.poisson import outcomeProbabilities
+from nhl_model.snapshot import printPredictionTable, updateSnapshot
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Values stored for each pairing, matrix[home team, away team, column]
+MATCHUP_COLUMNS = (
+    "homeTeamGoalsPrediction",
+    "awayTeamGoalsPrediction",
+    "homeTeamWinPercent",
+    "awayTeamWinPercent",
+    "regulationTiePercent",
+)
+
+_STRENGTH_KEYS = (
+    "homeAttackStrength", "homeDefenseStrength", "awayAttackStrength", "awayDefenseStrength"
+)
+
+
+def matchupFile(year):
+    '''Get the name of the matchup matrix file for the season.'''
+    return path_join(*[BASE_SAVE_DIR, f"{year}-Matchups.npz"])
+
+
+class MatchupMatrix:
+    '''Predictions for every home/away pairing of the teams. The pairing of a team with
+    itself is NaN.
+    '''
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, teamIds, triCodes, values, season=None, asOf=None):
+        self.teamIds = np.asarray(teamIds, dtype=np.int16)
+        self.triCodes = np.asarray(triCodes, dtype=str)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.season = season
+        self.asOf = asOf
+
+        self._index = {teamId: index for index, teamId in enumerate(self.teamIds.tolist())}
+        self._index.update({
+            triCode.upper(): index for index, triCode in enumerate(self.triCodes.tolist())
+            if triCode
+        })
+
+    def __len__(self):
+        return len(self.teamIds)
+
+    def teamIndex(self, team):
+        '''Get the index of the team (id or triCode) in the matrix.'''
+        key = team.upper() if isinstance(team, str) and not team.isdigit() else int(team)
+        if key not in self._index:
+            raise KeyError(f"failed to find team {team} in the matchup matrix")
+        return self._index[key]
+
+    def column(self, name):
+        '''Get the (teams x teams) matrix for one of the `MATCHUP_COLUMNS`.'''
+        return self.values[:, :, MATCHUP_COLUMNS.index(name)]
+
+    def lookup(self, homeTeam, awayTeam):
+        '''Get the predictions for the home and away team (ids or triCodes).
+
+        :return: Dictionary containing the `MATCHUP_COLUMNS`.
+        '''
+        values = self.values[self.teamIndex(homeTeam), self.teamIndex(awayTeam)]
+        prediction = dict(zip(MATCHUP_COLUMNS, values.tolist()))
+        for name in MATCHUP_COLUMNS[2:]:
+            prediction[name] = round(prediction[name], 2)
+        return prediction
+
+    def homeWinProbability(self, homeTeam, awayTeam):
+        '''Get the probability (0-1) that the home team wins, including overtime. The
+        winner in overtime is the team that is more likely to score the next goal.
+        '''
+        prediction = self.lookup(homeTeam, awayTeam)
+        totalGoals = prediction["homeTeamGoalsPrediction"] + prediction["awayTeamGoalsPrediction"]
+        homeNextGoal = prediction["homeTeamGoalsPrediction"] / totalGoals if totalGoals > 0 else 0.5
+        homeWin = prediction["homeTeamWinPercent"] + \
+            prediction["regulationTiePercent"] * homeNextGoal
+        total = prediction["homeTeamWinPercent"] + prediction["awayTeamWinPercent"] + \
+            prediction["regulationTiePercent"]
+        return homeWin / total if total > 0 else 0.5
+
+    def save(self, filename):
+        '''Save the matrix to a (numpy) file.'''
+        if dirname(filename):
+            makedirs(dirname(filename), exist_ok=True)
+        np.savez(
+            filename,
+            teamIds=self.teamIds,
+            triCodes=self.triCodes,
+            values=self.values,
+            season=np.array(-1 if self.season is None else self.season),
+            asOf=np.array(self.asOf or ""),
+        )
+        logger.debug(f"saved the matchup matrix for {len(self)} teams to {filename}")
+
+    @classmethod
+    def load(cls, filename):
+        '''Load the matrix saved with `save`.'''
+        with np.load(filename) as data:
+            season = int(data["season"])
+            return cls(
+                data["teamIds"],
+                data["triCodes"],
+                data["values"],
+                season=None if season < 0 else season,
+                asOf=str(data["asOf"]) or None,
+            )
+
+
+def _teamStrengths(snapshot, teamIds):
+    '''Get the strengths for each team as used by `predictMatchupGoals`.
+
+    :return: (4 x teams) array of strengths (see `_STRENGTH_KEYS`), and the arrays
+    indicating that the team has played a home or away game in the current season.
+    '''
+    currentSeason = snapshot.currentSeason
+    previousScores = snapshot.previousSeason.scores
+
+    hasHome = np.array([currentSeason.hasHomeGames(x) for x in teamIds], dtype=bool)
+    hasAway = np.array([currentSeason.hasAwayGames(x) for x in teamIds], dtype=bool)
+    currentScores = currentSeason.scores([x for x in teamIds if x in currentSeason.teamIds])
+
+    strengths = np.ones((len(_STRENGTH_KEYS), len(teamIds)))
+    for index, teamId in enumerate(teamIds):
+        for row, key in enumerate(_STRENGTH_KEYS):
+            played = hasHome[index] if key.startswith("home") else hasAway[index]
+            scores = currentScores.get(teamId, {}) if played else previousScores.get(teamId, {})
+            value = scores.get(key, 1.0)
+            strengths[row, index] = np.nan if value is None else value
+
+    return strengths, hasHome, hasAway
+
+
+def createMatchupMatrix(snapshot, teamIds=None):
+    '''Calculate the predictions for every home/away pairing of the teams from the
+    snapshot. The values are equal to `PoissonSnapshot.predictGames` for each pairing.
+
+    :param snapshot: Snapshot of the season (see `snapshot.PoissonSnapshot`).
+    :param teamIds: Teams in the matrix. Defaults to the teams that played a game in
+    the season or the previous season.
+    '''
+    if teamIds is None:
+        teamIds = snapshot.currentSeason.teamIds | set(snapshot.previousSeason.scores)
+    teamIds = sorted(teamIds)
+
+    (homeAttack, homeDefense, awayAttack, awayDefense), hasHome, hasAway = \
+        _teamStrengths(snapshot, teamIds)
+
+    # the current season averages are used once either team played in the season
+    useCurrent = hasHome[:, np.newaxis] | hasAway[np.newaxis, :]
+    currentHomeGoals, currentAwayGoals = snapshot.currentSeason.averageGoals()
+    previousHomeGoals, previousAwayGoals = snapshot.previousSeason.averageGoals
+    avgHomeGoals = np.where(useCurrent, currentHomeGoals, previousHomeGoals)
+    avgAwayGoals = np.where(useCurrent, currentAwayGoals, previousAwayGoals)
+    maxGoals = np.where(
+        useCurrent, snapshot.currentSeason.maxGoals, snapshot.previousSeason.maxGoals
+    )
+
+    homeGoals = homeAttack[:, np.newaxis] * awayDefense[np.newaxis, :] * avgHomeGoals
+    awayGoals = awayAttack[np.newaxis, :] * homeDefense[:, np.newaxis] * avgAwayGoals
+
+    values = np.full((len(teamIds), len(teamIds), len(MATCHUP_COLUMNS)), np.nan)
+    pairs = ~np.eye(len(teamIds), dtype=bool)
+    if pairs.any():
+        homeWin, awayWin, tie, _, _ = outcomeProbabilities(
+            maxGoals[pairs], homeGoals[pairs], awayGoals[pairs]
+        )
+        for column, value in enumerate((
+            homeGoals[pairs], awayGoals[pairs],
+            np.round(homeWin * 100.0, 2), np.round(awayWin * 100.0, 2), np.round(tie * 100.0, 2)
+        )):
+            values[:, :, column][pairs] = value
+
+    return MatchupMatrix(
+        teamIds,
+        [snapshot.teams.get(x, (None, ""))[1] or "" for x in teamIds],
+        values,
+        season=snapshot.season,
+        asOf=snapshot.asOf,
+    )
+
+
+def printMatchups(matrix, matchups):
+    '''Print the predictions for the matchups (home team, away team) from the matrix.'''
+    printPredictionTable(
+        f"Matchups {matrix.season} as of {matrix.asOf} ({len(matrix)} teams)",
+        (
+            (matrix.triCodes[matrix.teamIndex(homeTeam)],
+             matrix.triCodes[matrix.teamIndex(awayTeam)], matrix.lookup(homeTeam, awayTeam))
+            for homeTeam, awayTeam in matchups
+        )
+    )
+
+
+def execMatchups(year, fromSchedule=False, output=None, matchups=None):
+    '''Update the snapshot for the season (see `snapshot.updateSnapshot`), create and
+    save the matchup matrix, and print the predictions for the matchups (home team, away
+    team).
+
+    :param output: Output file, `matchupFile` by default.
+    :return: The matchup matrix, None when the snapshot could not be created.
+    '''
+    snapshot = updateSnapshot(year, fromSchedule=fromSchedule)
+    if snapshot is None:
+        return None
+
+    matrix = createMatchupMatrix(snapshot)
+    matrix.save(output or matchupFile(year))
+    if matchups:
+        printMatchups(matrix, matchups)
+    return matrix
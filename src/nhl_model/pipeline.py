@@ -0,0 +1,198 @@
+"""Each stage of the pipeline (raw season files -> dataset -> features -> model ->
+averages) creates one or more artifacts from a set of input files and parameters. The
+fingerprint of the inputs and parameters is stored in the manifest when a stage completes.
+When a stage is executed again with the same fingerprint and the artifacts still exist,
+the stage is skipped. The fingerprint of a stage includes the content of the artifacts
+of the previous stage, so only stages downstream of a change are executed.
+"""
+from hashlib import sha256
+from json import dumps, loads
+from logging import getLogger
+from os import mkdir, replace
+from os.path import exists, join as path_join
+import pandas as pd
+from nhl_model.dataset import BASE_SAVE_DIR
+
+
+logger = getLogger("nhl_neural_net")
+
+
+MANIFEST_FILE = path_join(*[BASE_SAVE_DIR, "pipeline_manifest.json"])
+
+_READ_SIZE = 1024 * 1024
+
+
+def fingerprintFile(filename):
+    '''Create the fingerprint for the content of a file.'''
+    fingerprint = sha256()
+    with open(filename, "rb") as inputFile:
+        for block in iter(lambda: inputFile.read(_READ_SIZE), b""):
+            fingerprint.update(block)
+    return fingerprint.hexdigest()
+
+
+def fingerprintStage(inputs=None, params=None):
+    '''Create the fingerprint for a stage from the content of the input files and the
+    parameters. The order of the inputs does not matter. Inputs that do not exist are
+    included by name only.
+
+    :param inputs: List of input files.
+    :param params: Dictionary of (json serializable) parameters.
+    '''
+    inputs = [] if inputs is None else inputs
+    params = {} if params is None else params
+
+    fingerprint = sha256()
+    for filename in sorted(inputs):
+        fingerprint.update(filename.encode())
+        fingerprint.update(fingerprintFile(filename).encode() if exists(filename) else b"missing")
+    fingerprint.update(dumps(params, sort_keys=True, default=str).encode())
+    return fingerprint.hexdigest()
+
+
+def readManifest(filename=MANIFEST_FILE):
+    '''Read the manifest, an empty dictionary is returned when it does not exist.'''
+    if not exists(filename):
+        return {}
+    with open(filename, "rb") as jsonFile:
+        return loads(jsonFile.read())
+
+
+def _createSaveDir():
+    if not exists(BASE_SAVE_DIR):
+        mkdir(BASE_SAVE_DIR)
+
+
+def _writeManifest(manifest, filename):
+    _createSaveDir()
+
+    tmpFilename = f"{filename}.tmp"
+    with open(tmpFilename, "w") as jsonFile:
+        jsonFile.write(dumps(manifest, indent=2, sort_keys=True))
+    replace(tmpFilename, filename)
+
+
+def isStageCurrent(stage, fingerprint, artifacts, filename=MANIFEST_FILE):
+    '''Returns true when the stage was completed with the same fingerprint and all
+    of the artifacts of the stage still exist.
+    '''
+    record = readManifest(filename).get(stage)
+    if record is None or record.get("fingerprint") != fingerprint:
+        return False
+    return all(exists(x) for x in artifacts)
+
+
+def recordStage(stage, fingerprint, artifacts, filename=MANIFEST_FILE):
+    '''Save the fingerprint and artifacts of a completed stage to the manifest.'''
+    manifest = readManifest(filename)
+    manifest[stage] = {"fingerprint": fingerprint, "artifacts": list(artifacts)}
+    _writeManifest(manifest, filename)
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def runCachedStage(stage, create, load, inputs=None, params=None, artifacts=None, force=False,
+                   filename=MANIFEST_FILE):
+    '''Execute the stage when the inputs, parameters or artifacts changed since the
+    last time that the stage was executed, otherwise the result is read from the artifacts.
+
+    :param stage: Name of the stage.
+    :param create: Function (without arguments) that creates the artifacts and returns
+    the result of the stage.
+    :param load: Function (without arguments) that reads the result of the stage from
+    the artifacts.
+    :param inputs: List of input files.
+    :param params: Dictionary of (json serializable) parameters.
+    :param artifacts: List of files created by the stage.
+    :param force: When true, the stage is always executed.
+    :param filename: Name of the manifest file.
+    :return: The result of `create` when the stage was executed, otherwise the result of `load`.
+    '''
+    artifacts = [] if artifacts is None else artifacts
+
+    fingerprint = fingerprintStage(inputs, params)
+    if not force and isStageCurrent(stage, fingerprint, artifacts, filename):
+        logger.info(f"skipping stage {stage}, inputs have not changed")
+        return load()
+
+    logger.debug(f"executing stage {stage}")
+    result = create()
+    recordStage(stage, fingerprint, artifacts, filename)
+    return result
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def runStage(stage, func, inputs=None, params=None, artifacts=None, force=False,
+             filename=MANIFEST_FILE):
+    '''Execute the stage when the inputs, parameters or artifacts changed since the
+    last time that the stage was executed.
+
+    :param stage: Name of the stage.
+    :param func: Function (without arguments) that creates the artifacts.
+    :param inputs: List of input files.
+    :param params: Dictionary of (json serializable) parameters.
+    :param artifacts: List of files created by the stage.
+    :param force: When true, the stage is always executed.
+    :param filename: Name of the manifest file.
+    :return: True when the stage was executed.
+    '''
+    def _execute():
+        func()
+        return True
+
+    return runCachedStage(
+        stage, _execute, lambda: False, inputs, params, artifacts, force, filename
+    )
+
+
+def readJsonArtifact(artifact, key, default=None):
+    '''Read the value of the key from a json artifact, the default is returned when the
+    artifact does not exist.
+    '''
+    if not exists(artifact):
+        return default
+    with open(artifact, "rb") as jsonFile:
+        return loads(jsonFile.read()).get(key, default)
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def runJsonStage(stage, create, key, artifact, inputs=None, params=None, force=False,
+                 filename=MANIFEST_FILE):
+    '''Execute the stage (see `runCachedStage`) where the result of the stage is saved as
+    the value of the key in a json artifact.
+
+    :param create: Function (without arguments) that returns the (json serializable) result.
+    :param key: Key of the result in the artifact.
+    :param artifact: Filename of the json artifact.
+    '''
+    def _create():
+        result = create()
+        _createSaveDir()
+        with open(artifact, "w") as jsonFile:
+            jsonFile.write(dumps({key: result}, indent=2))
+        return result
+
+    return runCachedStage(
+        stage, _create, lambda: readJsonArtifact(artifact, key), inputs, params, [artifact],
+        force, filename
+    )
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def runDataFrameStage(stage, create, artifact, inputs=None, params=None, force=False,
+                      filename=MANIFEST_FILE):
+    '''Execute the stage (see `runCachedStage`) where the result of the stage is a
+    dataframe that is saved (pickled) as the artifact.
+
+    :param create: Function (without arguments) that returns the dataframe.
+    :param artifact: Filename of the pickled dataframe.
+    '''
+    def _create():
+        result = create()
+        _createSaveDir()
+        result.to_pickle(artifact)
+        return result
+
+    return runCachedStage(
+        stage, _create, lambda: pd.read_pickle(artifact), inputs, params, [artifact],
+        force, filename
+    )
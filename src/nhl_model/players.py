@@ -0,0 +1,293 @@
+"""Columnar store of the player level statistics for each game. The box scores
+contain a record for every player in the game (see `parsePlayerGamesNew`), but the
+dataset only keeps the team totals. The store keeps the player records in compact numpy
+arrays so that player level features can be calculated for all records at once.
+"""
+from logging import getLogger
+from os import remove
+import numpy as np
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Columns (and types) of the store
+PLAYER_STORE_COLUMNS = {
+    "playerId": np.int32,
+    "teamId": np.int16,
+    "gameId": np.int64,
+    "toi": np.int32,
+    "points": np.int16,
+    "shotsAgainst": np.int16,
+    "saves": np.int16,
+    "isGoalie": np.bool_,
+}
+
+
+def _timeOnIceSeconds(timeOnIce):
+    '''Convert the time on ice (mm:ss) to seconds.'''
+    spTOI = timeOnIce.split(":")
+    return int(spTOI[0]) * 60 + int(spTOI[1])
+
+
+def _findPlayerByGameStats(boxscore):
+    '''The player data can be found at the top level of the box score or
+    in the nested `boxscore` depending on the endpoint used to pull the data.
+    '''
+    if "playerByGameStats" in boxscore:
+        return boxscore["playerByGameStats"]
+    return boxscore.get("boxscore", {}).get("playerByGameStats", {})
+
+
+def parsePlayerGamesNew(boxscore):
+    '''Parse the record of each player that played in the game (new version of
+    the API). Players without time on ice are skipped. Each record contains the
+    following values:
+    - gameId, playerId, teamId, position
+    - toi (seconds)
+    - goals, assists, points, shots (skaters)
+    - shotsAgainst, saves (goalies)
+    '''
+    playerByGameStats = _findPlayerByGameStats(boxscore)
+
+    records = []
+    for side in ("homeTeam", "awayTeam"):
+        teamId = boxscore[side]["id"]
+
+        for playerType, playerValues in playerByGameStats.get(side, {}).items():
+            for playerData in playerValues:
+                timeOnIce = _timeOnIceSeconds(playerData["toi"])
+                if timeOnIce <= 0:
+                    continue
+
+                record = {
+                    "gameId": boxscore["id"],
+                    "playerId": playerData["playerId"],
+                    "teamId": teamId,
+                    "position": playerData.get("position"),
+                    "toi": timeOnIce,
+                    "goals": playerData.get("goals", 0),
+                    "assists": playerData.get("assists", 0),
+                    "points": playerData.get("points", 0),
+                    "shots": playerData.get("shots", 0),
+                    "shotsAgainst": 0,
+                    "saves": 0,
+                }
+
+                if playerType in ("goalies",):
+                    spPD = playerData.get("saveShotsAgainst", "").split("/")
+                    if len(spPD) == 2:
+                        record["saves"] = int(spPD[0])
+                        record["shotsAgainst"] = int(spPD[1])
+
+                records.append(record)
+
+    return records
+
+
+def _groupStarts(keys):
+    '''Find the index where each group starts for the sorted keys.
+
+    :return: Array containing the start index of the group for each element.
+    '''
+    changed = np.ones(len(keys), dtype=bool)
+    for key in keys.T if keys.ndim > 1 else [keys]:
+        changed[1:] &= key[1:] == key[:-1]
+    changed = ~changed
+    changed[0:1] = True
+    starts = np.flatnonzero(changed)
+    return starts[np.cumsum(changed) - 1]
+
+
+class PlayerStatStore:
+    '''Columnar store of the player statistics for each game. Each record contains the
+    values found in `PLAYER_STORE_COLUMNS`. The records for a player or team can be found
+    through the per player and per team indexes.
+    '''
+
+    def __init__(self, columns=None):
+        _columns = columns or {}
+        self.columns = {
+            name: np.asarray(_columns.get(name, []), dtype=dtype)
+            for name, dtype in PLAYER_STORE_COLUMNS.items()
+        }
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.columns["gameId"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def fromRecords(cls, records):
+        '''Create the store from a list of player records (see `parsePlayerGamesNew`).'''
+        columns = {name: [] for name in PLAYER_STORE_COLUMNS}
+        for record in records:
+            for name in PLAYER_STORE_COLUMNS:
+                if name == "isGoalie":
+                    columns[name].append(record.get("position") == "G")
+                else:
+                    columns[name].append(record.get(name) or 0)
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, stores):
+        '''Combine multiple stores into a single store.'''
+        stores = list(stores)
+        if not stores:
+            return cls()
+        return cls({
+            name: np.concatenate([store.columns[name] for store in stores])
+            for name in PLAYER_STORE_COLUMNS
+        })
+
+    def save(self, filename):
+        '''Save the store to a (compressed) numpy file.'''
+        np.savez_compressed(filename, **self.columns)
+        logger.debug(f"saved {len(self)} player records to {filename}")
+
+    @classmethod
+    def load(cls, filename):
+        '''Load the store from a file created with `save`.'''
+        with np.load(filename) as data:
+            return cls({name: data[name] for name in PLAYER_STORE_COLUMNS})
+
+    def _index(self, column):
+        '''Build (once) the index for the column. The index maps each value to the
+        rows for that value sorted by gameId.
+        '''
+        if column not in self._indexes:
+            values = self.columns[column]
+            order = np.lexsort((self.columns["gameId"], values))
+            uniqueValues, starts = np.unique(values[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            self._indexes[column] = {
+                value: order[start:end] for value, start, end in
+                zip(uniqueValues.tolist(), starts, ends)
+            }
+        return self._indexes[column]
+
+    def playerRows(self, playerId):
+        '''Get the rows for the player sorted by gameId.'''
+        return self._index("playerId").get(playerId, np.array([], dtype=np.int64))
+
+    def teamRows(self, teamId):
+        '''Get the rows for the team sorted by gameId.'''
+        return self._index("teamId").get(teamId, np.array([], dtype=np.int64))
+
+    def select(self, rows):
+        '''Get the values of all columns for the rows.'''
+        return {name: values[rows] for name, values in self.columns.items()}
+
+    def goalieForm(self, window=5):
+        '''Calculate the save percentage of each goalie over the previous `window` games
+        played (before the game of each record).
+
+        :return: Array with a value for every record in the store. The value is NaN
+        for skaters and for goalies without shots against in the previous games.
+        '''
+        form = np.full(len(self), np.nan)
+
+        goalieRows = np.flatnonzero(self.columns["isGoalie"])
+        if len(goalieRows) == 0:
+            return form
+
+        order = goalieRows[np.lexsort((
+            self.columns["gameId"][goalieRows], self.columns["playerId"][goalieRows]
+        ))]
+        players = self.columns["playerId"][order]
+        groupStarts = _groupStarts(players)
+        position = np.arange(len(order)) - groupStarts
+
+        def _priorWindowSum(values):
+            # sum of the values before each record in the group
+            priorSum = np.cumsum(values) - values
+            priorSum = priorSum - priorSum[groupStarts]
+            lagged = np.where(
+                position >= window, priorSum[np.maximum(np.arange(len(order)) - window, 0)], 0
+            )
+            return priorSum - lagged
+
+        saves = _priorWindowSum(self.columns["saves"][order].astype(np.int64))
+        shotsAgainst = _priorWindowSum(self.columns["shotsAgainst"][order].astype(np.int64))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            form[order] = np.where(
+                shotsAgainst > 0, np.round(saves / shotsAgainst * 100.0, 2), np.nan
+            )
+        return form
+
+    def topLineToi(self, numPlayers=6):
+        '''Calculate the total time on ice (seconds) of the `numPlayers` skaters with the
+        most time on ice for each team in each game.
+
+        :return: game ids, team ids and total time on ice arrays.
+        '''
+        skaterRows = np.flatnonzero(~self.columns["isGoalie"])
+        if len(skaterRows) == 0:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+
+        gameIds = self.columns["gameId"][skaterRows]
+        teamIds = self.columns["teamId"][skaterRows]
+        toi = self.columns["toi"][skaterRows].astype(np.int64)
+
+        order = np.lexsort((-toi, teamIds, gameIds))
+        keys = np.column_stack((gameIds[order], teamIds[order]))
+        groupStarts = _groupStarts(keys)
+        rank = np.arange(len(order)) - groupStarts
+
+        starts = np.unique(groupStarts)
+        groupIds = np.cumsum(np.isin(np.arange(len(order)), starts)) - 1
+        inTopLine = rank < numPlayers
+        totals = np.bincount(groupIds[inTopLine], weights=toi[order][inTopLine],
+                             minlength=len(starts))
+
+        return gameIds[order][starts], teamIds[order][starts], totals.astype(np.int64)
+
+
+class PlayerStoreWriter:
+    '''Write a store to a file one chunk (store) at a time. The values of each column are
+    appended to a temporary file, so only the chunk that is written is held in memory.
+    `close` creates the file in the same format as `PlayerStatStore.save`.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.numRecords = 0
+        self.numChunks = 0
+
+    def _columnFile(self, name):
+        return f"{self.filename}.{name}.tmp"
+
+    def write(self, store):
+        '''Append the records of the store to the file.'''
+        for name in PLAYER_STORE_COLUMNS:
+            # the first chunk replaces the files left over from a previous writer
+            with open(self._columnFile(name), "ab" if self.numChunks else "wb") as columnFile:
+                store.columns[name].tofile(columnFile)
+        self.numRecords += len(store)
+        self.numChunks += 1
+
+    def close(self):
+        '''Save the file, the columns are read back from the temporary files as memory
+        maps. The file is not created when no chunks were written.
+
+        :return: Number of records saved to the file.
+        '''
+        if not self.numChunks:
+            return 0
+
+        columns = {
+            name: np.memmap(self._columnFile(name), dtype=dtype, mode="r")
+            if self.numRecords else np.array([], dtype=dtype)
+            for name, dtype in PLAYER_STORE_COLUMNS.items()
+        }
+        np.savez_compressed(self.filename, **columns)
+        del columns
+        logger.debug(f"saved {self.numRecords} player records to {self.filename}")
+
+        for name in PLAYER_STORE_COLUMNS:
+            remove(self._columnFile(name))
+        return self.numRecords
@@ -1,14 +1,26 @@
 from logging import getLogger
 from requests import get
+import numpy as np
 from nhl_model.dataset import (
     MAX_PLAYOFF_GAMES_PER_SEQUENCE,
     MAX_PLAYOFF_ROUNDS
 )
+from nhl_model.matchups import createMatchupMatrix
+from nhl_model.poisson import getSchedule
+from nhl_model.simulate import seasonConferences, seasonPoints
+from nhl_model.snapshot import updateSnapshot
 
 
 logger = getLogger("nhl_neural_net")
 
 
+# Games of the series (2-2-1-1-1) played at the home of the higher seed
+SERIES_HIGHER_SEED_HOME_GAMES = (0, 1, 4, 6)
+
+# Number of wins required to win a series
+SERIES_WINS_REQUIRED = 4
+
+
 # pylint: disable=R1728
 asciiLetter = lambda r: 97 + sum([2**(MAX_PLAYOFF_ROUNDS-x) for x in range(1, r)])
 
@@ -34,7 +46,7 @@ def createPlayoffMatchup(teamData, higherSeed, lowerSeed):
 
     games = []
     for x in range(MAX_PLAYOFF_GAMES_PER_SEQUENCE):
-        if x in [0,1,4,6]:
+        if x in SERIES_HIGHER_SEED_HOME_GAMES:
             games.append({
                 "homeTeam": higherSeedComplete,
                 "awayTeam": lowerSeedComplete
@@ -138,6 +150,34 @@ def determineSeeds(standings, teamOneTriCode, teamTwoTriCode):
     return teamTwoTriCode, teamOneTriCode
 
 
+def scheduleStandings(year, games, conferences=None):
+    '''Create the standings (see `standings.getStandings`) from the results of the games
+    of a season, so that the standings of any season can be used to seed the playoffs.
+    Teams with the same number of points keep the order of the team ids.
+
+    :param year: Year in which the season started.
+    :param games: List of games in the same format as the schedule files.
+    :param conferences: Dictionary of triCode -> conference, defaults to the alignment of
+    the season (see `simulate.seasonConferences`).
+    '''
+    triCodes = {}
+    for game in games:
+        for side in ("home", "away"):
+            triCodes[game[f"{side}TeamId"]] = game[f"{side}TeamTriCode"]
+
+    _conferences = seasonConferences(year, set(triCodes.values())) if conferences is None \
+        else conferences
+
+    points = seasonPoints(games)
+    ranked = sorted(triCodes, key=lambda x: (-points.get(x, 0), x))
+
+    standings = {"E": {}, "W": {}}
+    for league, teamId in enumerate(ranked, start=1):
+        conference = standings.setdefault(_conferences.get(triCodes[teamId], ""), {})
+        conference[triCodes[teamId]] = {"conf": len(conference) + 1, "league": league}
+    return standings
+
+
 def prepareResultsForNextRound(teamData, standings, previousRoundResults, currentRound):
     '''Prepare the results from the previous round for the current round of the 
     playoffs. The intention is to attempt to predict the winner of the stanley cup.
@@ -172,3 +212,177 @@ def printPlayoffSeries(output, predictionRound):
         loser = min(output[letter], key=output[letter].get)
         print(f"Predicting {winner} defeats {loser} {output[letter][winner]} - "
             f"{output[letter][loser]} in series {predictionRound}.{letter}")
+
+
+def seriesGameProbabilities(higherSeedHomeWin, lowerSeedHomeWin):
+    '''Get the probability that the higher seed wins each game of the series (2-2-1-1-1).
+
+    :param higherSeedHomeWin: Probability that the higher seed wins a home game.
+    :param lowerSeedHomeWin: Probability that the lower seed wins a home game.
+    '''
+    return [
+        higherSeedHomeWin if x in SERIES_HIGHER_SEED_HOME_GAMES else 1.0 - lowerSeedHomeWin
+        for x in range(MAX_PLAYOFF_GAMES_PER_SEQUENCE)
+    ]
+
+
+def seriesProbabilities(gameProbabilities, winsRequired=SERIES_WINS_REQUIRED):
+    '''Calculate the exact probability that the higher seed wins the series. The
+    probability of each (higher seed wins, lower seed wins) state is carried from game
+    to game until one of the teams has the required number of wins.
+
+    :param gameProbabilities: Probability that the higher seed wins each game of the
+    series (see `seriesGameProbabilities`).
+    :return: Probability that the higher seed wins the series, and the (2 x games) array
+    of probabilities that the [higher, lower] seed wins the series in the number of games
+    (the index is the number of games - 1).
+    '''
+    numGames = 2 * winsRequired - 1
+    states = np.zeros((winsRequired, winsRequired))
+    states[0, 0] = 1.0
+    lengths = np.zeros((2, numGames))
+
+    for game, probability in enumerate(gameProbabilities[:numGames]):
+        nextStates = np.zeros_like(states)
+        for higherWins in range(max(0, game - winsRequired + 1), min(game, winsRequired - 1) + 1):
+            lowerWins = game - higherWins
+            state = states[higherWins, lowerWins]
+
+            if higherWins + 1 == winsRequired:
+                lengths[0, game] += state * probability
+            else:
+                nextStates[higherWins + 1, lowerWins] += state * probability
+
+            if lowerWins + 1 == winsRequired:
+                lengths[1, game] += state * (1.0 - probability)
+            else:
+                nextStates[higherWins, lowerWins + 1] += state * (1.0 - probability)
+        states = nextStates
+
+    return lengths[0].sum(), lengths
+
+
+def matchupSeriesProbability(higherSeed, lowerSeed, homeWinProbability):
+    '''Calculate the probability that the higher seed wins the series.
+
+    :param homeWinProbability: Function (home team, away team) that returns the
+    probability that the home team wins the game.
+    '''
+    gameProbabilities = seriesGameProbabilities(
+        homeWinProbability(higherSeed, lowerSeed), homeWinProbability(lowerSeed, higherSeed)
+    )
+    return seriesProbabilities(gameProbabilities)[0]
+
+
+def bracketProbabilities(firstRound, standings, homeWinProbability):
+    '''Calculate the exact probability that each team wins each round of the playoffs.
+    The winners of consecutive series (a and b, c and d, ...) meet in the next round (see
+    `prepareResultsForNextRound`), and every possible matchup is weighted by the
+    probability that both teams reach it.
+
+    :param firstRound: Dictionary of letter -> (higher seed, lower seed) for the first round.
+    :param standings: Standings used to seed the later rounds (see `determineSeeds`).
+    :param homeWinProbability: Function (home team, away team) that returns the
+    probability that the home team wins the game.
+    :return: Dictionary of team -> list of the probabilities to win each round.
+    '''
+    seriesCache = {}
+
+    def _seriesProbability(higherSeed, lowerSeed):
+        if (higherSeed, lowerSeed) not in seriesCache:
+            seriesCache[(higherSeed, lowerSeed)] = matchupSeriesProbability(
+                higherSeed, lowerSeed, homeWinProbability
+            )
+        return seriesCache[(higherSeed, lowerSeed)]
+
+    # probability of each team winning the series for each slot in the bracket
+    slots = []
+    for letter in sorted(firstRound):
+        higherSeed, lowerSeed = firstRound[letter]
+        probability = _seriesProbability(higherSeed, lowerSeed)
+        slots.append({higherSeed: probability, lowerSeed: 1.0 - probability})
+
+    rounds = [slots]
+    while len(slots) > 1:
+        nextSlots = []
+        for topSlot, bottomSlot in zip(slots[::2], slots[1::2]):
+            winners = {team: 0.0 for team in list(topSlot) + list(bottomSlot)}
+            for topTeam, topProbability in topSlot.items():
+                for bottomTeam, bottomProbability in bottomSlot.items():
+                    higherSeed, lowerSeed = determineSeeds(standings, topTeam, bottomTeam)
+                    probability = _seriesProbability(higherSeed, lowerSeed)
+                    reached = topProbability * bottomProbability
+                    winners[higherSeed] += reached * probability
+                    winners[lowerSeed] += reached * (1.0 - probability)
+            nextSlots.append(winners)
+        slots = nextSlots
+        rounds.append(slots)
+
+    teams = [team for slot in rounds[0] for team in slot]
+    return {
+        team: [sum(slot.get(team, 0.0) for slot in roundSlots) for roundSlots in rounds]
+        for team in teams
+    }
+
+
+def firstRoundSeeds(metadata):
+    '''Get the (higher seed, lower seed) triCodes for each series of the playoff metadata
+    (see `getPlayoffMetadata`). The higher seed is the home team of the first game.
+    '''
+    return {
+        letter: (matchup["games"][0]["homeTeam"]["triCode"],
+                 matchup["games"][0]["awayTeam"]["triCode"])
+        for letter, matchup in (metadata or {}).items() if matchup
+    }
+
+
+def printSeriesProbabilities(seeds, homeWinProbability):
+    '''Print the probability that each team wins the series and the number of games.
+
+    :param seeds: Dictionary of letter -> (higher seed, lower seed).
+    :param homeWinProbability: Function (home team, away team) that returns the
+    probability that the home team wins the game.
+    '''
+    numGames = MAX_PLAYOFF_GAMES_PER_SEQUENCE
+    lengthColumns = range(SERIES_WINS_REQUIRED, numGames + 1)
+    print(f"{'series':>6} {'team':>6} {'win':>8} " +
+          " ".join(f"{'in ' + str(x):>7}" for x in lengthColumns))
+    for letter, (higherSeed, lowerSeed) in sorted(seeds.items()):
+        probability, lengths = seriesProbabilities(seriesGameProbabilities(
+            homeWinProbability(higherSeed, lowerSeed), homeWinProbability(lowerSeed, higherSeed)
+        ))
+        for team, teamProbability, teamLengths in (
+            (higherSeed, probability, lengths[0]), (lowerSeed, 1.0 - probability, lengths[1])
+        ):
+            print(f"{letter:>6} {team:>6} {teamProbability * 100.0:>7.2f}% " +
+                  " ".join(f"{teamLengths[x - 1] * 100.0:>6.2f}%" for x in lengthColumns))
+
+
+def printBracketProbabilities(probabilities):
+    '''Print the probability (percent) that each team wins each round of the playoffs.'''
+    numRounds = max((len(x) for x in probabilities.values()), default=0)
+    print(f"{'team':>6} " + " ".join(f"{'round ' + str(x + 1):>8}" for x in range(numRounds)))
+    for team, rounds in sorted(probabilities.items(), key=lambda x: -x[1][-1]):
+        print(f"{team:>6} " + " ".join(f"{x * 100.0:>7.2f}%" for x in rounds))
+
+
+def execPlayoffProbabilities(year, predictionRound=1):
+    '''Print the exact series and bracket probabilities for the round of the playoffs.
+    The probabilities of every matchup are read from the matchup matrix of the regular
+    season, so the model is not executed for each round. The later rounds are seeded with
+    the standings of the regular season (see `scheduleStandings`).
+    '''
+    metadata = getPlayoffMetadata(year, predictionRound)
+    snapshot = updateSnapshot(int(year) - 1)
+    if snapshot is None:
+        return
+
+    homeWinProbability = createMatchupMatrix(snapshot).homeWinProbability
+    seeds = firstRoundSeeds(metadata)
+    printSeriesProbabilities(seeds, homeWinProbability)
+    printBracketProbabilities(
+        bracketProbabilities(
+            seeds, scheduleStandings(int(year) - 1, getSchedule(int(year) - 1) or []),
+            homeWinProbability
+        )
+    )
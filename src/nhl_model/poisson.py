@@ -1,17 +1,27 @@
-from json import loads
+from functools import lru_cache
+from json import dumps, loads
 from logging import getLogger
 from os.path import dirname, abspath, join as path_join, exists
 from statistics import mean
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
 import inquirer
-from scipy.stats import poisson
+import numpy as np
+from scipy.stats import poisson, skellam
 from nhl_model.event import Game
+from nhl_model.schedules import loadScheduleArchive, loadSeasonSchedule
 
 
 logger = getLogger("nhl_neural_net")
 
 
+# Table of the season end strengths for every season (see `createSeasonStrengthsTable`)
+SEASON_STRENGTHS_FILE = path_join(*[dirname(abspath(__file__)), "support", "season_strengths.json"])
+
+# Maximum number of parsed seasons held in memory (see `parseSeasonEvents`)
+SEASON_CACHE_SIZE = 8
+
+
 def parsePoissonArguments():
     """Parse the arguements for the program by reading in the static file that
     contains the basic statistics for all teams and all seasons.
@@ -36,11 +46,7 @@ def readStatisticsFile(dirList):
     file is called `NhlYearlyStatistics.json` and lives in the support
     directory of the current project.
     """
-    _currDir = dirname(abspath(__file__))
-    splitDir = _currDir.split("/")
-    splitDir = splitDir[:-1] + dirList
-
-    filename = "/" + path_join(*splitDir)
+    filename = path_join(*([dirname(abspath(__file__))] + dirList))
     if not exists(filename):
         return None
 
@@ -51,10 +57,19 @@ def readStatisticsFile(dirList):
 
 
 def getSchedule(year):
-    """Read the schedule file (json) from a specific file location. The files are located
-    in a subdirectory named for the year or beginning year for the season.
+    """Read the schedule for a specific season. The schedule is read from the packed
+    schedule archive (see `schedules.py`) when the season is present. Otherwise, the
+    schedule file (json) is read from a subdirectory named for the year or beginning
+    year for the season. Seasons that are not packaged (the current season) are read
+    from the schedule built from the ingested games (see `schedules.appendSeasonSchedule`).
     """
+    archive = loadScheduleArchive()
+    if archive is not None and int(year) in archive:
+        return archive.schedule(int(year))
+
     jsonData = readStatisticsFile(["support", "schedules", str(year), "schedule.json"])
+    if jsonData is None:
+        jsonData = loadSeasonSchedule(int(year))
     return jsonData
 
 
@@ -154,6 +169,465 @@ def calculateScores(teamIds, homeTeamEvents, awayTeamEvents):
     return scores
 
 
+# Names of the totals (per team and league) stored by the `StrengthAccumulator`
+_ACCUMULATOR_TEAM_TOTALS = (
+    "homeGoalsFor", "homeGoalsAgainst", "homeGames", "awayGoalsFor", "awayGoalsAgainst", "awayGames"
+)
+_ACCUMULATOR_LEAGUE_TOTALS = ("totalHomeGoals", "totalAwayGoals", "numGames", "maxGoals")
+
+
+class StrengthAccumulator:
+    '''Running totals of the goals scored by each team during home and away games as
+    well as the league totals. Each game is added once (O(1)), and the strengths are
+    read from the totals rather than rescanning every game that has been played. The
+    values are equal to those from `calculateScores`, `calculateAvgGoals` and
+    `findMaxGoalsScored` for the same games.
+    '''
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self):
+        self.homeGoalsFor = defaultdict(int)
+        self.homeGoalsAgainst = defaultdict(int)
+        self.homeGames = defaultdict(int)
+        self.awayGoalsFor = defaultdict(int)
+        self.awayGoalsAgainst = defaultdict(int)
+        self.awayGames = defaultdict(int)
+
+        self.totalHomeGoals = 0
+        self.totalAwayGoals = 0
+        self.numGames = 0
+        self.maxGoals = 0
+
+    def addGame(self, homeTeamId, awayTeamId, homeGoals, awayGoals):
+        '''Add the result of a game to the totals.'''
+        self.homeGoalsFor[homeTeamId] += homeGoals
+        self.homeGoalsAgainst[homeTeamId] += awayGoals
+        self.homeGames[homeTeamId] += 1
+        self.awayGoalsFor[awayTeamId] += awayGoals
+        self.awayGoalsAgainst[awayTeamId] += homeGoals
+        self.awayGames[awayTeamId] += 1
+
+        self.totalHomeGoals += homeGoals
+        self.totalAwayGoals += awayGoals
+        self.numGames += 1
+        self.maxGoals = max(self.maxGoals, homeGoals, awayGoals)
+
+    def addEvent(self, gameObj):
+        '''Add the result of a `Game` to the totals.'''
+        self.addGame(
+            gameObj.homeTeamId,
+            gameObj.awayTeamId,
+            gameObj.homeTeamGoalsActual,
+            gameObj.awayTeamGoalsActual
+        )
+
+    @property
+    def teamIds(self):
+        '''Set of all teams that have played a game.'''
+        return set(self.homeGames.keys()) | set(self.awayGames.keys())
+
+    def hasHomeGames(self, teamId):
+        '''Returns true when the team has played a home game.'''
+        return self.homeGames.get(teamId, 0) > 0
+
+    def hasAwayGames(self, teamId):
+        '''Returns true when the team has played an away game.'''
+        return self.awayGames.get(teamId, 0) > 0
+
+    def averageGoals(self):
+        '''Get the average number of home and away goals (see `calculateAvgGoals`).'''
+        if self.numGames == 0:
+            return 0.0, 0.0
+        return self.totalHomeGoals / self.numGames, self.totalAwayGoals / self.numGames
+
+    def homeAverages(self, teamId):
+        '''Get the average goals for and against the team during home games.'''
+        numGames = self.homeGames[teamId]
+        return self.homeGoalsFor[teamId] / numGames, self.homeGoalsAgainst[teamId] / numGames
+
+    def awayAverages(self, teamId):
+        '''Get the average goals for and against the team during away games.'''
+        numGames = self.awayGames[teamId]
+        return self.awayGoalsFor[teamId] / numGames, self.awayGoalsAgainst[teamId] / numGames
+
+    def teamScores(self, teamId):
+        '''Get the home and away attack and defense strengths of the team (see
+        `calculateScores`). When any of the values is None, the value could not be calculated.
+        '''
+        avgGoalsScoredHomeTotal, avgGoalsScoredAwayTotal = self.averageGoals()
+
+        teamScores = {
+            "homeAttackStrength": None,
+            "homeDefenseStrength": None,
+            "awayAttackStrength": None,
+            "awayDefenseStrength": None
+        }
+
+        if self.hasHomeGames(teamId):
+            goalsFor, goalsAgainst = self.homeAverages(teamId)
+            teamScores["homeAttackStrength"] = goalsFor / avgGoalsScoredHomeTotal
+            teamScores["homeDefenseStrength"] = goalsAgainst / avgGoalsScoredAwayTotal
+
+        if self.hasAwayGames(teamId):
+            goalsFor, goalsAgainst = self.awayAverages(teamId)
+            teamScores["awayAttackStrength"] = goalsFor / avgGoalsScoredAwayTotal
+            teamScores["awayDefenseStrength"] = goalsAgainst / avgGoalsScoredHomeTotal
+
+        return teamScores
+
+    def scores(self, teamIds):
+        '''Get the strengths for each of the teams (see `calculateScores`).'''
+        return {teamId: self.teamScores(teamId) for teamId in teamIds}
+
+    def seasonStrengths(self):
+        '''Get the strengths of all teams and the league values from the totals.'''
+        return SeasonStrengths(
+            self.scores(self.teamIds), self.averageGoals(), self.maxGoals
+        )
+
+    @property
+    def json(self):
+        '''Return a dictionary that contains a valid json representation of the totals.'''
+        jsonData = {
+            name: {str(k): v for k, v in getattr(self, name).items()}
+            for name in _ACCUMULATOR_TEAM_TOTALS
+        }
+        jsonData.update({name: getattr(self, name) for name in _ACCUMULATOR_LEAGUE_TOTALS})
+        return jsonData
+
+    @classmethod
+    def fromJson(cls, jsonData):
+        '''Create an instance from the json representation of the totals.'''
+        accumulator = cls()
+        for name in _ACCUMULATOR_TEAM_TOTALS:
+            getattr(accumulator, name).update(
+                {int(k): v for k, v in jsonData.get(name, {}).items()}
+            )
+        for name in _ACCUMULATOR_LEAGUE_TOTALS:
+            setattr(accumulator, name, jsonData.get(name, 0))
+        return accumulator
+
+
+class DecayedStrengthAccumulator(StrengthAccumulator):
+    '''Strength totals where the games of each team are weighted by recency. The weight
+    of a game is halved after every `halfLife` games that the team has played since (home
+    and away games are counted separately). The league averages are not weighted.
+
+    Rather than decaying every previous game, each new game of a team receives a weight
+    that is larger than the previous by the growth factor. The averages are the ratio of
+    the weighted sums, so the result is the same and each game is still added in O(1).
+    '''
+
+    # the weighted sums of a team are rescaled when the next weight exceeds this value
+    _RESCALE_LIMIT = 1e100
+
+    def __init__(self, halfLife):
+        if halfLife <= 0:
+            raise ValueError(f"half life must be positive, received {halfLife}")
+        super().__init__()
+        self.halfLife = halfLife
+        self.growth = 2.0 ** (1.0 / halfLife)
+        # team id -> [weighted goals for, weighted goals against, sum of weights, next weight]
+        self._homeWeighted = {}
+        self._awayWeighted = {}
+
+    def _addWeighted(self, weighted, teamId, goalsFor, goalsAgainst):
+        sums = weighted.setdefault(teamId, [0.0, 0.0, 0.0, 1.0])
+        weight = sums[3]
+        sums[0] += weight * goalsFor
+        sums[1] += weight * goalsAgainst
+        sums[2] += weight
+        sums[3] = weight * self.growth
+        if sums[3] > self._RESCALE_LIMIT:
+            weighted[teamId] = [x / self._RESCALE_LIMIT for x in sums]
+
+    def addGame(self, homeTeamId, awayTeamId, homeGoals, awayGoals):
+        super().addGame(homeTeamId, awayTeamId, homeGoals, awayGoals)
+        self._addWeighted(self._homeWeighted, homeTeamId, homeGoals, awayGoals)
+        self._addWeighted(self._awayWeighted, awayTeamId, awayGoals, homeGoals)
+
+    def homeAverages(self, teamId):
+        goalsFor, goalsAgainst, weights, _ = self._homeWeighted[teamId]
+        return goalsFor / weights, goalsAgainst / weights
+
+    def awayAverages(self, teamId):
+        goalsFor, goalsAgainst, weights, _ = self._awayWeighted[teamId]
+        return goalsFor / weights, goalsAgainst / weights
+
+
+class WindowStrengthAccumulator(StrengthAccumulator):
+    '''Strength totals where only the most recent `window` home (away) games of each
+    team are used for the home (away) strengths. The league averages use all games.
+    The sums of each team are updated as games enter and leave the window, so each
+    game is added in O(1).
+    '''
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError(f"window must contain at least one game, received {window}")
+        super().__init__()
+        self.window = int(window)
+        # team id -> [goals for, goals against, games in the window]
+        self._homeWindow = {}
+        self._awayWindow = {}
+
+    def _addWindowed(self, windows, teamId, goalsFor, goalsAgainst):
+        if teamId not in windows:
+            windows[teamId] = [0, 0, deque(maxlen=self.window)]
+        sums = windows[teamId]
+        games = sums[2]
+        if len(games) == self.window:
+            droppedFor, droppedAgainst = games[0]
+            sums[0] -= droppedFor
+            sums[1] -= droppedAgainst
+        games.append((goalsFor, goalsAgainst))
+        sums[0] += goalsFor
+        sums[1] += goalsAgainst
+
+    def addGame(self, homeTeamId, awayTeamId, homeGoals, awayGoals):
+        super().addGame(homeTeamId, awayTeamId, homeGoals, awayGoals)
+        self._addWindowed(self._homeWindow, homeTeamId, homeGoals, awayGoals)
+        self._addWindowed(self._awayWindow, awayTeamId, awayGoals, homeGoals)
+
+    def homeAverages(self, teamId):
+        goalsFor, goalsAgainst, games = self._homeWindow[teamId]
+        return goalsFor / len(games), goalsAgainst / len(games)
+
+    def awayAverages(self, teamId):
+        goalsFor, goalsAgainst, games = self._awayWindow[teamId]
+        return goalsFor / len(games), goalsAgainst / len(games)
+
+
+class AdjustedStrengthAccumulator(StrengthAccumulator):
+    '''Opponent adjusted strengths. The goals of each game are modeled as
+
+        homeGoals ~ Poisson(avgHomeGoals * homeAttack[home] * awayDefense[away])
+        awayGoals ~ Poisson(avgAwayGoals * awayAttack[away] * homeDefense[home])
+
+    and the strengths are the maximum likelihood solution found with (vectorized)
+    iterative proportional fitting over all games of the season. Each team also receives
+    `shrinkage` games against an average opponent so that the strengths of teams with
+    few games are pulled toward 1.0.
+
+    The solution is refit when the strengths are read after a game is added. The refit
+    is warm started from the previous solution, so only a few iterations are required.
+    '''
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, shrinkage=1.0, maxIterations=10, tolerance=1e-4):
+        super().__init__()
+        self.shrinkage = shrinkage
+        self.maxIterations = maxIterations
+        self.tolerance = tolerance
+
+        self._teamIndex = {}
+        # games: home team index, away team index, home goals, away goals
+        self._games = np.zeros((64, 4), dtype=np.int64)
+        # strengths: home attack, home defense, away attack, away defense
+        self._strengths = np.ones((4, 0))
+        self._stale = False
+        self.iterations = 0
+
+    def _index(self, teamId):
+        if teamId not in self._teamIndex:
+            self._teamIndex[teamId] = len(self._teamIndex)
+            self._strengths = np.hstack((self._strengths, np.ones((4, 1))))
+        return self._teamIndex[teamId]
+
+    def addGame(self, homeTeamId, awayTeamId, homeGoals, awayGoals):
+        super().addGame(homeTeamId, awayTeamId, homeGoals, awayGoals)
+        if self.numGames > len(self._games):
+            self._games = np.vstack((self._games, np.zeros_like(self._games)))
+        self._games[self.numGames - 1] = (
+            self._index(homeTeamId), self._index(awayTeamId), homeGoals, awayGoals
+        )
+        self._stale = True
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def _fitSide(self, goals, attackTeams, defenseTeams, attack, defense, avgGoals):
+        '''Single iteration for one side (home or away goals) of the games. The attack
+        and defense arrays are updated in place.
+        '''
+        numTeams = len(attack)
+        prior = self.shrinkage * avgGoals
+        goalsFor = np.bincount(attackTeams, weights=goals, minlength=numTeams)
+        goalsAgainst = np.bincount(defenseTeams, weights=goals, minlength=numTeams)
+
+        expected = np.bincount(attackTeams, weights=defense[defenseTeams], minlength=numTeams)
+        attack[:] = (goalsFor + prior) / (avgGoals * expected + prior)
+        expected = np.bincount(defenseTeams, weights=attack[attackTeams], minlength=numTeams)
+        defense[:] = (goalsAgainst + prior) / (avgGoals * expected + prior)
+
+        # the model only depends on the product of the attack and defense, the
+        # average attack (per game) is kept at 1.0
+        scale = attack[attackTeams].mean()
+        attack /= scale
+        defense *= scale
+
+    def solve(self, maxIterations=None):
+        '''Refit the strengths to all games that have been added.
+
+        :param maxIterations: Maximum number of iterations, defaults to `maxIterations`.
+        :return: Number of iterations performed.
+        '''
+        self._stale = False
+        if self.numGames == 0:
+            return 0
+
+        avgHomeGoals, avgAwayGoals = self.averageGoals()
+        games = self._games[:self.numGames]
+        homeTeams, awayTeams = games[:, 0], games[:, 1]
+        homeGoals, awayGoals = games[:, 2].astype(float), games[:, 3].astype(float)
+        homeAttack, homeDefense, awayAttack, awayDefense = self._strengths
+
+        iterations = 0
+        for iterations in range(1, (maxIterations or self.maxIterations) + 1):
+            previous = self._strengths.copy()
+            if avgHomeGoals > 0:
+                self._fitSide(
+                    homeGoals, homeTeams, awayTeams, homeAttack, awayDefense, avgHomeGoals
+                )
+            if avgAwayGoals > 0:
+                self._fitSide(
+                    awayGoals, awayTeams, homeTeams, awayAttack, homeDefense, avgAwayGoals
+                )
+            if np.max(np.abs(self._strengths - previous)) < self.tolerance:
+                break
+
+        self.iterations += iterations
+        return iterations
+
+    def _teamStrengths(self, teamId):
+        if self._stale:
+            self.solve()
+        return self._strengths[:, self._teamIndex[teamId]]
+
+    def homeAverages(self, teamId):
+        homeAttack, homeDefense, _, _ = self._teamStrengths(teamId)
+        avgHomeGoals, avgAwayGoals = self.averageGoals()
+        return homeAttack * avgHomeGoals, homeDefense * avgAwayGoals
+
+    def awayAverages(self, teamId):
+        _, _, awayAttack, awayDefense = self._teamStrengths(teamId)
+        avgHomeGoals, avgAwayGoals = self.averageGoals()
+        return awayAttack * avgAwayGoals, awayDefense * avgHomeGoals
+
+
+def createStrengthAccumulator(halfLife=None, window=None, adjusted=False):
+    '''Create the accumulator for the strength mode. By default, every game of the
+    season has the same weight.
+
+    :param halfLife: When provided, the games are weighted by recency with this
+    half life (number of games), see `DecayedStrengthAccumulator`.
+    :param window: When provided, only the most recent number of games are used,
+    see `WindowStrengthAccumulator`.
+    :param adjusted: When true, the strengths are adjusted for the strength of the
+    opponents, see `AdjustedStrengthAccumulator`.
+    '''
+    if sum([halfLife is not None, window is not None, bool(adjusted)]) > 1:
+        raise ValueError("only one of the half life, window or adjusted modes can be selected")
+    if halfLife is not None:
+        return DecayedStrengthAccumulator(halfLife)
+    if window is not None:
+        return WindowStrengthAccumulator(window)
+    if adjusted:
+        return AdjustedStrengthAccumulator()
+    return StrengthAccumulator()
+
+
+class SeasonStrengths:
+    '''The strengths of each team (see `calculateScores`), the average home and away
+    goals (see `calculateAvgGoals`) and the maximum goals scored (see `findMaxGoalsScored`)
+    at the end of a season. These are the priors used for the following season.
+    '''
+
+    def __init__(self, scores, averageGoals, maxGoals):
+        self.scores = scores
+        self.averageGoals = tuple(averageGoals)
+        self.maxGoals = maxGoals
+
+    @property
+    def json(self):
+        '''Return a dictionary that contains a valid json representation of the instance.'''
+        return {
+            "scores": {str(k): v for k, v in self.scores.items()},
+            "averageGoals": list(self.averageGoals),
+            "maxGoals": self.maxGoals,
+        }
+
+    @classmethod
+    def fromJson(cls, jsonData):
+        '''Create an instance from the json representation.'''
+        return cls(
+            {int(k): v for k, v in jsonData["scores"].items()},
+            jsonData["averageGoals"],
+            jsonData["maxGoals"]
+        )
+
+    @classmethod
+    def fromSchedule(cls, schedule):
+        '''Calculate the season end strengths from the schedule (json).'''
+        accumulator = StrengthAccumulator()
+        if schedule and isinstance(schedule, list):
+            for game in schedule:
+                accumulator.addGame(
+                    game["homeTeamId"],
+                    game["awayTeamId"],
+                    game["homeTeamGoalsActual"],
+                    game["awayTeamGoalsActual"]
+                )
+        return accumulator.seasonStrengths()
+
+
+def createSeasonStrengthsTable(years=None, filename=SEASON_STRENGTHS_FILE):
+    '''Calculate the season end strengths for every season and save them to a single
+    table (json). By default all seasons in the schedule archive are included.
+
+    :return: List of seasons in the table.
+    '''
+    if years is None:
+        archive = loadScheduleArchive()
+        years = archive.seasons if archive is not None else []
+
+    table = {}
+    for year in years:
+        schedule = getSchedule(year)
+        if schedule is not None:
+            table[str(year)] = SeasonStrengths.fromSchedule(schedule).json
+
+    with open(filename, "w") as jsonFile:
+        jsonFile.write(dumps(table))
+
+    loadSeasonStrengthsTable.cache_clear()
+    return [int(x) for x in table]
+
+
+@lru_cache(maxsize=1)
+def loadSeasonStrengthsTable(filename=SEASON_STRENGTHS_FILE):
+    '''Load (once) the table of season end strengths.'''
+    if not exists(filename):
+        return {}
+    with open(filename, "rb") as jsonFile:
+        return {int(k): SeasonStrengths.fromJson(v) for k, v in loads(jsonFile.read()).items()}
+
+
+def getSeasonStrengths(year):
+    '''Get the season end strengths for the season. The strengths are read from the
+    precomputed table, when the season is not in the table they are calculated from the
+    schedule. None is returned when the schedule could not be found.
+    '''
+    table = loadSeasonStrengthsTable()
+    if int(year) in table:
+        return table[int(year)]
+
+    schedule = getSchedule(year)
+    if schedule is None:
+        return None
+    return SeasonStrengths.fromSchedule(schedule)
+
+
 def findMaxGoalsScored(events):
     '''Get the maximum number of goals scored based on the games provided.'''
     goalsScored = []
@@ -163,6 +637,87 @@ def findMaxGoalsScored(events):
     return max(goalsScored) if len(goalsScored) > 0 else 0
 
 
+def poissonPMF(expectedGoals, maxGoals):
+    """Calculate the probability of scoring 0 to `maxGoals` goals for each of the
+    expected goal values.
+
+    :param expectedGoals: Expected goals (scalar or array) for each game.
+    :param maxGoals: Maximum number of goals (scalar or array with a value per game). When
+    an array is provided the probabilities above the value for each game are 0.
+    :return: Array (number of games x (max of maxGoals) + 1) of probabilities.
+    """
+    expectedGoals = np.atleast_1d(np.asarray(expectedGoals, dtype=float))
+    maxGoals = np.broadcast_to(np.asarray(maxGoals, dtype=int), expectedGoals.shape)
+
+    goals = np.arange(int(maxGoals.max(initial=0)) + 1)
+    pmf = poisson.pmf(goals[np.newaxis, :], mu=expectedGoals[:, np.newaxis])
+    return np.where(goals[np.newaxis, :] <= maxGoals[:, np.newaxis], pmf, 0.0)
+
+
+def outcomeProbabilities(maxGoals, homeTeamGoalsPredicted, awayTeamGoalsPredicted):
+    """Calculate the win and regulation tie probabilities for any number of games at
+    once. The joint probability of each score is the outer product of the home and away
+    probabilities, the home team wins when the score is below the diagonal, the away
+    team wins when the score is above the diagonal and the diagonal is a tie. Scores
+    above `maxGoals` are not included (see `skellamProbabilities`).
+
+    :param maxGoals: Maximum number of goals (scalar or array with a value per game).
+    :param homeTeamGoalsPredicted: Expected home goals (scalar or array).
+    :param awayTeamGoalsPredicted: Expected away goals (scalar or array).
+    :return: home win, away win and regulation tie probabilities (arrays), as well as
+    the home and away probability arrays (see `poissonPMF`).
+    """
+    homePMF = poissonPMF(homeTeamGoalsPredicted, maxGoals)
+    awayPMF = poissonPMF(awayTeamGoalsPredicted, maxGoals)
+
+    # joint[game, home goals, away goals]
+    joint = homePMF[:, :, np.newaxis] * awayPMF[:, np.newaxis, :]
+
+    homeTeamWinCalc = np.tril(joint, k=-1).sum(axis=(1, 2))
+    awayTeamWinCalc = np.triu(joint, k=1).sum(axis=(1, 2))
+    regulationDrawCalc = np.trace(joint, axis1=1, axis2=2)
+
+    return homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, homePMF, awayPMF
+
+
+def maxGoalsForTailMass(expectedGoals, tailMass=1e-9):
+    """Find the number of goals where the probability of scoring more goals is less
+    than `tailMass` for all of the expected goal values.
+    """
+    expectedGoals = np.atleast_1d(np.asarray(expectedGoals, dtype=float))
+    return int(poisson.isf(tailMass, mu=expectedGoals.max(initial=0.0)))
+
+
+def skellamProbabilities(homeTeamGoalsPredicted, awayTeamGoalsPredicted, tailMass=1e-9):
+    """Calculate the win and regulation tie probabilities from the Skellam distribution
+    (difference of the home and away goals). Unlike `outcomeProbabilities` the values
+    are not truncated at a maximum number of goals, so the probabilities sum to 1.
+
+    :param homeTeamGoalsPredicted: Expected home goals (scalar or array).
+    :param awayTeamGoalsPredicted: Expected away goals (scalar or array).
+    :param tailMass: The probability arrays include the number of goals where the
+    remaining (tail) probability is less than this value.
+    :return: home win, away win and regulation tie probabilities (arrays), as well as
+    the home and away probability arrays (see `poissonPMF`).
+    """
+    homeGoals = np.atleast_1d(np.asarray(homeTeamGoalsPredicted, dtype=float))
+    awayGoals = np.atleast_1d(np.asarray(awayTeamGoalsPredicted, dtype=float))
+
+    homeTeamWinCalc = skellam.sf(0, mu1=homeGoals, mu2=awayGoals)
+    awayTeamWinCalc = skellam.cdf(-1, mu1=homeGoals, mu2=awayGoals)
+    regulationDrawCalc = skellam.pmf(0, mu1=homeGoals, mu2=awayGoals)
+
+    maxGoals = maxGoalsForTailMass(np.concatenate([homeGoals, awayGoals]), tailMass)
+
+    return (
+        homeTeamWinCalc,
+        awayTeamWinCalc,
+        regulationDrawCalc,
+        poissonPMF(homeGoals, maxGoals),
+        poissonPMF(awayGoals, maxGoals)
+    )
+
+
 def createPredictions(maxGoals, homeTeamGoalsPredicted, awayTeamGoalsPredicted):
     """Create the win percentages for both teams based on the supplied data.
     
@@ -174,173 +729,226 @@ def createPredictions(maxGoals, homeTeamGoalsPredicted, awayTeamGoalsPredicted):
 
     :return homeWinPercent, awayWinPercent, regulationTiePercent, Dataframe for all values
     """
+    homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, homePMF, awayPMF = \
+        outcomeProbabilities(maxGoals, homeTeamGoalsPredicted, awayTeamGoalsPredicted)
 
-    # increase the max number of goals by 1 to include all goals in the calculations
-    _maxGoals = maxGoals + 1
-
-    pdfData = {"home": [], "away": []}
-    for i in range(_maxGoals):
-        pdfData["home"].append(poisson.pmf(i, mu=homeTeamGoalsPredicted))
-        pdfData["away"].append(poisson.pmf(i, mu=awayTeamGoalsPredicted))
+    pdfData = {"home": homePMF[0].tolist(), "away": awayPMF[0].tolist()}
 
-    # calculate the chances of a winning atleast 1 point (tie in regulation)
-    regulationDrawCalc = 0.0
-    for i in range(_maxGoals):
-        regulationDrawCalc += pdfData["home"][i] * pdfData["away"][i]
+    return (
+        float(homeTeamWinCalc[0]),
+        float(awayTeamWinCalc[0]),
+        float(regulationDrawCalc[0]),
+        pdfData
+    )
 
-    # calculate the chances of home team winning 3 points
-    homeTeamWinCalc = 0.0
-    for i in range(_maxGoals):
-        for j in range(i, _maxGoals):
-            if i != j:
-                homeTeamWinCalc += pdfData["home"][j] * pdfData["away"][i]
 
-    # calculate the chances of away team winning 3 points
-    awayTeamWinCalc = 0.0
-    for i in range(_maxGoals):
-        for j in range(i, _maxGoals):
-            if i != j:
-                awayTeamWinCalc += pdfData["away"][j] * pdfData["home"][i]
+def parseSeasonEvents(year, halfLife=None, window=None, adjusted=False):
+    """Parse the events for a given season. This will include predicting which team
+    will win each game. The previous season end strengths are read from the precomputed
+    table (see `getSeasonStrengths`). The parsed seasons are cached, the cache holds the
+    most recent `SEASON_CACHE_SIZE` seasons.
 
-    return homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, pdfData
+    NOTE: the returned events are shared between callers, they should not be altered.
 
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
+    See `createStrengthAccumulator` for the strength modes.
+    :return: home team events, away team events
+    """
+    return _parseSeasonEventsCached(int(year), halfLife, window, adjusted)
 
-def parseSeasonEvents(year):  # pylint: disable=too-many-branches
-    """Parse the events for a given season. This will include predicting which team
-    will win each game.
 
-    :return: home team events, away team events
+def clearSeasonCache():
+    """Clear the parsed seasons (see `parseSeasonEvents`), the seasons are parsed again
+    the next time that they are read. This is required when the schedule of a season
+    changes (see `schedules.appendSeasonSchedule`).
     """
+    _parseSeasonEventsCached.cache_clear()
+
+
+@lru_cache(maxsize=SEASON_CACHE_SIZE)
+def _parseSeasonEventsCached(year, halfLife=None, window=None, adjusted=False):
     # Get the entire schedule
     schedule = getSchedule(year)
     if schedule is None:
         logger.error(f"Failed to find a schedule for year {year}")
         return None, None
 
-    # Get the schedule for the previous year
+    # Get the strengths at the end of the previous year
     # This will be used for the first home and away game for each
     # team during the selected year.
-    previousSchedule = getSchedule(year-1)
-    if previousSchedule is None:
+    previousSeason = getSeasonStrengths(year-1)
+    if previousSeason is None:
         logger.error(f"Failed to find a schedule for previous year {year-1}")
         return None, None
 
-    return getSeasonEventsFromSchedules(schedule, previousSchedule)
+    return getSeasonEventsFromStrengths(schedule, previousSeason, halfLife, window, adjusted)
 
 
-def getSeasonEventsFromSchedules(schedule, previousSchedule):  # pylint: disable=too-many-branches
+# pylint: disable-next=too-many-positional-arguments
+def getSeasonEventsFromSchedules(schedule, previousSchedule, halfLife=None, window=None,
+                                 adjusted=False):
     """Parse the events for the season given the json formatted season and 
     previous season data. This will include predicting which team will win 
     each game.
 
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
     :return: home team events, away team events
     """
     if None in (schedule, previousSchedule):
         return None, None
 
-    homeTeamEventsPrev, awayTeamEventsPrev = parseSchedule(previousSchedule)
-    totalTeamIdsPrevSeason = set(list(homeTeamEventsPrev.keys()))
-    totalTeamIdsPrevSeason.update(list(awayTeamEventsPrev.keys()))
-    previousSeasonScores  = calculateScores(
-        list(totalTeamIdsPrevSeason),
-        homeTeamEventsPrev,
-        awayTeamEventsPrev
+    return getSeasonEventsFromStrengths(
+        schedule, SeasonStrengths.fromSchedule(previousSchedule), halfLife, window, adjusted
     )
 
-    # Predict the values for the current schedule
+
+def predictMatchupGoals(currentSeason, previousSeason, homeTeamId, awayTeamId):
+    """Predict the number of goals scored by each team in a game between the teams.
+    The strengths from the current season are used once a team has played a home (away)
+    game, otherwise the strengths at the end of the previous season are used.
+
+    :param currentSeason: Strengths for the current season (see `StrengthAccumulator`).
+    :param previousSeason: Strengths at the end of the previous season (see `SeasonStrengths`).
+    :return: home team goals, away team goals, home team scores, away team scores,
+    maximum goals
+    """
+    homeTeamScores = {}
+    awayTeamScores = {}
+
+    findTeamScoresCurrSeason = []
+
+    # use the previous season data to predict the home values
+    if not currentSeason.hasHomeGames(homeTeamId):
+        if homeTeamId in previousSeason.scores:
+            homeTeamScores.update(previousSeason.scores[homeTeamId])
+        else:
+            # indicates that the team may be new, or they don't have records
+            # from the previous year. Use the entire average for all teams
+            # from the previous year.
+            homeTeamScores.update({"homeAttackStrength": 1.0, "homeDefenseStrength": 1.0})
+    else:
+        findTeamScoresCurrSeason.append(homeTeamId)
+
+    # use the previous season data to predict away values
+    if not currentSeason.hasAwayGames(awayTeamId):
+        if awayTeamId in previousSeason.scores:
+            awayTeamScores.update(previousSeason.scores[awayTeamId])
+        else:
+            # indicates that the team may be new, or they don't have records
+            # from the previous year. Use the entire average for all teams
+            # from the previous year.
+            awayTeamScores.update({"awayAttackStrength": 1.0, "awayDefenseStrength": 1.0})
+    else:
+        findTeamScoresCurrSeason.append(awayTeamId)
+
+    # Time to parse using the current seasonal data
+    if findTeamScoresCurrSeason:
+        currentScores = currentSeason.scores(findTeamScoresCurrSeason)
+
+        if homeTeamId in currentScores:
+            homeTeamScores.update(currentScores[homeTeamId])
+        if awayTeamId in currentScores:
+            awayTeamScores.update(currentScores[awayTeamId])
+
+        avgHomeGoalsScored, avgAwayGoalsScored = currentSeason.averageGoals()
+        maxGoals = currentSeason.maxGoals
+    else:
+        avgHomeGoalsScored, avgAwayGoalsScored = previousSeason.averageGoals
+        maxGoals = previousSeason.maxGoals
+
+    # Predict the number of goals for the home and away teams.
+    # The Poisson Distribution only requires the mean value in this case these predicted values.
+    # There is a tendency to regress to the mean - The Law of Averages. Even when there are
+    # outlier games we should observe more stability in prediction as the season continues.
+    homeTeamGoalsPredicted = homeTeamScores["homeAttackStrength"] * \
+        awayTeamScores["awayDefenseStrength"] * avgHomeGoalsScored
+    awayTeamGoalsPredicted = awayTeamScores["awayAttackStrength"] * \
+        homeTeamScores["homeDefenseStrength"] * avgAwayGoalsScored
+
+    return homeTeamGoalsPredicted, awayTeamGoalsPredicted, homeTeamScores, awayTeamScores, \
+        maxGoals
+
+
+# pylint: disable-next=too-many-positional-arguments
+def getSeasonEventsFromStrengths(schedule, previousSeason, halfLife=None, window=None,
+                                 adjusted=False):
+    """Parse the events for the season given the json formatted season and the
+    strengths at the end of the previous season (see `SeasonStrengths`). This will
+    include predicting which team will win each game.
+
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
+    See `createStrengthAccumulator` for the strength modes.
+    :return: home team events, away team events
+    """
+    # Predict the values for the current schedule. The strengths for the current
+    # season are updated as each game is parsed.
     parsedHomeTeamEvents = defaultdict(list)
     parsedAwayTeamEvents = defaultdict(list)
+    currentSeason = createStrengthAccumulator(halfLife, window, adjusted)
+
+    seasonGames = []
+    seasonMaxGoals = []
 
     for game in schedule:
 
         gameObj = Game("randomGame")
         gameObj.fromJson(game)
 
-        homeTeamScores = {}
-        awayTeamScores = {}
-
-        findTeamScoresCurrSeason = []
-
-        # use the previous season data to predict the home values
-        if gameObj.homeTeamId not in parsedHomeTeamEvents:
-            if gameObj.homeTeamId in previousSeasonScores:
-                homeTeamScores.update(previousSeasonScores[gameObj.homeTeamId])
-            else:
-                # indicates that the team may be new, or they don't have records
-                # from the previous year. Use the entire average for all teams
-                # from the previous year.
-                homeTeamScores.update({"homeAttackStrength": 1.0, "homeDefenseStrength": 1.0})
-        else:
-            findTeamScoresCurrSeason.append(gameObj.homeTeamId)
-
-        # use the previous season data to predict away values
-        if gameObj.awayTeamId not in parsedAwayTeamEvents:
-            if gameObj.awayTeamId in previousSeasonScores:
-                awayTeamScores.update(previousSeasonScores[gameObj.awayTeamId])
-            else:
-                # indicates that the team may be new, or they don't have records
-                # from the previous year. Use the entire average for all teams
-                # from the previous year.
-                awayTeamScores.update({"awayAttackStrength": 1.0, "awayDefenseStrength": 1.0})
-        else:
-            findTeamScoresCurrSeason.append(gameObj.awayTeamId)
-
-        # Time to parse using the current seasonal data
-        if findTeamScoresCurrSeason:
-            currentScores = calculateScores(
-                findTeamScoresCurrSeason,
-                parsedHomeTeamEvents,
-                parsedAwayTeamEvents
+        homeTeamGoalsPredicted, awayTeamGoalsPredicted, homeTeamScores, awayTeamScores, \
+            maxGoals = predictMatchupGoals(
+                currentSeason, previousSeason, gameObj.homeTeamId, gameObj.awayTeamId
             )
 
-            if gameObj.homeTeamId in currentScores:
-                homeTeamScores.update(currentScores[gameObj.homeTeamId])
-            if gameObj.awayTeamId in currentScores:
-                awayTeamScores.update(currentScores[gameObj.awayTeamId])
-
-            avgHomeGoalsScored, avgAwayGoalsScored = calculateAvgGoals(parsedHomeTeamEvents)
-            maxGoals = findMaxGoalsScored(parsedHomeTeamEvents)
-        else:
-            avgHomeGoalsScored, avgAwayGoalsScored = calculateAvgGoals(homeTeamEventsPrev)
-            maxGoals = findMaxGoalsScored(homeTeamEventsPrev)
-
-        # Predict the number of goals for the home and away teams.
-        # The Poisson Distribution only requires the mean value in this case these predicted values.
-        # There is a tendency to regress to the mean - The Law of Averages. Even when there are
-        # outlier games we should observe more stability in prediction as the season continues.
-        homeTeamGoalsPredicted = homeTeamScores["homeAttackStrength"] * \
-            awayTeamScores["awayDefenseStrength"] * avgHomeGoalsScored
-        awayTeamGoalsPredicted = awayTeamScores["awayAttackStrength"] * \
-            homeTeamScores["homeDefenseStrength"] * avgAwayGoalsScored
-
-        homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, pdfData = createPredictions(
-            maxGoals, homeTeamGoalsPredicted, awayTeamGoalsPredicted
-        )
-
         gameObj.fromJson(
             {
-                "homeTeamWinPercent": round(homeTeamWinCalc * 100.0, 2),
                 "homeTeamGoalsPrediction": homeTeamGoalsPredicted,
-                "awayTeamWinPercent": round(awayTeamWinCalc * 100.0, 2),
                 "awayTeamGoalsPrediction": awayTeamGoalsPredicted,
-                "regulationTiePercent": round(regulationDrawCalc * 100.0, 2),
-                "poissonPDF": pdfData,
                 "homeAttackStrength": homeTeamScores["homeAttackStrength"],
                 "homeDefenseStrength": homeTeamScores["homeDefenseStrength"],
                 "awayAttackStrength": awayTeamScores["awayAttackStrength"],
                 "awayDefenseStrength": awayTeamScores["awayDefenseStrength"],
             }
         )
+        seasonGames.append(gameObj)
+        seasonMaxGoals.append(maxGoals)
 
         # update the home and away events that have been parsed - each game
         # is both a home and an away event
         parsedHomeTeamEvents[gameObj.homeTeamId].append(gameObj)
         parsedAwayTeamEvents[gameObj.awayTeamId].append(gameObj)
+        currentSeason.addEvent(gameObj)
+
+    # The predicted goals do not depend on the outcome predictions, so the outcomes
+    # for the entire season are calculated at once.
+    if seasonGames:
+        homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, _, _ = \
+            outcomeProbabilities(
+                seasonMaxGoals,
+                [x.homeTeamGoalsPrediction for x in seasonGames],
+                [x.awayTeamGoalsPrediction for x in seasonGames]
+            )
+
+        # the poisson PDF of each game is calculated from the predicted goals on demand
+        for index, gameObj in enumerate(seasonGames):
+            gameObj.fromJson(
+                {
+                    "homeTeamWinPercent": round(float(homeTeamWinCalc[index]) * 100.0, 2),
+                    "awayTeamWinPercent": round(float(awayTeamWinCalc[index]) * 100.0, 2),
+                    "regulationTiePercent": round(float(regulationDrawCalc[index]) * 100.0, 2),
+                    "maxGoals": seasonMaxGoals[index],
+                }
+            )
 
     return parsedHomeTeamEvents, parsedAwayTeamEvents
 
 
-def execPoisson(year):
+def execPoisson(year, halfLife=None, window=None, adjusted=False):
     """Main execution point
 
     Currently this would predict the score for the current season, theoretically if the the 
@@ -351,9 +959,12 @@ def execPoisson(year):
 
     :param year: Year, in which the season started, for which the analysis should be
     performed. 
+    :param halfLife: Half life (games) of the recency weighted strengths.
+    :param window: Number of recent games used for the strengths.
+    :param adjusted: When true, the strengths are adjusted for the opponents.
     """
 
-    homeTeamEvents, _ = parseSeasonEvents(year)
+    homeTeamEvents, _ = parseSeasonEvents(year, halfLife, window, adjusted)
 
     winsPredictedCorrect = 0
     totalGames = 0
@@ -0,0 +1,295 @@
+"""The schedule for each past season is stored in `support/schedules/<year>/schedule.json`.
+The schedules are also packed into a single columnar archive so that a season can be read
+without parsing json. The archive consists of two files:
+- `schedules.npy` - one record per game (see `GAME_DTYPE`) for all seasons. The file is
+memory mapped, so a season is a slice of the array.
+- `schedules-index.json` - the (start, end) records of each season and the side table of
+teams. The teams (id, name, triCode) are stored once and the games refer to the position
+of the team in the table.
+
+Seasons that are not packaged (the current season) have a schedule that is built from
+the games ingested into the warehouse (see `appendSeasonSchedule`). The schedule is stored
+in the same format under `SEASON_SCHEDULE_DIR` and only newly final games are appended.
+The games that have not been played are only available from the API, see
+`pullSeasonSchedule`.
+"""
+from functools import lru_cache
+from json import dumps, loads
+from logging import getLogger
+import os
+from os import replace
+from os.path import abspath, basename, dirname, exists, join as path_join
+import numpy as np
+from requests import get
+
+
+logger = getLogger("nhl_neural_net")
+
+
+SUPPORT_DIR = path_join(*[dirname(abspath(__file__)), "support"])
+SCHEDULE_DIR = path_join(*[SUPPORT_DIR, "schedules"])
+SCHEDULE_ARCHIVE_FILE = path_join(*[SUPPORT_DIR, "schedules.npy"])
+SCHEDULE_INDEX_FILE = path_join(*[SUPPORT_DIR, "schedules-index.json"])
+
+# Schedules built from the ingested games, stored with the other saved data
+# (see `dataset.BASE_SAVE_DIR`)
+SEASON_SCHEDULE_DIR = path_join(*["/tmp/nhl_model", "schedules"])
+
+# Schedule (played and unplayed games) of a team for a season, the season is formatted
+# as the start and end year (20232024)
+CLUB_SCHEDULE_ENDPOINT = "https://api-web.nhle.com/v1/club-schedule-season/{}/{}"
+
+# game states of the API where the score is final
+_FINAL_GAME_STATES = ("FINAL", "OFF")
+
+GAME_DTYPE = np.dtype([
+    ("gameId", np.int64),
+    ("homeTeam", np.uint16),
+    ("awayTeam", np.uint16),
+    ("homeGoals", np.int8),
+    ("awayGoals", np.int8),
+    ("lastPeriod", np.int8),
+])
+
+# `lastPeriodType` of the games stored as the position in this tuple, 0 when the type of
+# the last period is not known.
+PERIOD_TYPES = (None, "REG", "OT", "SO")
+
+# goals are stored as this value when they are not known (None)
+_MISSING_GOALS = -1
+
+
+def _readScheduleFile(filename):
+    with open(filename, "rb") as jsonFile:
+        return loads(jsonFile.read())
+
+
+def packSchedules(scheduleDir=SCHEDULE_DIR, archiveFile=SCHEDULE_ARCHIVE_FILE,
+                  indexFile=SCHEDULE_INDEX_FILE):
+    '''Pack the schedule of every season found in the schedule directory into the
+    archive. The games of each season keep the order of the schedule file.
+
+    :return: List of seasons in the archive.
+    '''
+    teams = {}
+    seasons = {}
+    records = []
+
+    years = sorted(int(x) for x in os.listdir(scheduleDir) if x.isdigit())
+    for year in years:
+        filename = path_join(*[scheduleDir, str(year), "schedule.json"])
+        if not exists(filename):
+            continue
+
+        start = len(records)
+        for game in _readScheduleFile(filename):
+            teamIndexes = []
+            for side in ("home", "away"):
+                key = (
+                    game[f"{side}TeamId"], game[f"{side}TeamName"], game[f"{side}TeamTriCode"]
+                )
+                teamIndexes.append(teams.setdefault(key, len(teams)))
+
+            records.append((
+                game["gameId"],
+                teamIndexes[0],
+                teamIndexes[1],
+                _MISSING_GOALS if game["homeTeamGoalsActual"] is None
+                    else game["homeTeamGoalsActual"],
+                _MISSING_GOALS if game["awayTeamGoalsActual"] is None
+                    else game["awayTeamGoalsActual"],
+                PERIOD_TYPES.index(game.get("lastPeriodType"))
+                    if game.get("lastPeriodType") in PERIOD_TYPES else 0,
+            ))
+        seasons[str(year)] = [start, len(records)]
+
+    # write to temporary files and move them into place once complete
+    tmpArchiveFile = f"{archiveFile}.tmp.npy"
+    np.save(tmpArchiveFile, np.array(records, dtype=GAME_DTYPE))
+
+    tmpIndexFile = f"{indexFile}.tmp"
+    with open(tmpIndexFile, "w") as jsonFile:
+        jsonFile.write(dumps({
+            "seasons": seasons,
+            "teams": [list(key) for key in sorted(teams, key=teams.get)],
+        }, indent=2))
+
+    replace(tmpArchiveFile, archiveFile)
+    replace(tmpIndexFile, indexFile)
+
+    logger.debug(f"packed {len(records)} games from {len(seasons)} seasons into {archiveFile}")
+    return [int(x) for x in seasons]
+
+
+class ScheduleArchive:
+    '''Read the schedules from the archive created with `packSchedules`. The games
+    are memory mapped, only the pages for the seasons that are read are loaded.
+    '''
+
+    def __init__(self, archiveFile=SCHEDULE_ARCHIVE_FILE, indexFile=SCHEDULE_INDEX_FILE):
+        index = _readScheduleFile(indexFile)
+        self.seasonOffsets = {int(k): tuple(v) for k, v in index["seasons"].items()}
+        self.teams = [tuple(x) for x in index["teams"]]
+        self.games = np.load(archiveFile, mmap_mode="r")
+
+    def __contains__(self, year):
+        return year in self.seasonOffsets
+
+    @property
+    def seasons(self):
+        '''Sorted list of the seasons in the archive.'''
+        return sorted(self.seasonOffsets)
+
+    def seasonGames(self, year):
+        '''Get the games for the season as a slice of the archive (structured array
+        see `GAME_DTYPE`). None is returned when the season is not in the archive.
+        '''
+        if year not in self.seasonOffsets:
+            return None
+        start, end = self.seasonOffsets[year]
+        return self.games[start:end]
+
+    def schedule(self, year):
+        '''Get the schedule for the season in the same format as the schedule file.'''
+        games = self.seasonGames(year)
+        if games is None:
+            return None
+
+        schedule = []
+        for gameId, homeTeam, awayTeam, homeGoals, awayGoals, lastPeriod in games.tolist():
+            homeTeamId, homeTeamName, homeTeamTriCode = self.teams[homeTeam]
+            awayTeamId, awayTeamName, awayTeamTriCode = self.teams[awayTeam]
+            game = {
+                "gameId": gameId,
+                "awayTeamId": awayTeamId,
+                "awayTeamName": awayTeamName,
+                "awayTeamTriCode": awayTeamTriCode,
+                "awayTeamGoalsActual": None if awayGoals == _MISSING_GOALS else awayGoals,
+                "homeTeamId": homeTeamId,
+                "homeTeamName": homeTeamName,
+                "homeTeamTriCode": homeTeamTriCode,
+                "homeTeamGoalsActual": None if homeGoals == _MISSING_GOALS else homeGoals,
+            }
+            # the type is only in the schedule files where it is known
+            if lastPeriod:
+                game["lastPeriodType"] = PERIOD_TYPES[lastPeriod]
+            schedule.append(game)
+        return schedule
+
+
+@lru_cache(maxsize=1)
+def loadScheduleArchive(archiveFile=SCHEDULE_ARCHIVE_FILE, indexFile=SCHEDULE_INDEX_FILE):
+    '''Load (once) the schedule archive. None is returned when the archive does not exist.'''
+    if not exists(archiveFile) or not exists(indexFile):
+        logger.debug(f"failed to find the schedule archive {basename(archiveFile)}")
+        return None
+    return ScheduleArchive(archiveFile, indexFile)
+
+
+def seasonScheduleFile(year, scheduleDir=SEASON_SCHEDULE_DIR):
+    '''Get the name of the schedule file built from the ingested games for the season.'''
+    return path_join(*[scheduleDir, str(year), "schedule.json"])
+
+
+def loadSeasonSchedule(year, scheduleDir=SEASON_SCHEDULE_DIR):
+    '''Read the schedule built from the ingested games for the season. None is
+    returned when the schedule does not exist.
+    '''
+    filename = seasonScheduleFile(year, scheduleDir)
+    if not exists(filename):
+        return None
+    return _readScheduleFile(filename)
+
+
+def appendSeasonSchedule(year, games, scheduleDir=SEASON_SCHEDULE_DIR):
+    '''Append the final games to the schedule of the season. Games that are already in
+    the schedule and games without a result are skipped. The schedule is sorted by gameId
+    and written to a temporary file before it is moved into place.
+
+    :param games: List of games in the same format as the schedule files.
+    :return: Number of games appended to the schedule.
+    '''
+    schedule = loadSeasonSchedule(year, scheduleDir) or []
+    knownGameIds = {x["gameId"] for x in schedule}
+
+    newGames = [
+        x for x in games if x["gameId"] not in knownGameIds and
+        None not in (x.get("homeTeamGoalsActual"), x.get("awayTeamGoalsActual"))
+    ]
+    if not newGames:
+        return 0
+
+    schedule.extend(newGames)
+    schedule.sort(key=lambda x: x["gameId"])
+
+    filename = seasonScheduleFile(year, scheduleDir)
+    os.makedirs(dirname(filename), exist_ok=True)
+    tmpFilename = f"{filename}.tmp"
+    with open(tmpFilename, "w") as jsonFile:
+        jsonFile.write(dumps(schedule))
+    replace(tmpFilename, filename)
+
+    logger.debug(f"appended {len(newGames)} games to the {year} schedule {filename}")
+    return len(newGames)
+
+
+def parseClubSchedule(jsonData, gameType=2):
+    '''Parse the games of a team schedule from the API into the same format as the
+    schedule files. The goals are None for games that are not final.
+
+    :param gameType: Only the games of this type are parsed (2 = regular season).
+    '''
+    games = []
+    for game in jsonData.get("games", []):
+        if game.get("gameType") != gameType:
+            continue
+
+        final = game.get("gameState") in _FINAL_GAME_STATES
+        record = {"gameId": game["id"]}
+        for side in ("away", "home"):
+            team = game[f"{side}Team"]
+            name = " ".join(
+                team[x]["default"] for x in ("placeName", "commonName") if x in team
+            )
+            record[f"{side}TeamId"] = team["id"]
+            record[f"{side}TeamName"] = name or team["abbrev"]
+            record[f"{side}TeamTriCode"] = team["abbrev"]
+            record[f"{side}TeamGoalsActual"] = team.get("score") if final else None
+        if final and "gameOutcome" in game:
+            record["lastPeriodType"] = game["gameOutcome"].get("lastPeriodType")
+        games.append(record)
+    return games
+
+
+def pullSeasonSchedule(year, triCodes, gameType=2):
+    '''Pull the schedule of the season from the API, including the games that have
+    not been played. The API provides the schedule of each team, so a request is made for
+    each team and the games are combined. Teams that fail are skipped.
+
+    :param year: Year in which the season started.
+    :param triCodes: Abbreviations of the teams in the season.
+    :return: List of games sorted by gameId (see `parseClubSchedule`).
+    '''
+    games = {}
+    for triCode in sorted(set(triCodes)):
+        try:
+            jsonRequest = get(CLUB_SCHEDULE_ENDPOINT.format(triCode, f"{year}{year + 1}")).json()
+        except:
+            logger.debug(f"failed to pull the {year} schedule for {triCode}")
+            continue
+        for game in parseClubSchedule(jsonRequest or {}, gameType):
+            games.setdefault(game["gameId"], game)
+
+    return [games[x] for x in sorted(games)]
+
+
+def mergeSeasonSchedule(schedule, scheduledGames):
+    '''Add the scheduled games (see `pullSeasonSchedule`) that are missing from the
+    schedule. The games in the schedule are kept as they are.
+
+    :return: List of games sorted by gameId.
+    '''
+    knownGameIds = {x["gameId"] for x in schedule}
+    merged = list(schedule) + [x for x in scheduledGames if x["gameId"] not in knownGameIds]
+    merged.sort(key=lambda x: x["gameId"])
+    return merged
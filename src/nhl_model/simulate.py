@@ -0,0 +1,451 @@
+"""Monte Carlo simulation of the remainder of a season. The expected goals of each
+remaining game are predicted from the Poisson strengths (see `snapshot.PoissonSnapshot`),
+and the outcome of all remaining games is sampled for a batch of seasons at once. Only the
+outcome of a game (not the score) changes the standings, so a single uniform value per
+game is sampled against the (Skellam) regulation win, loss and tie probabilities. The
+batches are distributed across a pool of processes, and each batch returns the counts of
+the points, conference rank and playoff qualification of each team, so the results do not
+depend on the number of processes.
+
+Games are worth 2 points for a win, and 1 point for a loss in overtime (a tied score).
+The winner in overtime is the team that is more likely to score the next goal.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from logging import getLogger
+from time import perf_counter
+import numpy as np
+from nhl_model.poisson import getSchedule, predictMatchupGoals, skellamProbabilities
+from nhl_model.schedules import loadScheduleArchive, mergeSeasonSchedule, pullSeasonSchedule
+from nhl_model.snapshot import createSnapshot, loadSnapshot
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Conference of each team (current alignment, see `seasonConferences` for the alignment
+# of the other seasons).
+CONFERENCES = {
+    **{x: "E" for x in (
+        "BOS", "BUF", "DET", "FLA", "MTL", "OTT", "TBL", "TOR",
+        "CAR", "CBJ", "NJD", "NYI", "NYR", "PHI", "PIT", "WSH",
+    )},
+    **{x: "W" for x in (
+        "ARI", "UTA", "CHI", "COL", "DAL", "MIN", "NSH", "STL", "WPG",
+        "ANA", "CGY", "EDM", "LAK", "SEA", "SJS", "VAN", "VGK",
+    )},
+}
+
+# Teams in the eastern conference from the first season of each alignment, every other
+# team of the season is in the western conference. The conferences before 1993 (Wales
+# and Campbell) are not included.
+_EASTERN_ALIGNMENTS = (
+    (1993, frozenset((
+        "BOS", "BUF", "HFD", "CAR", "MTL", "OTT", "PIT", "QUE",
+        "FLA", "NJD", "NYI", "NYR", "PHI", "TBL", "WSH",
+    ))),
+    (1998, frozenset((
+        "BOS", "BUF", "MTL", "OTT", "TOR", "NJD", "NYI", "NYR", "PHI", "PIT",
+        "ATL", "CAR", "FLA", "TBL", "WSH",
+    ))),
+    # Atlanta moved to Winnipeg
+    (2011, frozenset((
+        "BOS", "BUF", "MTL", "OTT", "TOR", "NJD", "NYI", "NYR", "PHI", "PIT",
+        "WPG", "CAR", "FLA", "TBL", "WSH",
+    ))),
+    (2013, frozenset(x for x, conference in CONFERENCES.items() if conference == "E")),
+)
+
+# Number of teams in each conference that qualify for the playoffs
+PLAYOFF_SPOTS = 8
+
+# Maximum number of seasons sampled at once by a process
+BATCH_SIZE = 2000
+
+_OVERTIME_PERIODS = ("OT", "SO")
+
+# First season where the loser of a game in overtime receives a point
+_OVERTIME_LOSS_SEASON = 1999
+
+# Points of the home and away team for each outcome: home regulation win, away
+# regulation win, home overtime win, away overtime win
+_HOME_POINTS = np.array([2, 0, 2, 1])
+_AWAY_POINTS = np.array([0, 2, 1, 2])
+
+
+def seasonPoints(games):
+    '''Calculate the points of each team from the results of the games. The loser
+    receives a point when the `lastPeriodType` of the game is overtime or shootout, games
+    where the type is not known are counted as regulation games.
+
+    :param games: List of games in the same format as the schedule files.
+    :return: Dictionary of team id -> points.
+    '''
+    points = {}
+    unknownPeriods = 0
+    for game in games:
+        homeTeamId, awayTeamId = game["homeTeamId"], game["awayTeamId"]
+        homeGoals, awayGoals = game["homeTeamGoalsActual"], game["awayTeamGoalsActual"]
+        points.setdefault(homeTeamId, 0)
+        points.setdefault(awayTeamId, 0)
+        if None in (homeGoals, awayGoals):
+            continue
+
+        if homeGoals == awayGoals:
+            points[homeTeamId] += 1
+            points[awayTeamId] += 1
+            continue
+
+        winner, loser = (homeTeamId, awayTeamId) if homeGoals > awayGoals else \
+            (awayTeamId, homeTeamId)
+        points[winner] += 2
+        if game.get("lastPeriodType") in _OVERTIME_PERIODS:
+            points[loser] += 1
+        elif game.get("lastPeriodType") is None and abs(homeGoals - awayGoals) == 1 and \
+            game.get("gameId", 0) // 1000000 >= _OVERTIME_LOSS_SEASON:
+            unknownPeriods += 1
+
+    if unknownPeriods:
+        logger.warning(
+            f"the last period of {unknownPeriods} one goal games is not known, the overtime "
+            "losses are not counted (regenerate the schedules, see GenerateSchedules.py)"
+        )
+    return points
+
+
+def seasonConferences(year, triCodes):
+    '''Get the conference of each team for the season.
+
+    :param triCodes: triCodes of the teams in the season.
+    :return: Dictionary of triCode -> conference (E or W).
+    :raises ValueError: When the alignment of the season is not known (before 1993), the
+    conferences must be provided by the caller.
+    '''
+    eastern = None
+    for firstSeason, teams in _EASTERN_ALIGNMENTS:
+        if int(year) >= firstSeason:
+            eastern = teams
+    if eastern is None:
+        raise ValueError(f"the conferences of {year} are not known, provide the conferences")
+    return {x: "E" if x in eastern else "W" for x in triCodes}
+
+
+class SeasonModel:
+    '''The state of the season that is simulated: the current points of each team and
+    the expected goals for each of the remaining games. Teams are referred to by their
+    position in `teamIds`.
+
+    The outcome thresholds of each game are the cumulative probabilities of the outcomes
+    (see `_HOME_POINTS`), so an outcome is sampled with a single uniform value.
+    '''
+
+    # pylint: disable=too-many-instance-attributes
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, teamIds, triCodes, conferences, currentPoints, homeTeams, awayTeams,
+                 homeGoals, awayGoals):
+        self.teamIds = np.asarray(teamIds, dtype=np.int64)
+        self.triCodes = list(triCodes)
+        self.conferences = list(conferences)
+        self.currentPoints = np.asarray(currentPoints, dtype=np.int64)
+        self.homeTeams = np.asarray(homeTeams, dtype=np.int64)
+        self.awayTeams = np.asarray(awayTeams, dtype=np.int64)
+        self.homeGoals = np.asarray(homeGoals, dtype=float)
+        self.awayGoals = np.asarray(awayGoals, dtype=float)
+        self.outcomeThresholds = self._outcomeThresholds()
+
+    def _outcomeThresholds(self):
+        '''(3 x games) cumulative probabilities of the first three outcomes.'''
+        if len(self.homeGoals) == 0:
+            return np.zeros((3, 0))
+
+        homeWin, awayWin, tie, _, _ = skellamProbabilities(self.homeGoals, self.awayGoals)
+
+        # the overtime winner is the team that is more likely to score the next goal
+        totalGoals = self.homeGoals + self.awayGoals
+        homeNextGoal = np.divide(
+            self.homeGoals, totalGoals, out=np.full_like(totalGoals, 0.5), where=totalGoals > 0
+        )
+        total = homeWin + awayWin + tie
+        return np.cumsum(
+            [homeWin / total, awayWin / total, tie * homeNextGoal / total], axis=0
+        )
+
+    @property
+    def numTeams(self):
+        '''Number of teams in the season.'''
+        return len(self.teamIds)
+
+    @property
+    def maxPoints(self):
+        '''Maximum number of points that any team can finish with.'''
+        games = np.bincount(self.homeTeams, minlength=self.numTeams) + \
+            np.bincount(self.awayTeams, minlength=self.numTeams)
+        return int((self.currentPoints + 2 * games).max(initial=0))
+
+    def conferenceTeams(self):
+        '''Get the positions of the teams in each conference.'''
+        groups = {}
+        for index, conference in enumerate(self.conferences):
+            groups.setdefault(conference, []).append(index)
+        return {k: np.array(v) for k, v in groups.items()}
+
+
+# pylint: disable-next=too-many-locals
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def createSeasonModel(year, numPlayed=None, snapshot=None, conferences=None,
+                      pullSchedule=False):
+    '''Create the model of the season to simulate.
+
+    :param year: Year in which the season started.
+    :param numPlayed: When provided, only the first number of games (with results) of the
+    schedule are considered played, the remaining games are simulated. This is used to
+    simulate a season from any point.
+    :param snapshot: Snapshot containing the games that have been played. When not
+    provided, a snapshot is created from the games played in the schedule.
+    :param conferences: Dictionary of triCode -> conference, defaults to the alignment of
+    the season (see `seasonConferences`).
+    :param pullSchedule: The schedule of a season that is not packaged only contains the
+    final games. When true, the remaining games are pulled from the API (see
+    `schedules.pullSeasonSchedule`), otherwise only the games in the schedule are used.
+    :return: `SeasonModel`, None when the season could not be found.
+    '''
+    schedule = getSchedule(year)
+    if not schedule:
+        logger.error(f"failed to find a schedule for {year}")
+        return None
+
+    archive = loadScheduleArchive()
+    if archive is None or int(year) not in archive:
+        # the schedule of a season that is not packaged only contains the final games
+        if pullSchedule:
+            triCodes = {x[f"{side}TeamTriCode"] for x in schedule for side in ("home", "away")}
+            scheduledGames = pullSeasonSchedule(int(year), triCodes | set(CONFERENCES))
+            if not scheduledGames:
+                logger.warning(f"failed to pull the remaining games of {year}")
+            schedule = mergeSeasonSchedule(schedule, scheduledGames)
+        else:
+            logger.warning(f"the remaining games of {year} are not in the schedule, they "
+                           "are only simulated when the schedule is pulled")
+
+    if snapshot is None:
+        played = [x for x in schedule if None not in
+                  (x["homeTeamGoalsActual"], x["awayTeamGoalsActual"])]
+        played = played if numPlayed is None else played[:numPlayed]
+        snapshot = createSnapshot(year)
+        if snapshot is None:
+            return None
+        snapshot.update(played)
+    else:
+        played = [x for x in schedule if x["gameId"] in snapshot.gameIds]
+
+    playedIds = {x["gameId"] for x in played}
+    remaining = [x for x in schedule if x["gameId"] not in playedIds]
+
+    teams = {}
+    for game in schedule:
+        for side in ("home", "away"):
+            teams[game[f"{side}TeamId"]] = game[f"{side}TeamTriCode"]
+    teamIds = sorted(teams)
+    teamIndex = {teamId: index for index, teamId in enumerate(teamIds)}
+
+    _conferences = seasonConferences(year, set(teams.values())) if conferences is None \
+        else conferences
+    points = seasonPoints(played)
+
+    homeGoals, awayGoals = [], []
+    for game in remaining:
+        predictedHomeGoals, predictedAwayGoals, _, _, _ = predictMatchupGoals(
+            snapshot.currentSeason, snapshot.previousSeason, game["homeTeamId"], game["awayTeamId"]
+        )
+        homeGoals.append(predictedHomeGoals)
+        awayGoals.append(predictedAwayGoals)
+
+    return SeasonModel(
+        teamIds,
+        [teams[x] for x in teamIds],
+        [_conferences.get(teams[x], "") for x in teamIds],
+        [points.get(x, 0) for x in teamIds],
+        [teamIndex[x["homeTeamId"]] for x in remaining],
+        [teamIndex[x["awayTeamId"]] for x in remaining],
+        homeGoals,
+        awayGoals,
+    )
+
+
+def _simulateBatch(model, playoffSpots, seed, numSimulations):
+    '''Simulate the remaining games for a batch of seasons.
+
+    :return: Counts for the batch (see `SimulationResult`) - points histogram,
+    conference rank histogram and playoff qualification of each team.
+    '''
+    rng = np.random.default_rng(seed)
+    numTeams, numGames = model.numTeams, len(model.homeTeams)
+
+    uniform = rng.random((numSimulations, numGames))
+    outcomes = (uniform >= model.outcomeThresholds[0]).astype(np.int64)
+    outcomes += uniform >= model.outcomeThresholds[1]
+    outcomes += uniform >= model.outcomeThresholds[2]
+    homePoints = _HOME_POINTS[outcomes]
+    awayPoints = _AWAY_POINTS[outcomes]
+
+    # points[simulation, team]
+    offsets = (np.arange(numSimulations) * numTeams)[:, np.newaxis]
+    points = np.bincount(
+        np.concatenate(((offsets + model.homeTeams).ravel(), (offsets + model.awayTeams).ravel())),
+        weights=np.concatenate((homePoints.ravel(), awayPoints.ravel())),
+        minlength=numSimulations * numTeams
+    ).reshape(numSimulations, numTeams).astype(np.int64) + model.currentPoints
+
+    # rank the teams in each conference, ties in points are broken at random
+    ranks = np.zeros((numSimulations, numTeams), dtype=np.int64)
+    tieBreaker = points + rng.random((numSimulations, numTeams)) * 0.5
+    for teams in model.conferenceTeams().values():
+        order = np.argsort(-tieBreaker[:, teams], axis=1)
+        ranks[np.arange(numSimulations)[:, np.newaxis], teams[order]] = \
+            np.arange(1, len(teams) + 1)
+
+    teamOffsets = np.arange(numTeams) * (model.maxPoints + 1)
+    pointsHistogram = np.bincount(
+        (points + teamOffsets).ravel(), minlength=numTeams * (model.maxPoints + 1)
+    ).reshape(numTeams, model.maxPoints + 1)
+
+    rankOffsets = np.arange(numTeams) * (numTeams + 1)
+    rankHistogram = np.bincount(
+        (ranks + rankOffsets).ravel(), minlength=numTeams * (numTeams + 1)
+    ).reshape(numTeams, numTeams + 1)
+
+    playoffs = (ranks <= playoffSpots).sum(axis=0)
+    return pointsHistogram, rankHistogram, playoffs
+
+
+class SimulationResult:
+    '''Distribution of the final points, conference rank and playoff qualification of
+    each team over all simulated seasons.
+    - pointsHistogram[team, points] - number of seasons the team finished with the points
+    - rankHistogram[team, rank] - number of seasons the team finished with the rank
+    - playoffCounts[team] - number of seasons the team qualified for the playoffs
+    '''
+
+    # pylint: disable=too-many-instance-attributes
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, model, numSimulations, pointsHistogram, rankHistogram, playoffCounts,
+                 wallTime=0.0):
+        self.teamIds = model.teamIds
+        self.triCodes = model.triCodes
+        self.conferences = model.conferences
+        self.currentPoints = model.currentPoints
+        self.numSimulations = numSimulations
+        self.pointsHistogram = pointsHistogram
+        self.rankHistogram = rankHistogram
+        self.playoffCounts = playoffCounts
+        self.wallTime = wallTime
+
+    @property
+    def meanPoints(self):
+        '''Average final points of each team.'''
+        return self.pointsHistogram @ np.arange(self.pointsHistogram.shape[1]) / \
+            self.numSimulations
+
+    @property
+    def meanRank(self):
+        '''Average final conference rank of each team.'''
+        return self.rankHistogram @ np.arange(self.rankHistogram.shape[1]) / \
+            self.numSimulations
+
+    @property
+    def playoffOdds(self):
+        '''Percent of the seasons in which each team qualified for the playoffs.'''
+        return self.playoffCounts / self.numSimulations * 100.0
+
+    def pointsPercentile(self, percent):
+        '''Final points of each team at the percentile (0-100) of the simulations.'''
+        cumulative = np.cumsum(self.pointsHistogram, axis=1)
+        return np.argmax(cumulative >= percent / 100.0 * self.numSimulations, axis=1)
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def simulateSeason(model, numSimulations=10000, seed=None, workers=None,
+                   batchSize=BATCH_SIZE, playoffSpots=PLAYOFF_SPOTS):
+    '''Simulate the remaining games of the season.
+
+    :param model: `SeasonModel` of the season (see `createSeasonModel`).
+    :param numSimulations: Number of seasons to simulate.
+    :param seed: Seed for the simulations, the same seed produces the same results
+    regardless of the number of workers.
+    :param workers: Maximum number of worker processes.
+    :param batchSize: Maximum number of seasons sampled at once by a process.
+    :param playoffSpots: Number of teams in each conference that qualify for the playoffs.
+    :return: `SimulationResult`
+    '''
+    startTime = perf_counter()
+
+    batchSizes = [batchSize] * (numSimulations // batchSize)
+    if numSimulations % batchSize:
+        batchSizes.append(numSimulations % batchSize)
+    seeds = np.random.SeedSequence(seed).spawn(len(batchSizes))
+
+    pointsHistogram = np.zeros((model.numTeams, model.maxPoints + 1), dtype=np.int64)
+    rankHistogram = np.zeros((model.numTeams, model.numTeams + 1), dtype=np.int64)
+    playoffCounts = np.zeros(model.numTeams, dtype=np.int64)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for points, ranks, playoffs in executor.map(
+            partial(_simulateBatch, model, playoffSpots), seeds, batchSizes
+        ):
+            pointsHistogram += points
+            rankHistogram += ranks
+            playoffCounts += playoffs
+
+    return SimulationResult(
+        model, numSimulations, pointsHistogram, rankHistogram, playoffCounts,
+        wallTime=perf_counter() - startTime
+    )
+
+
+def printSimulation(result):
+    '''Print the projected standings of each conference.'''
+    meanPoints, meanRank, playoffOdds = result.meanPoints, result.meanRank, result.playoffOdds
+    low, high = result.pointsPercentile(10), result.pointsPercentile(90)
+
+    for conference in sorted(set(result.conferences)):
+        teams = [x for x in range(len(result.teamIds)) if result.conferences[x] == conference]
+        teams.sort(key=lambda x: -meanPoints[x])
+
+        print(f"Conference {conference or '-'}")
+        print(f"{'team':>6} {'points':>7} {'mean':>7} {'p10':>5} {'p90':>5} "
+              f"{'rank':>5} {'playoffs':>9}")
+        for team in teams:
+            print(
+                f"{result.triCodes[team]:>6} {result.currentPoints[team]:>7} "
+                f"{meanPoints[team]:>7.1f} {low[team]:>5} {high[team]:>5} "
+                f"{meanRank[team]:>5.1f} {playoffOdds[team]:>8.1f}%"
+            )
+
+    print(f"Simulated {result.numSimulations} season(s) in {result.wallTime:.2f} seconds")
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def execSimulate(year, numSimulations=10000, seed=None, workers=None, numPlayed=None,
+                 fromSnapshot=False, pullSchedule=False):
+    '''Simulate the remaining games of the season (see `simulateSeason`) and print the
+    projected standings.
+
+    :param numPlayed: Only the first number of games of the schedule are played.
+    :param pullSchedule: When true, the remaining games of a season that is not packaged
+    are pulled from the API (see `createSeasonModel`).
+    :param fromSnapshot: When true, the games in the saved snapshot of the season are
+    the played games.
+    :return: `SimulationResult`, None when the season could not be found.
+    '''
+    model = createSeasonModel(
+        year, numPlayed=numPlayed, snapshot=loadSnapshot(year) if fromSnapshot else None,
+        pullSchedule=pullSchedule
+    )
+    if model is None:
+        return None
+
+    result = simulateSeason(model, numSimulations, seed=seed, workers=workers)
+    printSimulation(result)
+    return result
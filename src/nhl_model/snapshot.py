@@ -0,0 +1,283 @@
+"""Snapshots of the fitted Poisson model for a season. A snapshot contains the strengths
+at the end of the previous season, the strength totals for the games of the season that
+have been played (as of a date) and the teams. The snapshots are saved under
+`BASE_SAVE_DIR` and are updated with the games that were ingested since the snapshot was
+saved, so a matchup can be predicted without parsing any schedules.
+"""
+from datetime import datetime
+from json import dumps, loads
+from logging import getLogger
+from os import makedirs, replace
+from os.path import dirname, exists, join as path_join
+from nhl_model.dataset import BASE_SAVE_DIR, WAREHOUSE_FILE
+from nhl_model.poisson import (
+    SeasonStrengths,
+    StrengthAccumulator,
+    getSchedule,
+    getSeasonStrengths,
+    outcomeProbabilities,
+    predictMatchupGoals,
+)
+from nhl_model.schedules import loadScheduleArchive
+from nhl_model.warehouse import queryGameIds, querySeasonSchedule
+
+
+logger = getLogger("nhl_neural_net")
+
+
+SNAPSHOT_DIR = path_join(*[BASE_SAVE_DIR, "snapshots"])
+
+
+def snapshotFile(year):
+    '''Get the name of the snapshot file for the season.'''
+    return path_join(*[SNAPSHOT_DIR, f"poisson-{year}.json"])
+
+
+class PoissonSnapshot:
+    '''The fitted Poisson model for a season (see `predictMatchupGoals`). Games are added
+    with `update`, each game is only added once.
+    '''
+
+    # pylint: disable=too-many-positional-arguments,too-many-arguments
+    def __init__(self, season, previousSeason, currentSeason=None, teams=None,
+                 gameIds=None, asOf=None):
+        self.season = season
+        self.previousSeason = previousSeason
+        self.currentSeason = currentSeason or StrengthAccumulator()
+        # team id -> (name, triCode)
+        self.teams = dict(teams or {})
+        self.gameIds = set(gameIds or [])
+        self.asOf = asOf
+
+    @property
+    def json(self):
+        '''Return a dictionary that contains a valid json representation of the instance.'''
+        return {
+            "season": self.season,
+            "asOf": self.asOf,
+            "previousSeason": self.previousSeason.json,
+            "currentSeason": self.currentSeason.json,
+            "teams": {str(k): list(v) for k, v in self.teams.items()},
+            "gameIds": sorted(self.gameIds),
+        }
+
+    @classmethod
+    def fromJson(cls, jsonData):
+        '''Create an instance from the json representation.'''
+        return cls(
+            jsonData["season"],
+            SeasonStrengths.fromJson(jsonData["previousSeason"]),
+            StrengthAccumulator.fromJson(jsonData["currentSeason"]),
+            {int(k): tuple(v) for k, v in jsonData.get("teams", {}).items()},
+            jsonData.get("gameIds", []),
+            jsonData.get("asOf"),
+        )
+
+    def save(self, filename):
+        '''Save the snapshot to a json file.'''
+        if dirname(filename):
+            makedirs(dirname(filename), exist_ok=True)
+
+        tmpFilename = f"{filename}.tmp"
+        with open(tmpFilename, "w") as jsonFile:
+            jsonFile.write(dumps(self.json))
+        replace(tmpFilename, filename)
+        logger.debug(f"saved snapshot for {self.season} ({len(self.gameIds)} games) to {filename}")
+
+    @classmethod
+    def load(cls, filename):
+        '''Load the snapshot saved with `save`.'''
+        with open(filename, "rb") as jsonFile:
+            return cls.fromJson(loads(jsonFile.read()))
+
+    def update(self, games):
+        '''Add the games to the strengths. Games that were already added and games
+        without a result are skipped.
+
+        :param games: List of games in the same format as the schedule files.
+        :return: Number of games that were added.
+        '''
+        added = 0
+        for game in games:
+            homeGoals = game.get("homeTeamGoalsActual")
+            awayGoals = game.get("awayTeamGoalsActual")
+            if game.get("gameId") in self.gameIds or None in (homeGoals, awayGoals):
+                continue
+
+            self.currentSeason.addGame(game["homeTeamId"], game["awayTeamId"], homeGoals, awayGoals)
+            self.gameIds.add(game["gameId"])
+            for side in ("home", "away"):
+                if game.get(f"{side}TeamTriCode"):
+                    self.teams[game[f"{side}TeamId"]] = (
+                        game.get(f"{side}TeamName"), game[f"{side}TeamTriCode"]
+                    )
+            added += 1
+
+        return added
+
+    def teamId(self, team):
+        '''Get the id of the team from the id or triCode. None is returned when the
+        team could not be found.
+        '''
+        if isinstance(team, int) or str(team).isdigit():
+            return int(team)
+        for teamId, (_, triCode) in self.teams.items():
+            if triCode and triCode.upper() == str(team).upper():
+                return teamId
+        return None
+
+    def predictGames(self, matchups):
+        '''Predict the outcome of each matchup.
+
+        :param matchups: List of (home team, away team) where the teams are ids or triCodes.
+        :return: List of dictionaries containing the predicted goals and the home win,
+        away win and regulation tie percentages for each matchup.
+        '''
+        predictions = []
+        for homeTeam, awayTeam in matchups:
+            homeTeamId, awayTeamId = self.teamId(homeTeam), self.teamId(awayTeam)
+            if None in (homeTeamId, awayTeamId):
+                raise ValueError(f"failed to find the teams for {homeTeam} vs {awayTeam}")
+
+            homeGoals, awayGoals, _, _, maxGoals = predictMatchupGoals(
+                self.currentSeason, self.previousSeason, homeTeamId, awayTeamId
+            )
+            predictions.append({
+                "homeTeamId": homeTeamId,
+                "awayTeamId": awayTeamId,
+                "homeTeamGoalsPrediction": homeGoals,
+                "awayTeamGoalsPrediction": awayGoals,
+                "maxGoals": maxGoals,
+            })
+
+        if predictions:
+            homeTeamWinCalc, awayTeamWinCalc, regulationDrawCalc, _, _ = outcomeProbabilities(
+                [x["maxGoals"] for x in predictions],
+                [x["homeTeamGoalsPrediction"] for x in predictions],
+                [x["awayTeamGoalsPrediction"] for x in predictions],
+            )
+            for index, prediction in enumerate(predictions):
+                prediction.update({
+                    "homeTeamWinPercent": round(float(homeTeamWinCalc[index]) * 100.0, 2),
+                    "awayTeamWinPercent": round(float(awayTeamWinCalc[index]) * 100.0, 2),
+                    "regulationTiePercent": round(float(regulationDrawCalc[index]) * 100.0, 2),
+                })
+
+        return predictions
+
+    def predict(self, homeTeam, awayTeam):
+        '''Predict the outcome of a single matchup (see `predictGames`).'''
+        return self.predictGames([(homeTeam, awayTeam)])[0]
+
+
+def createSnapshot(year):
+    '''Create an empty snapshot for the season. None is returned when the strengths
+    for the previous season could not be found.
+    '''
+    previousSeason = getSeasonStrengths(year - 1)
+    if previousSeason is None:
+        logger.error(f"failed to find the strengths for the previous season {year-1}")
+        return None
+
+    # all known teams, so that teams can be found by triCode before they have played
+    archive = loadScheduleArchive()
+    teams = {} if archive is None else {x[0]: (x[1], x[2]) for x in archive.teams}
+    return PoissonSnapshot(year, previousSeason, teams=teams)
+
+
+def loadSnapshot(year, filename=None):
+    '''Load the snapshot for the season. None is returned when it does not exist.'''
+    _filename = snapshotFile(year) if filename is None else filename
+    if not exists(_filename):
+        return None
+    return PoissonSnapshot.load(_filename)
+
+
+# pylint: disable-next=too-many-positional-arguments,too-many-arguments
+def updateSnapshot(year, games=None, endDate=None, fromSchedule=False, filename=None,
+                   warehouseFile=WAREHOUSE_FILE):
+    '''Load (or create) the snapshot for the season, add the games that are not in the
+    snapshot and save it. Games are only ever added, so a snapshot for an earlier date
+    should be created in a new file.
+
+    :param games: List of games in the same format as the schedule files. When not
+    provided, the games are read from the warehouse or schedule.
+    :param endDate: Only the games played on or before the date (YYYY-MM-DD) are read.
+    Defaults to all ingested games. The schedule files do not contain the date of the
+    games, so the dates are read from the warehouse when `fromSchedule` is set.
+    :param fromSchedule: When true, the games are read from the schedule of the season
+    rather than the warehouse.
+    :return: The updated snapshot, None when the snapshot could not be created.
+    '''
+    if games is None and fromSchedule and endDate is not None and not exists(warehouseFile):
+        logger.error(f"failed to find the warehouse {warehouseFile} for the game dates")
+        return None
+
+    _filename = snapshotFile(year) if filename is None else filename
+    snapshot = loadSnapshot(year, _filename) or createSnapshot(year)
+    if snapshot is None:
+        return None
+
+    if games is None:
+        if fromSchedule:
+            games = getSchedule(year) or []
+            if endDate is not None:
+                gameIds = queryGameIds(warehouseFile, season=year, endDate=endDate)
+                games = [x for x in games if x["gameId"] in gameIds]
+        elif exists(warehouseFile):
+            games = querySeasonSchedule(warehouseFile, year, endDate=endDate)
+        else:
+            logger.warning(f"failed to find the warehouse {warehouseFile}")
+            games = []
+
+    added = snapshot.update(games)
+    # games are only ever added, so the snapshot never moves back to an earlier date
+    asOf = endDate or datetime.now().strftime("%Y-%m-%d")
+    snapshot.asOf = asOf if snapshot.asOf is None else max(snapshot.asOf, asOf)
+    snapshot.save(_filename)
+
+    logger.info(f"added {added} games to the snapshot for {year}")
+    return snapshot
+
+
+def printPredictionTable(title, predictions):
+    '''Print a table of predictions.
+
+    :param title: First line that is printed before the table.
+    :param predictions: Iterable of (home team name, away team name, prediction) where the
+    prediction is in the format of `PoissonSnapshot.predict`.
+    '''
+    print(title)
+    print(f"{'home':>6} {'away':>6} {'home goals':>11} {'away goals':>11} "
+          f"{'home win':>9} {'away win':>9} {'tie':>6}")
+    for homeTeam, awayTeam, prediction in predictions:
+        print(
+            f"{homeTeam!s:>6} {awayTeam!s:>6} "
+            f"{prediction['homeTeamGoalsPrediction']:>11.3f} "
+            f"{prediction['awayTeamGoalsPrediction']:>11.3f} "
+            f"{prediction['homeTeamWinPercent']:>9.2f} "
+            f"{prediction['awayTeamWinPercent']:>9.2f} "
+            f"{prediction['regulationTiePercent']:>6.2f}"
+        )
+
+
+def printPredictions(snapshot, predictions):
+    '''Print the predictions created from the snapshot.'''
+    printPredictionTable(
+        f"Snapshot {snapshot.season} as of {snapshot.asOf} ({len(snapshot.gameIds)} games)",
+        (
+            (snapshot.teams.get(x["homeTeamId"], (None, x["homeTeamId"]))[1],
+             snapshot.teams.get(x["awayTeamId"], (None, x["awayTeamId"]))[1], x)
+            for x in predictions
+        )
+    )
+
+
+def execSnapshot(year, endDate=None, fromSchedule=False, matchups=None):
+    '''Update the snapshot for the season (see `updateSnapshot`) and print the
+    predictions for the matchups (home team, away team).
+    '''
+    snapshot = updateSnapshot(year, endDate=endDate, fromSchedule=fromSchedule)
+    if snapshot is not None and matchups:
+        printPredictions(snapshot, snapshot.predictGames(matchups))
+    return snapshot
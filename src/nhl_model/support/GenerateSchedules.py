@@ -3,73 +3,217 @@ the schedule for past seasons. The script is intended to be
 executed before executing the poisson option through `exec.py`.
 
 Note: The data should be present in this directory (/data/nhl_data).
-This requires the old api. 
+This requires the old api. Seasons that have been packed into an
+archive (/data/nhl_archive, see `archive.py`) are read from the archive.
+
+Only the seasons where the source data changed since the last execution
+are regenerated. The fingerprint of each season is saved to the manifest
+in the schedules directory. Seasons are processed in parallel and each
+schedule is written to a temporary file before it is moved into place.
+The packed schedule archive (see `schedules.py`) and the table of season
+end strengths (see `poisson.createSeasonStrengthsTable`) are updated when
+any season changes.
 """
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
 from json import dumps, loads
 import os
-from os import mkdir
-from os.path import exists, join as path_join
-from shutil import rmtree
+from os import makedirs, replace
+from os.path import abspath, basename, dirname, exists, join as path_join
+from nhl_model.archive import SeasonArchive, archiveYear, isArchive
+from nhl_model.poisson import createSeasonStrengthsTable
+from nhl_model.schedules import SCHEDULE_ARCHIVE_FILE, loadScheduleArchive, packSchedules
 
 
+_currDir = dirname(abspath(__file__))
+
 # Assume that the directory is in this same directory as this script
-directory = 'data/nhl_data/'
-
-# Go through the list of files. Make sure that we have all players (these may
-# require some corrections, see Corrections.py for more information). Retrieve
-# all of the events from each game too; these will be added to the database.
-i = 1
-
-basePath = "schedules"
-
-if exists(basePath):
-    rmtree(basePath)
-mkdir(basePath)
-
-for root, dirs, files in os.walk(directory):
-
-    splitPath = root.split("/")
-    # skip this is the basic root
-    if len(splitPath) == 1:
-        continue
-
-    # create the new path for the file that will contain the schedules
-    splitPath[0] = basePath
-    newPath = path_join(*splitPath)
-    if not exists(newPath):
-        mkdir(newPath)
-
-    # data to be written to a specific seasonal directory
-    seasonalData = []
-
-    for file in files:
-        fname = os.path.join(root, file)
-        jsonData = None
-        with open(fname) as jsonFile:
-            jsonData = loads(jsonFile.read())
-
-        if jsonData:
-
-            localGameData = {}
-
-            gameInfo = jsonData["gameData"]
-            localGameData = {
-                "gameId": gameInfo["game"]["pk"]
-            }
-            boxScore = jsonData["liveData"]["boxscore"]
-
-            for x in ("away", "home"):
-                localGameData.update({
-                    f"{x}TeamId": boxScore["teams"][x]["team"]["id"],
-                    f"{x}TeamName": boxScore["teams"][x]["team"]["name"],
-                    f"{x}TeamTriCode": boxScore["teams"][x]["team"]["triCode"],
-                    f"{x}TeamGoalsActual": 
-                        boxScore["teams"][x]["teamStats"]["teamSkaterStats"]["goals"]
-                })
-
-            seasonalData.append(localGameData)
-
-    splitPath.append("schedule.json")
-    newPath = path_join(*splitPath)
-    with open(newPath, "w") as jsonFile:
-        jsonFile.write(dumps(seasonalData, indent=2))
+directory = path_join(_currDir, 'data', 'nhl_data')
+archiveDirectory = path_join(_currDir, 'data', 'nhl_archive')
+
+basePath = path_join(_currDir, "schedules")
+manifestFilename = path_join(basePath, ".manifest.json")
+
+
+def findSeasonSources():
+    '''Find the source files for each season. When a season has been packed into
+    an archive, the archive is used instead of the individual game files.
+
+    :return: Dictionary where the keys are the seasons and the values are the list of files.
+    '''
+    seasons = {}
+    for root, _, files in os.walk(directory):
+        try:
+            season = int(basename(root))
+        except ValueError:
+            continue
+        seasons[season] = sorted([path_join(root, f) for f in files])
+
+    if exists(archiveDirectory):
+        for fname in os.listdir(archiveDirectory):
+            if isArchive(fname):
+                seasons[archiveYear(fname)] = [path_join(archiveDirectory, fname)]
+
+    return seasons
+
+
+def fingerprintSeason(files, useHash=False):
+    '''Create the fingerprint for the source files of a season. By default the name,
+    size and modification time of each file is used. When `useHash` is true the
+    content of the files is used.
+    '''
+    fingerprint = sha256()
+    for fname in files:
+        fingerprint.update(basename(fname).encode())
+        if useHash:
+            with open(fname, "rb") as sourceFile:
+                fingerprint.update(sha256(sourceFile.read()).digest())
+        else:
+            stat = os.stat(fname)
+            fingerprint.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return fingerprint.hexdigest()
+
+
+def _iterGameData(files):
+    '''Read the json data for each game from the game files or season archive.'''
+    for fname in files:
+        if isArchive(fname):
+            with SeasonArchive(fname) as archive:
+                for _, jsonData in archive:
+                    yield jsonData
+        else:
+            with open(fname) as jsonFile:
+                yield loads(jsonFile.read())
+
+
+def parseGame(jsonData):
+    '''Parse the schedule information for a single game. The type of the last period
+    (REG, OT or SO) is read from the linescore. The box score does not count the shootout,
+    so the winner of the shootout is credited with a goal (the same as the final score).
+    '''
+    gameInfo = jsonData["gameData"]
+    localGameData = {
+        "gameId": gameInfo["game"]["pk"]
+    }
+    boxScore = jsonData["liveData"]["boxscore"]
+
+    for x in ("away", "home"):
+        localGameData.update({
+            f"{x}TeamId": boxScore["teams"][x]["team"]["id"],
+            f"{x}TeamName": boxScore["teams"][x]["team"]["name"],
+            f"{x}TeamTriCode": boxScore["teams"][x]["team"]["triCode"],
+            f"{x}TeamGoalsActual":
+                boxScore["teams"][x]["teamStats"]["teamSkaterStats"]["goals"]
+        })
+
+    linescore = jsonData["liveData"].get("linescore", {})
+    if linescore.get("hasShootout"):
+        localGameData["lastPeriodType"] = "SO"
+        shootout = linescore.get("shootoutInfo", {})
+        homeScores = shootout.get("home", {}).get("scores", 0)
+        awayScores = shootout.get("away", {}).get("scores", 0)
+        if homeScores != awayScores and \
+            localGameData["homeTeamGoalsActual"] == localGameData["awayTeamGoalsActual"]:
+            localGameData[f"{'home' if homeScores > awayScores else 'away'}TeamGoalsActual"] += 1
+    elif "currentPeriod" in linescore:
+        localGameData["lastPeriodType"] = "OT" if linescore["currentPeriod"] > 3 else "REG"
+
+    return localGameData
+
+
+def generateSeason(season, files):
+    '''Generate the schedule for a single season. The schedule is sorted by gameId
+    and written atomically to the season directory.
+
+    :return: Name of the schedule file.
+    '''
+    seasonalData = [parseGame(jsonData) for jsonData in _iterGameData(files) if jsonData]
+    seasonalData.sort(key=lambda x: x["gameId"])
+
+    seasonPath = path_join(basePath, str(season))
+    if not exists(seasonPath):
+        makedirs(seasonPath)
+
+    newPath = path_join(seasonPath, "schedule.json")
+    _writeAtomic(newPath, dumps(seasonalData, indent=2))
+
+    return newPath
+
+
+def _writeAtomic(filename, data):
+    '''Write the data to a temporary file, then move the file into place.'''
+    tmpFilename = f"{filename}.tmp"
+    with open(tmpFilename, "w") as jsonFile:
+        jsonFile.write(data)
+    replace(tmpFilename, filename)
+
+
+def _readManifest():
+    if not exists(manifestFilename):
+        return {}
+    with open(manifestFilename, "rb") as jsonFile:
+        return loads(jsonFile.read())
+
+
+def generateSchedules(useHash=False, force=False, workers=None):
+    '''Regenerate the schedules for all seasons where the source data changed.
+
+    :param useHash: When true, the content of the source files is used for the fingerprint.
+    :param force: When true, all seasons are regenerated.
+    :param workers: Maximum number of worker processes.
+    :return: List of seasons that were regenerated.
+    '''
+    if not exists(basePath):
+        makedirs(basePath)
+
+    manifest = _readManifest()
+    sources = findSeasonSources()
+
+    fingerprints = {}
+    changedSeasons = []
+    for season, files in sorted(sources.items()):
+        fingerprints[str(season)] = fingerprintSeason(files, useHash)
+        scheduleFile = path_join(basePath, str(season), "schedule.json")
+        if force or not exists(scheduleFile) or \
+            manifest.get(str(season)) != fingerprints[str(season)]:
+            changedSeasons.append(season)
+
+    if changedSeasons:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for season, scheduleFile in zip(changedSeasons, executor.map(
+                generateSeason, changedSeasons, [sources[x] for x in changedSeasons]
+            )):
+                print(f"{season}: generated {scheduleFile}")
+                manifest[str(season)] = fingerprints[str(season)]
+
+        _writeAtomic(manifestFilename, dumps(manifest, indent=2, sort_keys=True))
+
+    # the packed schedule archive (see `schedules.py`) contains all seasons
+    if changedSeasons or not exists(SCHEDULE_ARCHIVE_FILE):
+        packSchedules(basePath)
+        print(f"packed schedules into {SCHEDULE_ARCHIVE_FILE}")
+
+        # the season end strengths (priors for the next season) are read from the archive
+        loadScheduleArchive.cache_clear()
+        createSeasonStrengthsTable()
+
+    return changedSeasons
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--hash', action='store_true',
+        help='Use the content of the files rather than the modification time to find changes.'
+    )
+    parser.add_argument(
+        '--force', action='store_true', help='Regenerate all seasons.'
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=None, help='Maximum number of worker processes.'
+    )
+    args = parser.parse_args()
+
+    generated = generateSchedules(useHash=args.hash, force=args.force, workers=args.workers)
+    print(f"regenerated {len(generated)} season(s)")
@@ -0,0 +1,293 @@
+"""The warehouse is a local (sqlite) database of all ingested games. The games,
+team games and player games are stored in tables that are indexed by gameId, date,
+team and season so that queries do not require loading entire season files.
+"""
+from contextlib import closing
+from logging import getLogger
+import sqlite3
+
+
+logger = getLogger("nhl_neural_net")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    gameId INTEGER PRIMARY KEY,
+    season INTEGER NOT NULL,
+    gameType INTEGER,
+    gameDate TEXT,
+    homeTeamId INTEGER NOT NULL,
+    awayTeamId INTEGER NOT NULL,
+    homeGoals INTEGER,
+    awayGoals INTEGER,
+    lastPeriodType TEXT
+);
+CREATE INDEX IF NOT EXISTS gamesSeason ON games (season, gameType);
+CREATE INDEX IF NOT EXISTS gamesDate ON games (gameDate);
+
+CREATE TABLE IF NOT EXISTS teams (
+    teamId INTEGER PRIMARY KEY,
+    teamName TEXT,
+    triCode TEXT
+);
+
+CREATE TABLE IF NOT EXISTS teamGames (
+    gameId INTEGER NOT NULL,
+    teamId INTEGER NOT NULL,
+    opponentId INTEGER NOT NULL,
+    season INTEGER NOT NULL,
+    gameDate TEXT,
+    isHome INTEGER NOT NULL,
+    goals INTEGER,
+    goalsAgainst INTEGER,
+    pim INTEGER,
+    shots INTEGER,
+    faceOffWinPercentage REAL,
+    blocked INTEGER,
+    hits INTEGER,
+    powerPlayPercentage REAL,
+    powerPlayGoals INTEGER,
+    powerPlayOpportunities INTEGER,
+    PRIMARY KEY (gameId, teamId)
+);
+CREATE INDEX IF NOT EXISTS teamGamesTeam ON teamGames (teamId, season, gameDate);
+CREATE INDEX IF NOT EXISTS teamGamesSeason ON teamGames (season);
+CREATE INDEX IF NOT EXISTS teamGamesDate ON teamGames (gameDate);
+
+CREATE TABLE IF NOT EXISTS playerGames (
+    gameId INTEGER NOT NULL,
+    playerId INTEGER NOT NULL,
+    teamId INTEGER NOT NULL,
+    season INTEGER NOT NULL,
+    position TEXT,
+    toi INTEGER,
+    goals INTEGER,
+    assists INTEGER,
+    points INTEGER,
+    shots INTEGER,
+    shotsAgainst INTEGER,
+    saves INTEGER,
+    PRIMARY KEY (gameId, playerId)
+);
+CREATE INDEX IF NOT EXISTS playerGamesPlayer ON playerGames (playerId, season);
+CREATE INDEX IF NOT EXISTS playerGamesTeam ON playerGames (teamId, season);
+"""
+
+# Columns for each of the tables that are filled during ingestion
+GAME_COLUMNS = [
+    "gameId", "season", "gameType", "gameDate", "homeTeamId",
+    "awayTeamId", "homeGoals", "awayGoals", "lastPeriodType"
+]
+TEAM_COLUMNS = ["teamId", "teamName", "triCode"]
+TEAM_GAME_COLUMNS = [
+    "gameId", "teamId", "opponentId", "season", "gameDate", "isHome", "goals",
+    "goalsAgainst", "pim", "shots", "faceOffWinPercentage", "blocked", "hits",
+    "powerPlayPercentage", "powerPlayGoals", "powerPlayOpportunities"
+]
+PLAYER_GAME_COLUMNS = [
+    "gameId", "playerId", "teamId", "season", "position", "toi", "goals",
+    "assists", "points", "shots", "shotsAgainst", "saves"
+]
+
+
+def createGameRecords(boxscore, homeTeamData, awayTeamData, playerGames):
+    '''Create the records of a completed game for each of the tables (see `insertGames`).
+
+    :param boxscore: Box score (new version) of the game.
+    :param homeTeamData: Values of the home team parsed from the box score, containing the
+    `TEAM_COLUMNS` and the team statistics.
+    :param awayTeamData: Values of the away team parsed from the box score.
+    :param playerGames: Records of the players in the game (see `players.parsePlayerGamesNew`).
+    :return: game, teams, team games and player games records.
+    '''
+    gameId = boxscore["id"]
+    season = int(str(boxscore["season"])[:4]) if "season" in boxscore else gameId // 1000000
+    gameDate = boxscore.get("gameDate")
+
+    game = {
+        "gameId": gameId,
+        "season": season,
+        "gameType": boxscore.get("gameType", int(str(gameId)[4:6])),
+        "gameDate": gameDate,
+        "homeTeamId": homeTeamData["teamId"],
+        "awayTeamId": awayTeamData["teamId"],
+        "homeGoals": homeTeamData["goals"],
+        "awayGoals": awayTeamData["goals"],
+        "lastPeriodType": boxscore.get("gameOutcome", {}).get("lastPeriodType"),
+    }
+
+    teams = []
+    teamGames = []
+    for teamData, opponentData, isHome in (
+        (homeTeamData, awayTeamData, True), (awayTeamData, homeTeamData, False)
+    ):
+        teams.append(teamData)
+        teamGame = dict(teamData)
+        teamGame.update({
+            "gameId": gameId,
+            "opponentId": opponentData["teamId"],
+            "season": season,
+            "gameDate": gameDate,
+            "isHome": int(isHome),
+            "goalsAgainst": opponentData["goals"],
+        })
+        teamGames.append(teamGame)
+
+    for playerGame in playerGames:
+        playerGame["season"] = season
+
+    return game, teams, teamGames, playerGames
+
+
+def connect(filename):
+    '''Open a connection to the warehouse. The tables are created when they do
+    not exist.
+    '''
+    conn = sqlite3.connect(filename)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _insert(conn, table, columns, rows, replace=True):
+    '''Insert the rows (dictionaries) into the table.'''
+    if not rows:
+        return
+    command = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    conn.executemany(
+        f"{command} INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['?'] * len(columns))})",
+        [tuple(row.get(col) for col in columns) for row in rows]
+    )
+
+
+def insertGames(filename, games, teams, teamGames, playerGames):
+    '''Insert the records for the games into the warehouse. Existing records for the
+    same games are replaced.
+
+    :param filename: Filename of the warehouse.
+    :param games: List of dictionaries containing the `GAME_COLUMNS`.
+    :param teams: List of dictionaries containing the `TEAM_COLUMNS`.
+    :param teamGames: List of dictionaries containing the `TEAM_GAME_COLUMNS`.
+    :param playerGames: List of dictionaries containing the `PLAYER_GAME_COLUMNS`.
+    '''
+    with closing(connect(filename)) as conn:
+        # commit all of the tables at once (or roll back on failure)
+        with conn:
+            _insert(conn, "games", GAME_COLUMNS, games)
+            _insert(conn, "teams", TEAM_COLUMNS, teams)
+            _insert(conn, "teamGames", TEAM_GAME_COLUMNS, teamGames)
+            _insert(conn, "playerGames", PLAYER_GAME_COLUMNS, playerGames)
+
+    logger.debug(f"inserted {len(games)} games into {filename}")
+
+
+def insertRecords(filename, records):
+    '''Insert the records of each game (see `createGameRecords`) into the warehouse.
+
+    :return: Number of games inserted into the warehouse.
+    '''
+    games, teams, teamGames, playerGames = [], [], [], []
+    for game, gameTeams, gameTeamGames, gamePlayerGames in records:
+        games.append(game)
+        teams.extend(gameTeams)
+        teamGames.extend(gameTeamGames)
+        playerGames.extend(gamePlayerGames)
+
+    insertGames(filename, games, teams, teamGames, playerGames)
+    return len(games)
+
+
+def _query(filename, query, params=()):
+    '''Execute the query and return the results as a list of dictionaries.'''
+    with closing(connect(filename)) as conn:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+
+def queryGameIds(filename, season=None, endDate=None):
+    '''Get the set of game ids in the warehouse (for a season when provided).
+
+    :param endDate: When provided, only games played on or before the date
+    (YYYY-MM-DD) are returned.
+    '''
+    query = "SELECT gameId FROM games WHERE 1 = 1"
+    params = []
+    if season is not None:
+        query += " AND season = ?"
+        params.append(season)
+    if endDate is not None:
+        query += " AND gameDate <= ?"
+        params.append(endDate)
+    rows = _query(filename, query, params)
+    return {row["gameId"] for row in rows}
+
+
+def queryTeamGames(filename, teamId, season=None, isHome=None, limit=None):
+    '''Get the team game records for a team, most recent game first.
+
+    :param teamId: Id of the team.
+    :param season: When provided, only games from this season are returned.
+    :param isHome: When True (False) only home (away) games are returned.
+    :param limit: Maximum number of records. For instance, a team's last 10 home games
+    is `queryTeamGames(filename, teamId, isHome=True, limit=10)`.
+    '''
+    query = "SELECT * FROM teamGames WHERE teamId = ?"
+    params = [teamId]
+    if season is not None:
+        query += " AND season = ?"
+        params.append(season)
+    if isHome is not None:
+        query += " AND isHome = ?"
+        params.append(int(isHome))
+    query += " ORDER BY gameDate DESC, gameId DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return _query(filename, query, params)
+
+
+def queryGamesByDate(filename, gameDate):
+    '''Get all games played on the date (YYYY-MM-DD).'''
+    return _query(
+        filename, "SELECT * FROM games WHERE gameDate = ? ORDER BY gameId", (gameDate,)
+    )
+
+
+def querySeasonSchedule(filename, season, gameType=2, endDate=None):
+    '''Get all games for a season in the same format as the schedule files
+    (see `poisson.getSchedule`). The games are sorted by gameId.
+
+    :param endDate: When provided, only games played on or before the date
+    (YYYY-MM-DD) are returned.
+    '''
+    dateFilter = "" if endDate is None else "AND g.gameDate <= ?"
+    rows = _query(
+        filename,
+        f"""
+        SELECT g.gameId,
+            g.awayTeamId, a.teamName AS awayTeamName, a.triCode AS awayTeamTriCode,
+            g.awayGoals AS awayTeamGoalsActual,
+            g.homeTeamId, h.teamName AS homeTeamName, h.triCode AS homeTeamTriCode,
+            g.homeGoals AS homeTeamGoalsActual, g.lastPeriodType
+        FROM games g
+        LEFT JOIN teams a ON a.teamId = g.awayTeamId
+        LEFT JOIN teams h ON h.teamId = g.homeTeamId
+        WHERE g.season = ? AND g.gameType = ? {dateFilter}
+        ORDER BY g.gameId
+        """,
+        (season, gameType) if endDate is None else (season, gameType, endDate)
+    )
+    return rows
+
+
+def queryPlayerGames(filename, playerId=None, teamId=None, season=None):
+    '''Get the player game records for a player and/or team.'''
+    query = "SELECT * FROM playerGames WHERE 1 = 1"
+    params = []
+    for column, value in (("playerId", playerId), ("teamId", teamId), ("season", season)):
+        if value is not None:
+            query += f" AND {column} = ?"
+            params.append(value)
+    query += " ORDER BY gameId"
+    return _query(filename, query, params)
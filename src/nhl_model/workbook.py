@@ -0,0 +1,149 @@
+"""The datasets are stored as excel workbooks. The values read from the workbooks are
+converted to compact dtypes (see `compactDtypes`), and the recent form of each team is
+added to the records before they are written (see `prepareDataset`). Datasets that do
+not fit in memory are written one chunk of seasons at a time (see `writeDatasetChunked`).
+"""
+from logging import getLogger
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype
+from openpyxl import Workbook
+from nhl_model.form import addRecentFormFeatures
+
+
+logger = getLogger("nhl_neural_net")
+
+
+# Columns that contain the (repeated) team names and tricodes end with these values
+CATEGORICAL_SUFFIXES = ("Teamname", "Tricode")
+
+
+def compactDtypes(df):
+    """Apply the dtype policy to the dataset (in place). The values read from the
+    files are float64/int64 or strings, which is far more than the data requires:
+    - integer columns (counts, ids) are downcast to the smallest integer type
+    - float columns (percentages, averages) are float32
+    - team names and tricodes are categorical
+
+    :return: The dataframe with the compact dtypes.
+    """
+    for column in df.columns:
+        values = df[column]
+        if str(column).endswith(CATEGORICAL_SUFFIXES):
+            df[column] = values.astype("category")
+        elif is_bool_dtype(values):
+            continue
+        elif is_integer_dtype(values):
+            df[column] = pd.to_numeric(values, downcast="integer")
+        elif is_float_dtype(values):
+            df[column] = values.astype(np.float32)
+    return df
+
+
+def readDataset(filename):
+    """Read a dataset file (see `dataset.generateDataset`) using the compact dtypes."""
+    return compactDtypes(pd.read_excel(filename))
+
+
+def prepareDataset(df, dropScoreData=False):
+    """Final alterations to the dataset before it is written to a file. The recent
+    form of each team is added here, the form is calculated per season so this is
+    safe to apply to each chunk of seasons.
+    """
+    df = compactDtypes(addRecentFormFeatures(df))
+    if dropScoreData:
+        logger.debug("Dropping score data from the dataset")
+        df = df.drop(columns=['winner'], errors='ignore')
+    return df
+
+
+class ChunkedDatasetWriter:
+    '''Write the dataset to the excel file one chunk at a time. The workbook is
+    opened in write only mode so that rows are streamed to the file rather than
+    held in memory. The output matches the format of `DataFrame.to_excel` where
+    the first column is the (running) index of the record.
+
+    The columns of the file are set by the first chunk that is written. Columns
+    that are missing from later chunks are left empty (as they would be in the dataset
+    generated in memory). The header cannot change once it is written, so a later chunk
+    that contains columns not found in the first chunk raises a ValueError rather than
+    silently dropping data.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.workbook = Workbook(write_only=True)
+        self.worksheet = self.workbook.create_sheet("Sheet1")
+        self.columns = None
+        self.numRows = 0
+        self.nullCounts = None
+
+    def write(self, df):
+        '''Append the records in the dataframe to the file.'''
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.worksheet.append([None] + self.columns)
+        else:
+            extraColumns = [x for x in df.columns if x not in self.columns]
+            if extraColumns:
+                raise ValueError(
+                    f"columns not present in the first chunk of {self.filename}: {extraColumns}, "
+                    "generate the dataset without a memory limit"
+                )
+            df = df.reindex(columns=self.columns)
+
+        # the null count summary is built one chunk at a time too
+        chunkNullCounts = df.isna().sum()
+        self.nullCounts = chunkNullCounts if self.nullCounts is None else \
+            self.nullCounts.add(chunkNullCounts, fill_value=0)
+
+        df = df.astype(object).where(df.notna(), None)
+        for record in df.itertuples(index=False, name=None):
+            self.worksheet.append([self.numRows] + list(record))
+            self.numRows += 1
+
+    def close(self):
+        '''Save the workbook and return the null count summary.'''
+        self.workbook.save(self.filename)
+        return self.nullCounts
+
+
+def writeDatasetChunked(seasons, datasetFilename, memoryLimit, dropScoreData=False):
+    """Write the dataset one chunk at a time. Seasons are parsed and buffered until
+    the estimated memory of the buffered records would exceed `memoryLimit` (megabytes),
+    then the buffer is flushed to the dataset file. A season is never split across chunks,
+    so a single season larger than the limit is written as its own chunk.
+
+    :param seasons: Iterable of (year, list of parsed game records), the seasons are
+    parsed as they are read (see `dataset.generateDataset`).
+    :return: The number of null values found for each column of the dataset.
+    """
+    memoryLimitBytes = memoryLimit * 1024 * 1024
+
+    writer = ChunkedDatasetWriter(datasetFilename)
+
+    buffered = []
+    bufferedBytes = 0
+
+    def _flush():
+        if buffered:
+            chunk = pd.concat(buffered, ignore_index=True)
+            logger.debug(f"writing chunk of {len(chunk)} records to {datasetFilename}")
+            writer.write(prepareDataset(chunk, dropScoreData))
+            buffered.clear()
+
+    for year, seasonData in seasons:
+        seasonDF = pd.DataFrame(seasonData)
+        seasonBytes = int(seasonDF.memory_usage(deep=True).sum())
+        logger.debug(f"parsed {len(seasonDF)} records ({seasonBytes} bytes) for {year}")
+
+        if buffered and bufferedBytes + seasonBytes > memoryLimitBytes:
+            _flush()
+            bufferedBytes = 0
+
+        buffered.append(seasonDF)
+        bufferedBytes += seasonBytes
+
+    _flush()
+
+    return writer.close()
@@ -11,12 +11,14 @@ from mock import MockResponse
 from nhl_model.ann import (
     CONFIG_FILE,
     correctData,
+    createModel,
     _createArtifactDir,  # private but using anyways
     findGamesByDate,
     findTodaysGames,
     _getTeamNames,
     _loadConfig,  # private but testing this anyways
     prepareDataForPredictionsByDate,
+    _readTrainingData,  # private but testing this anyways
 )
 from nhl_model.enums import CompareFunction
 
@@ -309,3 +311,13 @@ class ANNClassTests(TestCase):
                     year
                 )
                 self.assertIsNotNone(preparedDf)
+
+    @mock.patch("nhl_model.ann.runJsonStage")
+    def test_create_model_clears_training_data(self, mock_stage):
+        '''Test that the shared training data is released when a stage fails.'''
+        # the training data is read before the feature selection algorithm fails
+        mock_stage.side_effect = lambda _name, func, *_args, **_kwargs: func()
+        filename = join(dirname(abspath(__file__)), "mock_analysis.xlsx")
+        with self.assertRaises(KeyError):
+            createModel(filename, "missing_algorithm", force=True)
+        self.assertEqual(_readTrainingData.cache_info().currsize, 0)
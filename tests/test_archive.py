@@ -0,0 +1,96 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import makedirs, remove
+from os.path import dirname, abspath, join, exists
+from json import loads, dumps
+from shutil import rmtree
+from tempfile import mkdtemp
+import pandas as pd
+from nhl_model.archive import (
+    SeasonArchive,
+    archiveFilename,
+    archiveYear,
+    findArchives,
+    isArchive,
+    packOldData,
+)
+from nhl_model.dataset import generateDataset
+
+
+GAME_IDS = [2022020003, 2022020001, 2022020002]
+
+
+class ArchiveTests(TestCase):
+    '''Test cases for the season archives of the old api game files.'''
+
+    @classmethod
+    def setUpClass(cls):
+        '''Create a season of game files from the mock data.'''
+        oldFile = join(dirname(abspath(__file__)), "MockDataOld.json")
+        with open(oldFile, "r") as jsonFile:
+            cls.oldJsonData = loads(jsonFile.read())
+
+        cls.tmpDir = mkdtemp()
+        cls.dataDir = join(cls.tmpDir, "nhl_data")
+        cls.archiveDir = join(cls.tmpDir, "nhl_archive")
+
+        seasonDir = join(cls.dataDir, "2022")
+        makedirs(seasonDir)
+
+        cls.gameFiles = []
+        for gameId in GAME_IDS:
+            cls.oldJsonData["gameData"]["game"]["pk"] = gameId
+            filename = join(seasonDir, f"{gameId}.json")
+            with open(filename, "w") as jsonFile:
+                jsonFile.write(dumps(cls.oldJsonData))
+            cls.gameFiles.append(filename)
+
+        cls.archives = packOldData(dataDir=cls.dataDir, archiveDir=cls.archiveDir)
+
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        rmtree(cls.tmpDir, ignore_errors=True)
+        return super().tearDownClass()
+
+    def test_pack_old_data(self):
+        '''A single archive is created for the season.'''
+        self.assertEqual(self.archives, [archiveFilename(2022, self.archiveDir)])
+        self.assertTrue(isArchive(self.archives[0]))
+        self.assertEqual(archiveYear(self.archives[0]), 2022)
+        self.assertEqual(findArchives(2020, 2023, self.archiveDir), {2022: self.archives[0]})
+        self.assertEqual(findArchives(2023, 2024, self.archiveDir), {})
+
+    def test_read_archive(self):
+        '''All games are read back from the archive in gameId order.'''
+        with SeasonArchive(self.archives[0]) as archive:
+            self.assertEqual(archive.year, 2022)
+            self.assertEqual(len(archive), len(GAME_IDS))
+            self.assertEqual(archive.gameIds, sorted(GAME_IDS))
+
+            for gameId, jsonData in archive:
+                self.assertEqual(jsonData["gameData"]["game"]["pk"], gameId)
+                self.assertEqual(jsonData["liveData"], self.oldJsonData["liveData"])
+
+            with self.assertRaises(KeyError):
+                archive.read(1)
+
+    def test_read_invalid_archive(self):
+        '''Files that are not archives are rejected.'''
+        with self.assertRaises(ValueError):
+            SeasonArchive(self.gameFiles[0])
+
+    def test_generate_dataset_from_archive(self):
+        '''The dataset generated from the archive matches the dataset from the game files.'''
+        datasetFilename = generateDataset("old", 1901, 1901, validFiles=sorted(self.gameFiles))
+        expectedDF = pd.read_excel(datasetFilename)
+        remove(datasetFilename)
+
+        datasetFilename = generateDataset("old", 1901, 1901, validFiles=self.archives)
+        archiveDF = pd.read_excel(datasetFilename)
+        remove(datasetFilename)
+
+        self.assertFalse(exists(datasetFilename))
+        pd.testing.assert_frame_equal(expectedDF, archiveDF)
@@ -0,0 +1,46 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import remove
+from nhl_model.backtest import (
+    BACKTEST_COLUMNS,
+    backtestSeason,
+    loadBacktest,
+    runBacktest,
+    saveBacktest,
+)
+from nhl_model.dataset import newAPIFile
+from nhl_model.poisson import execPoisson
+
+
+class BacktestTest(TestCase):
+    '''Test cases for the parallel backtest of the Poisson model.'''
+
+    def test_backtest_season(self):
+        record = backtestSeason(2006)
+        self.assertEqual(set(record), set(BACKTEST_COLUMNS))
+        self.assertEqual(record["season"], 2006)
+        self.assertEqual(record["accuracy"], execPoisson(2006))
+
+        # no schedule for the season or the previous season
+        self.assertIsNone(backtestSeason(1900))
+
+    def test_run_backtest(self):
+        # the years are sorted, seasons without a schedule are skipped
+        table, wallTime = runBacktest(2006, 1900, workers=2)
+        self.assertGreater(wallTime, 0.0)
+
+        seasons = table["season"].tolist()
+        self.assertEqual(seasons, sorted(seasons))
+        self.assertEqual(seasons[0], 1918)
+        self.assertEqual(seasons[-1], 2006)
+        self.assertEqual(table["accuracy"][-1], backtestSeason(2006)["accuracy"])
+
+        filename = newAPIFile("1900-mock-backtest.npz")
+        saveBacktest(table, filename)
+        loaded = loadBacktest(filename)
+        remove(filename)
+
+        for name, dtype in BACKTEST_COLUMNS.items():
+            self.assertEqual(loaded[name].dtype, dtype)
+            self.assertEqual(loaded[name].tolist(), table[name].tolist())
@@ -5,7 +5,8 @@ from os import remove, mkdir
 from os.path import dirname, abspath, join, exists
 from datetime import datetime
 from json import loads, dumps
-from shutil import move
+from shutil import move, rmtree
+import pandas as pd
 from nhl_core.endpoints import MAX_GAME_NUMBER
 from mock import MockResponse
 from nhl_model.dataset import (
@@ -14,10 +15,14 @@ from nhl_model.dataset import (
     parseBoxScoreNew,
     parseBoxScoreNewSplit,
     pullDatasetNewAPI,
+    generateDataset,
     RecoveryFilename,
     newAPIFile,
+    playerStoreFilename,
     BASE_SAVE_DIR
 )
+from nhl_model.players import PlayerStatStore
+from nhl_model.warehouse import queryGameIds
 
 
 def _movedFile(filename):
@@ -35,6 +40,11 @@ def _moveFileBack(filename, moved):
             move(f"{filename}.old", filename)
 
 
+# Warehouse used by the tests, the ingested mock data should not be added to the real warehouse
+_TEST_WAREHOUSE_FILE = newAPIFile("test-warehouse.db")
+_TEST_SCHEDULE_DIR = newAPIFile("1900-mock-season-schedules")
+
+
 def mocked_requests_get(*args, **kwargs):
     filename = join(dirname(abspath(__file__)), "DatasetMockData.json")
     with open(filename, "r") as jsonFile:
@@ -393,6 +403,8 @@ class DatasetTests(TestCase):
                 self.assertTrue(key in awayTeamData)
                 self.assertEqual(value, awayTeamData[key])
 
+    @mock.patch('nhl_model.dataset.WAREHOUSE_FILE', _TEST_WAREHOUSE_FILE)
+    @mock.patch('nhl_model.dataset.SEASON_SCHEDULE_DIR', _TEST_SCHEDULE_DIR)
     @mock.patch('requests.get', side_effect=mocked_requests_get)
     def test_pull_dataset_api_new_base(self, mock_get):
         '''Test pulling the dataset with the new api.'''
@@ -443,9 +455,14 @@ class DatasetTests(TestCase):
                 self.assertIsNone(currFilename)
 
             remove(currFilename)
+            if exists(_TEST_WAREHOUSE_FILE):
+                remove(_TEST_WAREHOUSE_FILE)
+            rmtree(_TEST_SCHEDULE_DIR, ignore_errors=True)
             self.assertEqual(currFilename, expectedResult)
 
 
+    @mock.patch('nhl_model.dataset.WAREHOUSE_FILE', _TEST_WAREHOUSE_FILE)
+    @mock.patch('nhl_model.dataset.SEASON_SCHEDULE_DIR', _TEST_SCHEDULE_DIR)
     @mock.patch('requests.get', side_effect=mocked_requests_get)
     def test_pull_dataset_api_new_negative(self, mock_get):
         '''Test pulling the dataset with the new api.'''
@@ -496,4 +513,94 @@ class DatasetTests(TestCase):
                 self.assertIsNone(currFilename)
 
             remove(currFilename)
+            if exists(_TEST_WAREHOUSE_FILE):
+                remove(_TEST_WAREHOUSE_FILE)
+            rmtree(_TEST_SCHEDULE_DIR, ignore_errors=True)
             self.assertEqual(currFilename, expectedResult)
+
+
+    @mock.patch('nhl_model.dataset.WAREHOUSE_FILE', _TEST_WAREHOUSE_FILE)
+    @mock.patch('nhl_model.dataset.SEASON_SCHEDULE_DIR', _TEST_SCHEDULE_DIR)
+    @mock.patch('requests.get', side_effect=ConnectionError)
+    def test_pull_dataset_api_new_unchanged(self, mock_get):
+        '''Test that the games are ingested when no new games are found.'''
+        expectedResult = newAPIFile("1900-NHL-season.json")
+
+        filename = join(dirname(abspath(__file__)), "DatasetMockData.json")
+        with open(filename, "r") as jsonFile:
+            readData = loads(jsonFile.read())
+
+        # the request for the next game fails so that no new games are found
+        jsonData = {
+            "metadata": {
+                "date": "",
+                "lastRegisteredGame": 1,
+                "year": 1900
+            },
+            "boxScores": readData["boxScores"]
+        }
+        content = dumps(jsonData, indent=2)
+        with open(expectedResult, "w+") as jsonFile:
+            jsonFile.write(content)
+
+        currFilename = pullDatasetNewAPI(1900)
+
+        with open(expectedResult, "r") as jsonFile:
+            written = jsonFile.read()
+        gameIds = queryGameIds(_TEST_WAREHOUSE_FILE) if exists(_TEST_WAREHOUSE_FILE) else set()
+
+        remove(expectedResult)
+        if exists(_TEST_WAREHOUSE_FILE):
+            remove(_TEST_WAREHOUSE_FILE)
+        rmtree(_TEST_SCHEDULE_DIR, ignore_errors=True)
+
+        self.assertEqual(currFilename, expectedResult)
+        # the file is not rewritten, but the games are still ingested
+        self.assertEqual(written, content)
+        self.assertEqual(len(gameIds), len(readData["boxScores"]))
+
+    def test_generate_dataset_chunked(self):
+        '''Test that the chunked dataset matches the dataset generated in memory.'''
+        filename = join(dirname(abspath(__file__)), "MockDataNew.json")
+
+        # create more seasons from the mock data so that each chunk is a season,
+        # the power play data is missing from the last season
+        validFiles = [filename]
+        for index, year in enumerate((2023, 2024), start=1):
+            with open(filename, "r") as jsonFile:
+                jsonData = loads(jsonFile.read())
+            jsonData["metadata"]["year"] = year
+            for boxscore in jsonData["boxScores"].values():
+                boxscore["id"] = boxscore["id"] + index * 1000000
+                if year == 2024:
+                    boxscore["homeTeam"].pop("powerPlayConversion", None)
+                    boxscore["awayTeam"].pop("powerPlayConversion", None)
+            seasonFilename = newAPIFile(f"1900-mock-season-{year}.json")
+            with open(seasonFilename, "w") as jsonFile:
+                jsonFile.write(dumps(jsonData))
+            validFiles.append(seasonFilename)
+
+        # use years that will not override any real datasets
+        datasetFilename = generateDataset("new", 1900, 1900, validFiles=validFiles)
+        expectedDF = pd.read_excel(datasetFilename)
+        remove(datasetFilename)
+
+        # the player records of all seasons are saved next to the dataset
+        store = PlayerStatStore.load(playerStoreFilename(datasetFilename))
+        remove(playerStoreFilename(datasetFilename))
+        self.assertEqual(len(set(store["gameId"].tolist())), 3)
+
+        chunkedFilename = generateDataset(
+            "new", 1900, 1900, validFiles=validFiles, memoryLimit=0
+        )
+        chunkedDF = pd.read_excel(chunkedFilename)
+        remove(chunkedFilename)
+        remove(playerStoreFilename(chunkedFilename))
+        for seasonFilename in validFiles[1:]:
+            remove(seasonFilename)
+
+        self.assertEqual(datasetFilename, chunkedFilename)
+        self.assertEqual(len(chunkedDF), 3)
+        self.assertTrue(chunkedDF["htPowerplaygoals"].iloc[:2].notna().all())
+        self.assertTrue(chunkedDF["htPowerplaygoals"].iloc[2:].isna().all())
+        pd.testing.assert_frame_equal(expectedDF, chunkedDF)
@@ -0,0 +1,81 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+import numpy as np
+from nhl_model.elo import (
+    ELO_COLUMNS,
+    INITIAL_RATING,
+    EloRatings,
+    eloAccuracy,
+    eloSeasonGames,
+    eloSeasons,
+    replayElo,
+)
+from nhl_model.poisson import getSchedule
+
+
+class EloTest(TestCase):
+    '''Test cases for the Elo ratings.'''
+
+    def test_add_game(self):
+        elo = EloRatings()
+        expected = elo.addGame(10, 8, 4, 1)
+        # the home team is favored before any game
+        self.assertGreater(expected, 0.5)
+        self.assertAlmostEqual(expected, 1.0 / (1.0 + 10.0 ** (-50.0 / 400.0)))
+
+        # the ratings are zero sum
+        self.assertGreater(elo.rating(10), INITIAL_RATING)
+        self.assertAlmostEqual(elo.rating(10) + elo.rating(8), 2 * INITIAL_RATING)
+
+        # larger wins move the ratings further
+        other = EloRatings()
+        other.addGame(10, 8, 2, 1)
+        self.assertGreater(elo.rating(10), other.rating(10))
+
+        # a tie favors the away team when the home team was expected to win
+        tie = EloRatings()
+        tie.addGame(10, 8, 2, 2)
+        self.assertLess(tie.rating(10), INITIAL_RATING)
+
+        # games without a result do not change the ratings
+        ratings = dict(elo.ratings)
+        self.assertEqual(elo.addGame(10, 8, None, None), elo.homeWinProbability(10, 8))
+        self.assertEqual(elo.ratings, ratings)
+
+    def test_start_season(self):
+        elo = EloRatings(reversion=0.5)
+        elo.startSeason(2000)
+        elo.ratings = {1: 1600.0, 2: 1400.0}
+        elo.startSeason(2000)
+        self.assertEqual(elo.ratings, {1: 1600.0, 2: 1400.0})
+        elo.startSeason(2001)
+        self.assertEqual(elo.ratings, {1: 1550.0, 2: 1450.0})
+
+    def test_replay(self):
+        seasons = eloSeasons()
+        self.assertEqual(seasons[0], 1917)
+
+        _, table = replayElo([2021, 2022])
+        self.assertEqual(list(table), list(ELO_COLUMNS))
+        self.assertEqual(len(table["gameId"]), len(getSchedule(2021)) + len(getSchedule(2022)))
+        np.testing.assert_allclose(
+            table["homeTeamWinPercent"] + table["awayTeamWinPercent"], 100.0, atol=0.011
+        )
+
+        # the seasons can be replayed in parts
+        first, _ = replayElo([2021])
+        _, second = replayElo([2022], first)
+        for name in ELO_COLUMNS:
+            np.testing.assert_array_equal(second[name], table[name][table["season"] == 2022])
+
+    def test_season_games(self):
+        elo, _ = replayElo([x for x in eloSeasons() if x < 2022])
+        games = eloSeasonGames(2022, elo)
+        _, table = replayElo([2022], replayElo([x for x in eloSeasons() if x < 2022])[0])
+
+        # the accuracy matches the scoring of the games
+        played, correct = eloAccuracy(table)
+        self.assertEqual(played, len(games))
+        self.assertEqual(correct, sum(1 for x in games if x.winnerPredicted))
+        self.assertGreater(correct / played, 0.5)
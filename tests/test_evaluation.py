@@ -0,0 +1,128 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import remove
+from os.path import exists
+import numpy as np
+import pandas as pd
+from nhl_model.backtest import backtestSeason
+from nhl_model.dataset import newAPIFile
+from nhl_model.evaluation import (
+    EVALUATION_METRICS,
+    annForecasts,
+    evaluateForecasts,
+    forecastArrays,
+    loadEvaluationReport,
+    modelForecasts,
+    poissonForecasts,
+    saveEvaluationReport,
+)
+
+
+_TEST_REPORT_FILE = newAPIFile("1900-mock-evaluation.npz")
+_TEST_PREDICTIONS_FILE = newAPIFile("1900-mock-predictions.xlsx")
+
+
+class EvaluationTest(TestCase):
+    '''Test cases for the forecast evaluation and calibration report.'''
+
+    @classmethod
+    def tearDownClass(cls):
+        for filename in (_TEST_REPORT_FILE, _TEST_PREDICTIONS_FILE):
+            if exists(filename):
+                remove(filename)
+
+    def test_forecast_arrays(self):
+        probabilities, outcomes = forecastArrays(
+            [40.0, 30.0, 0.0, 50.0], [40.0, 50.0, 0.0, 30.0],
+            [3, 1, 2, np.nan], [1, 2, 2, np.nan]
+        )
+        np.testing.assert_allclose(probabilities, [0.5, 0.375, 0.5, 0.625])
+        np.testing.assert_array_equal(outcomes, [1.0, 0.0, np.nan, np.nan])
+
+    def test_evaluate(self):
+        probabilities = np.array([0.8, 0.6, 0.3, 0.55, 0.5])
+        outcomes = np.array([1.0, 0.0, 0.0, 1.0, np.nan])
+        report = evaluateForecasts(
+            probabilities, outcomes,
+            seasons=[2021, 2021, 2022, 2022, 2022],
+            homeTeams=[1, 2, 1, 3, 1], awayTeams=[2, 1, 3, 1, 2],
+            months=[10, 11, 10, 11, 12], bins=5
+        )
+        self.assertEqual(list(report), ["overall", "season", "team", "month"])
+
+        overall = report["overall"]
+        self.assertEqual(overall["games"].tolist(), [4])
+        self.assertAlmostEqual(overall["accuracy"][0], 75.0)
+        self.assertAlmostEqual(overall["brier"][0], (0.04 + 0.36 + 0.09 + 0.2025) / 4)
+        self.assertAlmostEqual(
+            overall["logLoss"][0],
+            -(np.log(0.8) + np.log(0.4) + np.log(0.7) + np.log(0.55)) / 4
+        )
+        self.assertEqual(overall["binGames"].tolist(), [[0, 1, 1, 1, 1]])
+        self.assertAlmostEqual(overall["binPredicted"][0, 2], 0.55)
+        self.assertAlmostEqual(overall["binObserved"][0, 3], 0.0)
+        self.assertTrue(np.isnan(overall["binObserved"][0, 0]))
+
+        self.assertEqual(report["season"]["group"].tolist(), [2021, 2022])
+        self.assertEqual(report["season"]["accuracy"].tolist(), [50.0, 100.0])
+        self.assertEqual(report["month"]["games"].tolist(), [2, 2])
+
+        # each game is evaluated for both teams
+        team = report["team"]
+        self.assertEqual(team["group"].tolist(), [1, 2, 3])
+        self.assertEqual(team["games"].tolist(), [4, 2, 2])
+        self.assertEqual(team["accuracy"].tolist(), [75.0, 50.0, 100.0])
+
+    def test_save_load(self):
+        report = evaluateForecasts([0.7, 0.2], [1.0, 1.0], seasons=[2022, 2022])
+        saveEvaluationReport(report, _TEST_REPORT_FILE)
+        loaded = loadEvaluationReport(_TEST_REPORT_FILE)
+        self.assertEqual(list(loaded), ["overall", "season"])
+        for name in EVALUATION_METRICS:
+            np.testing.assert_array_equal(loaded["season"][name], report["season"][name])
+
+    def test_poisson_forecasts(self):
+        forecasts = poissonForecasts([2021, 2022])
+        report = evaluateForecasts(
+            forecasts["probabilities"], forecasts["outcomes"], seasons=forecasts["seasons"]
+        )
+
+        # ties are not evaluated, and are never predicted correctly (see `Game.winnerPredicted`)
+        for index, season in enumerate(report["season"]["group"].tolist()):
+            correct = report["season"]["accuracy"][index] * report["season"]["games"][index]
+            self.assertAlmostEqual(correct / 100.0, backtestSeason(season)["correct"])
+
+    def test_model_forecasts(self):
+        forecasts = modelForecasts("poisson", 2021, 2022)
+        self.assertEqual(sorted(set(forecasts["seasons"].tolist())), [2021, 2022])
+        np.testing.assert_array_equal(
+            forecasts["probabilities"], poissonForecasts([2021, 2022])["probabilities"]
+        )
+
+        # the elo ratings are replayed over all seasons, only the range is evaluated
+        forecasts = modelForecasts("elo", 2022, 2022)
+        self.assertEqual(set(forecasts["seasons"].tolist()), {2022})
+
+        # only the provided bounds are applied
+        seasons = modelForecasts("elo", endYear=1920)["seasons"]
+        self.assertEqual(sorted(set(seasons.tolist())), [1917, 1918, 1919, 1920])
+        self.assertEqual(modelForecasts("elo", startYear=2022)["seasons"].min(), 2022)
+
+    def test_ann_forecasts(self):
+        self.assertIsNone(annForecasts(newAPIFile("1900-missing.xlsx")))
+
+        pd.DataFrame.from_records([
+            {"homeTeam": "A", "awayTeam": "B", "gameDate": "2023-10-12", "predictedWinner": "A",
+             "homeWinProbability": 0.7, "correct": True, "winner": "A"},
+            {"homeTeam": "B", "awayTeam": "A", "gameDate": "2024-01-03", "predictedWinner": "A",
+             "homeWinProbability": None, "correct": False, "winner": "B"},
+            {"homeTeam": "A", "awayTeam": "C", "gameDate": "2024-01-04", "predictedWinner": "C",
+             "homeWinProbability": 0.4, "correct": None, "winner": None},
+        ]).to_excel(_TEST_PREDICTIONS_FILE)
+
+        forecasts = annForecasts(_TEST_PREDICTIONS_FILE)
+        np.testing.assert_allclose(forecasts["probabilities"], [0.7, 0.0, 0.4])
+        np.testing.assert_array_equal(forecasts["outcomes"], [1.0, 1.0, np.nan])
+        self.assertEqual(forecasts["seasons"].tolist(), [2023, 2023, 2023])
+        self.assertEqual(forecasts["months"].tolist(), [10, 1, 1])
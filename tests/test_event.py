@@ -1,6 +1,7 @@
 # pylint: disable=invalid-name
 # pylint: disable=missing-function-docstring
 from unittest import TestCase
+from scipy.stats import poisson
 from nhl_model.event import (
     Game,
 )
@@ -114,3 +115,44 @@ class EventClassTests(TestCase):
         for key, value in events.items():
             with self.subTest(f"testing validity", key=key, value=value):
                 self.assertEqual(key.valid, value)
+
+    def test_slots(self):
+        '''Test that the game does not store a dictionary of attributes.'''
+        game = Game(gameId=0, homeTeamId=1, awayTeamId=2)
+        self.assertFalse(hasattr(game, "__dict__"))
+        self.assertEqual(game.homeTeamEvents, [])
+
+        # unknown values are skipped
+        with self.assertLogs("nhl_neural_net", level="WARNING") as logs:
+            game.fromJson({"unknownValue": 1, "homeTeamName": "St. Louis Blues"})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("unknownValue", logs.output[0])
+        self.assertFalse(hasattr(game, "unknownValue"))
+        self.assertEqual(game.homeTeamName, "St. Louis Blues")
+
+        # read only values are calculated from the other values
+        with self.assertNoLogs("nhl_neural_net", level="WARNING"):
+            game.fromJson({"winner": "home", "valid": False, "goals": {},
+                           "lastPeriodType": "OT", "homeTeamGoalsActual": 1})
+        self.assertEqual(game.winner, "home")
+        self.assertTrue(game.valid)
+        self.assertEqual(game.goals(), {1: 1, 2: 0})
+
+    def test_poisson_pdf(self):
+        '''Test that the poisson PDF is calculated from the predicted goals.'''
+        game = Game(gameId=0, homeTeamId=1, awayTeamId=2)
+        self.assertIsNone(game.poissonPDF)
+
+        game.fromJson({
+            "homeTeamGoalsPrediction": 3.2,
+            "awayTeamGoalsPrediction": 2.7,
+            "maxGoals": 6,
+        })
+        pdfData = game.poissonPDF
+        self.assertEqual(pdfData["home"], [poisson.pmf(i, mu=3.2) for i in range(7)])
+        self.assertEqual(pdfData["away"], [poisson.pmf(i, mu=2.7) for i in range(7)])
+
+        # setting the PDF sets the number of goals
+        game.fromJson({"poissonPDF": {"home": [0.0] * 4, "away": [0.0] * 4}})
+        self.assertEqual(game.maxGoals, 3)
+        self.assertEqual(len(game.poissonPDF["home"]), 4)
@@ -0,0 +1,95 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from collections import defaultdict
+import random
+import pandas as pd
+from nhl_model.dataset import parseRecentData
+from nhl_model.form import addRecentFormFeatures, RecentFormTracker
+
+
+def _createGames(numGames, numTeams=6, seasons=(2021, 2022), seed=7):
+    rand = random.Random(seed)
+    games = []
+    for season in seasons:
+        for gameNum in range(1, numGames+1):
+            homeTeam, awayTeam = rand.sample(range(1, numTeams+1), 2)
+            games.append({
+                "gameId": season * 1000000 + 20000 + gameNum,
+                "htTeamid": homeTeam,
+                "atTeamid": awayTeam,
+                "htGoals": rand.randint(0, 6),
+                "atGoals": rand.randint(0, 6),
+            })
+    return games
+
+
+class FormTests(TestCase):
+    '''Test cases for the recent form features.'''
+
+    def test_add_recent_form_features(self):
+        '''The vectorized values should match parseRecentData for all games.'''
+        games = _createGames(120)
+        # shuffle the records, the features must be calculated in the order played
+        shuffled = list(games)
+        random.Random(3).shuffle(shuffled)
+        df = addRecentFormFeatures(pd.DataFrame(shuffled), window=5)
+        df = df.set_index("gameId")
+
+        recent = defaultdict(list)
+        for game in games:
+            record = df.loc[game["gameId"]]
+            season = game["gameId"] // 1000000
+            for prefix, gameType in (("ht", "H"), ("at", "A")):
+                data = recent[(season, game[f"{prefix}Teamid"])]
+                _, _, recentWinPercent, _ = parseRecentData(data, 5)
+                _, _, totalWinPercent, streak = parseRecentData(data)
+                _, _, gameTypeRecent, _ = parseRecentData(data, 5, gameType)
+                _, _, gameTypeTotal, _ = parseRecentData(data, None, gameType)
+
+                with self.subTest(gameId=game["gameId"], prefix=prefix):
+                    self.assertEqual(record[f"{prefix}Recentwinpercent"], recentWinPercent)
+                    self.assertEqual(record[f"{prefix}Totalwinpercent"], totalWinPercent)
+                    self.assertEqual(record[f"{prefix}Gametypewinpercentrecent"], gameTypeRecent)
+                    self.assertEqual(record[f"{prefix}Gametypewinpercent"], gameTypeTotal)
+                    self.assertEqual(record[f"{prefix}Streak"], streak)
+
+            homeWin = game["htGoals"] > game["atGoals"]
+            recent[(season, game["htTeamid"])].insert(0, ["W" if homeWin else "L", "H"])
+            recent[(season, game["atTeamid"])].insert(0, ["L" if homeWin else "W", "A"])
+
+    def test_add_recent_form_features_missing_data(self):
+        '''The dataframe is returned unaltered when the required columns are missing.'''
+        df = pd.DataFrame([{"gameId": 2022020001}])
+        self.assertEqual(list(addRecentFormFeatures(df).columns), ["gameId"])
+
+    def test_recent_form_tracker(self):
+        '''The tracker should match parseRecentData after every game.'''
+        tracker = RecentFormTracker(windows=(3, 10))
+        recent = defaultdict(list)
+
+        for game in _createGames(200, numTeams=4, seasons=(2022,)):
+            for teamId in (game["htTeamid"], game["atTeamid"]):
+                for maxRecords in (None, 3, 10):
+                    for gameType in ("", "H", "A"):
+                        with self.subTest(
+                            gameId=game["gameId"], teamId=teamId,
+                            maxRecords=maxRecords, gameType=gameType
+                        ):
+                            self.assertEqual(
+                                tracker.recentData(teamId, maxRecords, gameType),
+                                parseRecentData(recent[teamId], maxRecords, gameType)
+                            )
+
+            homeWin = game["htGoals"] > game["atGoals"]
+            tracker.addGame(game["htTeamid"], game["atTeamid"], homeWin)
+            recent[game["htTeamid"]].insert(0, ["W" if homeWin else "L", "H"])
+            recent[game["atTeamid"]].insert(0, ["L" if homeWin else "W", "A"])
+
+    def test_recent_form_tracker_invalid_window(self):
+        '''Only the windows provided to the tracker can be requested.'''
+        tracker = RecentFormTracker(windows=(10,))
+        with self.assertRaises(ValueError):
+            tracker.recentData(1, 5)
+        with self.assertRaises(ValueError):
+            RecentFormTracker(windows=(0,))
@@ -0,0 +1,110 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os.path import abspath, dirname, join as path_join
+import numpy as np
+from nhl_model.live import (
+    MAX_SCORE_DIFFERENCE,
+    REGULATION_SECONDS,
+    LiveGame,
+    LiveSlate,
+    elapsedSeconds,
+    readEventFeed,
+    runLiveFeed,
+    winProbabilityTables,
+)
+from nhl_model.poisson import skellamProbabilities
+from nhl_model.snapshot import createSnapshot
+
+
+FEED_FILE = path_join(*[dirname(abspath(__file__)), "MockLiveFeed.jsonl"])
+
+
+class LiveTest(TestCase):
+    '''Test cases for the live in-game win probabilities.'''
+
+    def test_elapsed_seconds(self):
+        self.assertEqual(elapsedSeconds(1, "00:00"), 0)
+        self.assertEqual(elapsedSeconds(2, "05:21"), 1200 + 321)
+        self.assertEqual(elapsedSeconds(3, 600), 3000)
+        self.assertEqual(elapsedSeconds(4, "01:00"), REGULATION_SECONDS + 60)
+
+    def test_tables(self):
+        tables = winProbabilityTables(3.1, 2.7)
+        self.assertEqual(tables.shape, (361, 2 * MAX_SCORE_DIFFERENCE + 1, 3))
+        np.testing.assert_allclose(tables.sum(axis=-1), 1.0)
+
+        # the start of a tied game is the pre-game prediction
+        homeWin, awayWin, tie, _, _ = skellamProbabilities(3.1, 2.7)
+        np.testing.assert_allclose(
+            tables[0, MAX_SCORE_DIFFERENCE], [homeWin[0], awayWin[0], tie[0]], atol=1e-8
+        )
+
+        # no time remaining, the current score is the result
+        np.testing.assert_allclose(tables[-1, MAX_SCORE_DIFFERENCE], [0.0, 0.0, 1.0])
+        np.testing.assert_allclose(tables[-1, MAX_SCORE_DIFFERENCE + 1], [1.0, 0.0, 0.0])
+        np.testing.assert_allclose(tables[-1, MAX_SCORE_DIFFERENCE - 2], [0.0, 1.0, 0.0])
+
+        # a lead is worth more as the time runs out
+        leading = tables[:, MAX_SCORE_DIFFERENCE + 1, 0]
+        self.assertTrue(np.all(np.diff(leading) >= -1e-12))
+
+    def test_live_game(self):
+        game = LiveGame(1, 10, 8, 3.1, 2.7)
+        before = game.homeWinProbability
+
+        game.update(elapsedSeconds(1, "05:00"), awayGoal=True)
+        self.assertEqual((game.homeTeamGoals, game.awayTeamGoals), (0, 1))
+        self.assertLess(game.homeWinProbability, before)
+
+        # time never moves backwards
+        game.update(elapsedSeconds(2, "10:00"), homeGoal=True)
+        game.update(elapsedSeconds(1, "10:00"))
+        self.assertEqual(game.elapsed, 1800)
+
+        game.update(REGULATION_SECONDS - 10)
+        self.assertGreater(game.json["regulationTiePercent"], 80.0)
+
+        game.update(homeGoal=True)
+        game.end()
+        self.assertTrue(game.final)
+        self.assertEqual(game.homeWinProbability, 1.0)
+        self.assertEqual(game.json["homeTeamWinPercent"], 100.0)
+
+    def test_slate_feed(self):
+        slate = LiveSlate(createSnapshot(2022))
+        games = []
+        updated = runLiveFeed(
+            readEventFeed(FEED_FILE), slate, callback=lambda event, game: games.append(game)
+        )
+
+        # the event for the game that did not start is skipped
+        self.assertEqual(updated, 11)
+        self.assertEqual(len(games), updated)
+        self.assertEqual(len(slate), 2)
+
+        tor = slate.games[2022020001]
+        self.assertEqual((tor.homeTeamId, tor.awayTeamId), (10, 8))
+        self.assertEqual((tor.homeTeamGoals, tor.awayTeamGoals), (2, 1))
+        self.assertEqual(tor.homeWinProbability, 1.0)
+
+        # overtime goal
+        bos = slate.games[2022020002]
+        self.assertEqual((bos.homeTeamGoals, bos.awayTeamGoals), (1, 2))
+        self.assertEqual(bos.homeWinProbability, 0.0)
+
+    def test_slate_expected_goals(self):
+        slate = LiveSlate()
+        game = slate.addEvent({
+            "gameId": 1, "event": "START", "homeTeam": "A", "awayTeam": "B",
+            "homeTeamGoalsPrediction": 3.0, "awayTeamGoalsPrediction": 3.0,
+        })
+        self.assertAlmostEqual(game.homeWinProbability, 0.5)
+
+        slate.addEvent({"gameId": 1, "event": "GOAL", "team": "B", "period": 3})
+        self.assertLess(game.homeWinProbability, 0.5)
+
+        with self.assertRaises(ValueError):
+            slate.addEvent({"gameId": 1, "event": "GOAL", "team": "C", "period": 3})
+        with self.assertRaises(ValueError):
+            slate.addEvent({"gameId": 2, "event": "START", "homeTeam": "A", "awayTeam": "B"})
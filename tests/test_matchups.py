@@ -0,0 +1,73 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from math import isnan
+from os import remove
+from nhl_model.dataset import newAPIFile
+from nhl_model.matchups import (
+    MATCHUP_COLUMNS,
+    MatchupMatrix,
+    createMatchupMatrix,
+    matchupFile,
+)
+from nhl_model.poisson import getSchedule
+from nhl_model.snapshot import createSnapshot
+
+
+class MatchupTest(TestCase):
+    '''Test cases for the precomputed matchup matrix.'''
+
+    def _assertMatchesSnapshot(self, matrix, snapshot):
+        teamIds = matrix.teamIds.tolist()
+        pairs = [(h, a) for h in teamIds for a in teamIds if h != a]
+        for (homeTeamId, awayTeamId), prediction in zip(pairs, snapshot.predictGames(pairs)):
+            lookup = matrix.lookup(homeTeamId, awayTeamId)
+            for name in MATCHUP_COLUMNS:
+                self.assertAlmostEqual(lookup[name], prediction[name], places=4)
+
+    def test_matrix_matches_snapshot(self):
+        schedule = getSchedule(2006)
+        snapshot = createSnapshot(2006)
+
+        # before the season, part way through the season and at the end of the season
+        for numGames in (0, 50, len(schedule)):
+            snapshot.update(schedule[:numGames])
+            matrix = createMatchupMatrix(snapshot)
+            self.assertEqual(len(matrix), 30)
+            self.assertEqual(matrix.values.shape, (30, 30, len(MATCHUP_COLUMNS)))
+            self._assertMatchesSnapshot(matrix, snapshot)
+
+        index = matrix.teamIndex("TOR")
+        self.assertTrue(isnan(matrix.column("homeTeamWinPercent")[index, index]))
+        self.assertEqual(matrix.lookup("TOR", "MTL"), matrix.lookup(10, 8))
+        with self.assertRaises(KeyError):
+            matrix.lookup("XXX", "TOR")
+
+        # overtime is split by the chance to score the next goal
+        prediction = matrix.lookup("TOR", "MTL")
+        homeWin = matrix.homeWinProbability("TOR", "MTL")
+        self.assertGreater(homeWin * 100.0, prediction["homeTeamWinPercent"])
+        self.assertLess(homeWin * 100.0,
+                        prediction["homeTeamWinPercent"] + prediction["regulationTiePercent"])
+
+    def test_matrix_team_ids(self):
+        snapshot = createSnapshot(2006)
+        matrix = createMatchupMatrix(snapshot, teamIds=[10, 8])
+        self.assertEqual(matrix.teamIds.tolist(), [8, 10])
+        self.assertEqual(matrix.triCodes.tolist(), ["MTL", "TOR"])
+
+    def test_save_load(self):
+        snapshot = createSnapshot(2022)
+        snapshot.update(getSchedule(2022)[:100])
+        matrix = createMatchupMatrix(snapshot)
+
+        filename = newAPIFile("1900-mock-matchups.npz")
+        matrix.save(filename)
+        loaded = MatchupMatrix.load(filename)
+        remove(filename)
+
+        self.assertEqual(loaded.season, 2022)
+        self.assertEqual(loaded.teamIds.tolist(), matrix.teamIds.tolist())
+        self.assertEqual(loaded.triCodes.tolist(), matrix.triCodes.tolist())
+        self.assertEqual(loaded.lookup("TOR", "MTL"), matrix.lookup("TOR", "MTL"))
+        self.assertTrue(matchupFile(2022).endswith("2022-Matchups.npz"))
@@ -0,0 +1,100 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import remove
+from os.path import exists
+from nhl_model.dataset import newAPIFile
+from nhl_model.pipeline import (
+    fingerprintStage,
+    isStageCurrent,
+    readJsonArtifact,
+    readManifest,
+    runJsonStage,
+    runStage,
+)
+
+
+_TEST_MANIFEST_FILE = newAPIFile("1900-mock-manifest.json")
+_TEST_INPUT_FILE = newAPIFile("1900-mock-input.txt")
+_TEST_ARTIFACT_FILE = newAPIFile("1900-mock-artifact.txt")
+
+
+class PipelineTest(TestCase):
+    '''Test cases for the stages of the pipeline.'''
+
+    def setUp(self):
+        with open(_TEST_INPUT_FILE, "w") as inputFile:
+            inputFile.write("season data")
+        self.executed = 0
+
+    def tearDown(self):
+        for filename in (_TEST_MANIFEST_FILE, _TEST_INPUT_FILE, _TEST_ARTIFACT_FILE):
+            if exists(filename):
+                remove(filename)
+
+    def _createArtifact(self):
+        self.executed += 1
+        with open(_TEST_ARTIFACT_FILE, "w") as artifactFile:
+            artifactFile.write("dataset")
+
+    def _runStage(self, params={"version": "new"}, force=False):
+        return runStage(
+            "dataset", self._createArtifact, inputs=[_TEST_INPUT_FILE], params=params,
+            artifacts=[_TEST_ARTIFACT_FILE], force=force, filename=_TEST_MANIFEST_FILE
+        )
+
+    def test_fingerprint(self):
+        fingerprint = fingerprintStage([_TEST_INPUT_FILE], {"a": 1, "b": 2})
+        self.assertEqual(fingerprint, fingerprintStage([_TEST_INPUT_FILE], {"b": 2, "a": 1}))
+        self.assertNotEqual(fingerprint, fingerprintStage([_TEST_INPUT_FILE], {"a": 2, "b": 2}))
+
+        with open(_TEST_INPUT_FILE, "w") as inputFile:
+            inputFile.write("new season data")
+        self.assertNotEqual(fingerprint, fingerprintStage([_TEST_INPUT_FILE], {"a": 1, "b": 2}))
+
+    def test_skip_unchanged_stage(self):
+        self.assertTrue(self._runStage())
+        self.assertFalse(self._runStage())
+        self.assertEqual(self.executed, 1)
+
+        manifest = readManifest(_TEST_MANIFEST_FILE)
+        self.assertEqual(manifest["dataset"]["artifacts"], [_TEST_ARTIFACT_FILE])
+
+        self.assertTrue(self._runStage(force=True))
+        self.assertEqual(self.executed, 2)
+
+    def test_rerun_changed_stage(self):
+        self.assertTrue(self._runStage())
+
+        # parameters changed
+        self.assertTrue(self._runStage(params={"version": "old"}))
+
+        # inputs changed
+        with open(_TEST_INPUT_FILE, "w") as inputFile:
+            inputFile.write("new season data")
+        self.assertTrue(self._runStage(params={"version": "old"}))
+
+        # artifact removed
+        remove(_TEST_ARTIFACT_FILE)
+        fingerprint = fingerprintStage([_TEST_INPUT_FILE], {"version": "old"})
+        self.assertFalse(isStageCurrent(
+            "dataset", fingerprint, [_TEST_ARTIFACT_FILE], _TEST_MANIFEST_FILE
+        ))
+        self.assertTrue(self._runStage(params={"version": "old"}))
+        self.assertEqual(self.executed, 4)
+
+    def test_json_stage(self):
+        def _select():
+            self.executed += 1
+            return ["a", "b"]
+
+        for _ in range(2):
+            result = runJsonStage(
+                "features", _select, "features", _TEST_ARTIFACT_FILE,
+                inputs=[_TEST_INPUT_FILE], filename=_TEST_MANIFEST_FILE
+            )
+            # the second execution reads the result from the artifact
+            self.assertEqual(result, ["a", "b"])
+        self.assertEqual(self.executed, 1)
+        self.assertEqual(readJsonArtifact(_TEST_ARTIFACT_FILE, "features"), ["a", "b"])
+        self.assertEqual(readJsonArtifact(_TEST_MANIFEST_FILE + ".missing", "features", []), [])
@@ -0,0 +1,140 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import listdir, remove
+from os.path import dirname, abspath, basename, exists, join
+from json import loads
+import numpy as np
+from nhl_model.dataset import newAPIFile
+from nhl_model.players import PlayerStatStore, PlayerStoreWriter, parsePlayerGamesNew
+
+
+def _goalie(playerId, teamId, gameId, saves, shotsAgainst):
+    return {
+        "playerId": playerId, "teamId": teamId, "gameId": gameId, "position": "G",
+        "toi": 3600, "points": 0, "shotsAgainst": shotsAgainst, "saves": saves
+    }
+
+
+def _skater(playerId, teamId, gameId, toi, points=0):
+    return {
+        "playerId": playerId, "teamId": teamId, "gameId": gameId, "position": "C",
+        "toi": toi, "points": points, "shotsAgainst": 0, "saves": 0
+    }
+
+
+class PlayersTest(TestCase):
+    '''Test cases for the columnar player stat store.'''
+
+    def test_from_box_scores(self):
+        filename = join(dirname(abspath(__file__)), "MockDataNew.json")
+        with open(filename, "r") as jsonFile:
+            jsonData = loads(jsonFile.read())
+
+        records = []
+        for boxscore in jsonData["boxScores"].values():
+            records.extend(parsePlayerGamesNew(boxscore))
+        store = PlayerStatStore.fromRecords(records)
+
+        self.assertEqual(len(store), len(records))
+        self.assertTrue(store["isGoalie"].any())
+        self.assertTrue(all(store["toi"] > 0))
+
+        for record in records:
+            rows = store.playerRows(record["playerId"])
+            self.assertIn(record["gameId"], store["gameId"][rows].tolist())
+
+    def test_indexes(self):
+        store = PlayerStatStore.fromRecords([
+            _skater(1, 10, 3, 900),
+            _skater(1, 10, 1, 1000),
+            _skater(2, 20, 1, 800),
+            _skater(1, 10, 2, 1100),
+        ])
+
+        rows = store.playerRows(1)
+        self.assertEqual(store["gameId"][rows].tolist(), [1, 2, 3])
+        self.assertEqual(store["toi"][rows].tolist(), [1000, 1100, 900])
+        self.assertEqual(store.teamRows(20).tolist(), [2])
+        self.assertEqual(len(store.playerRows(99)), 0)
+
+        selected = store.select(store.teamRows(10))
+        self.assertEqual(selected["playerId"].tolist(), [1, 1, 1])
+
+    def test_goalie_form(self):
+        store = PlayerStatStore.fromRecords([
+            _goalie(1, 10, 1, 27, 30),
+            _goalie(1, 10, 2, 18, 20),
+            _skater(2, 10, 2, 1000),
+            _goalie(1, 10, 3, 9, 10),
+            _goalie(3, 20, 1, 20, 25),
+            _goalie(1, 10, 4, 10, 10),
+        ])
+
+        form = store.goalieForm(window=2)
+
+        # no previous games for the first game of each goalie or skaters
+        self.assertTrue(np.isnan(form[0]))
+        self.assertTrue(np.isnan(form[2]))
+        self.assertTrue(np.isnan(form[4]))
+        self.assertEqual(form[1], 90.0)
+        self.assertEqual(form[3], round(45 / 50 * 100.0, 2))
+        # only the last 2 games are included
+        self.assertEqual(form[5], round(27 / 30 * 100.0, 2))
+
+    def test_top_line_toi(self):
+        store = PlayerStatStore.fromRecords([
+            _skater(1, 10, 1, 1000),
+            _skater(2, 10, 1, 900),
+            _skater(3, 10, 1, 800),
+            _goalie(4, 10, 1, 20, 22),
+            _skater(5, 20, 1, 700),
+            _skater(1, 10, 2, 500),
+        ])
+
+        gameIds, teamIds, toi = store.topLineToi(numPlayers=2)
+        self.assertEqual(gameIds.tolist(), [1, 1, 2])
+        self.assertEqual(teamIds.tolist(), [10, 20, 10])
+        self.assertEqual(toi.tolist(), [1900, 700, 500])
+
+    def test_save_load(self):
+        store = PlayerStatStore.concat([
+            PlayerStatStore.fromRecords([_skater(1, 10, 1, 1000)]),
+            PlayerStatStore.fromRecords([_goalie(2, 20, 1, 20, 22)]),
+        ])
+
+        filename = newAPIFile("1900-mock-players.npz")
+        store.save(filename)
+        loaded = PlayerStatStore.load(filename)
+        remove(filename)
+
+        self.assertEqual(len(loaded), 2)
+        for name, values in store.columns.items():
+            self.assertEqual(values.dtype, loaded[name].dtype)
+            self.assertEqual(values.tolist(), loaded[name].tolist())
+
+    def test_writer(self):
+        stores = [
+            PlayerStatStore.fromRecords([_skater(1, 10, 1, 1000), _skater(3, 10, 1, 900)]),
+            PlayerStatStore(),
+            PlayerStatStore.fromRecords([_goalie(2, 20, 2, 20, 22)]),
+        ]
+
+        filename = newAPIFile("1900-mock-players.npz")
+        writer = PlayerStoreWriter(filename)
+        for store in stores:
+            writer.write(store)
+        self.assertEqual(writer.close(), 3)
+        loaded = PlayerStatStore.load(filename)
+        remove(filename)
+
+        # the file matches the store of all chunks, the temporary files are removed
+        expected = PlayerStatStore.concat(stores)
+        for name, values in expected.columns.items():
+            self.assertEqual(values.dtype, loaded[name].dtype)
+            self.assertEqual(values.tolist(), loaded[name].tolist())
+        self.assertFalse([x for x in listdir(dirname(filename)) if x.startswith(basename(filename))])
+
+        # nothing is saved without chunks
+        self.assertEqual(PlayerStoreWriter(filename).close(), 0)
+        self.assertFalse(exists(filename))
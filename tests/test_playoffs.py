@@ -0,0 +1,115 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from itertools import product
+import numpy as np
+from nhl_model.playoffs import (
+    bracketProbabilities,
+    createPlayoffMatchup,
+    firstRoundSeeds,
+    matchupSeriesProbability,
+    scheduleStandings,
+    seriesGameProbabilities,
+    seriesProbabilities,
+)
+from nhl_model.poisson import getSchedule
+
+
+def _bruteForceSeries(gameProbabilities):
+    # playing all 7 games does not change the winner of the series
+    total = 0.0
+    for outcome in product([1, 0], repeat=len(gameProbabilities)):
+        if sum(outcome) >= 4:
+            total += np.prod([p if x else 1.0 - p for p, x in zip(gameProbabilities, outcome)])
+    return total
+
+
+class PlayoffTest(TestCase):
+    '''Test cases for the exact series and bracket probabilities.'''
+
+    def test_series_game_probabilities(self):
+        self.assertEqual(
+            seriesGameProbabilities(0.6, 0.3), [0.6, 0.6, 0.7, 0.7, 0.6, 0.7, 0.6]
+        )
+
+    def test_series_probabilities_even(self):
+        probability, lengths = seriesProbabilities([0.5] * 7)
+        self.assertAlmostEqual(probability, 0.5)
+        np.testing.assert_allclose(lengths[0], [0, 0, 0, 0.0625, 0.125, 0.15625, 0.15625])
+        np.testing.assert_allclose(lengths[0], lengths[1])
+
+    def test_series_probabilities(self):
+        for gameProbabilities in ([0.7] * 7, seriesGameProbabilities(0.62, 0.55),
+                                  [0.1, 0.9, 0.3, 0.5, 0.8, 0.2, 0.6]):
+            probability, lengths = seriesProbabilities(gameProbabilities)
+            self.assertAlmostEqual(probability, _bruteForceSeries(gameProbabilities))
+            self.assertAlmostEqual(lengths.sum(), 1.0)
+
+        self.assertEqual(seriesProbabilities([1.0] * 7)[1][0, 3], 1.0)
+
+    def test_bracket_probabilities(self):
+        # the home team wins 60% of the games and the teams are otherwise equal
+        firstRound = {x: (f"{x}1", f"{x}2") for x in "abcdefgh"}
+        probabilities = bracketProbabilities(firstRound, {}, lambda home, away: 0.6)
+
+        self.assertEqual(len(probabilities), 16)
+        for rounds in probabilities.values():
+            self.assertEqual(len(rounds), 4)
+        for roundIndex, teams in enumerate((8, 4, 2, 1)):
+            self.assertAlmostEqual(sum(x[roundIndex] for x in probabilities.values()), teams)
+
+        higherSeed = matchupSeriesProbability("a1", "a2", lambda home, away: 0.6)
+        self.assertAlmostEqual(probabilities["a1"][0], higherSeed)
+        self.assertAlmostEqual(probabilities["a2"][0], 1.0 - higherSeed)
+
+    def test_bracket_probabilities_dominant_team(self):
+        # a1 wins every game, the other teams are equal
+        def _homeWinProbability(home, away):
+            if "a1" in (home, away):
+                return 1.0 if home == "a1" else 0.0
+            return 0.5
+
+        firstRound = {x: (f"{x}1", f"{x}2") for x in "abcd"}
+        probabilities = bracketProbabilities(firstRound, {}, _homeWinProbability)
+        self.assertEqual(probabilities["a1"], [1.0, 1.0, 1.0])
+        self.assertAlmostEqual(probabilities["c1"][1], 0.25)
+        self.assertEqual(probabilities["b1"][1], 0.0)
+
+    def test_first_round_seeds(self):
+        teamData = {"data": [{"triCode": "BOS"}, {"triCode": "FLA"}]}
+        metadata = {"a": createPlayoffMatchup(teamData, "BOS", "FLA"), "b": None}
+        self.assertEqual(firstRoundSeeds(metadata), {"a": ("BOS", "FLA")})
+        self.assertEqual(firstRoundSeeds(None), {})
+
+    def test_schedule_standings(self):
+        def _game(home, away, homeGoals, awayGoals, lastPeriodType="REG"):
+            return {
+                "homeTeamId": home[0], "homeTeamTriCode": home[1],
+                "awayTeamId": away[0], "awayTeamTriCode": away[1],
+                "homeTeamGoalsActual": homeGoals, "awayTeamGoalsActual": awayGoals,
+                "lastPeriodType": lastPeriodType,
+            }
+
+        bos, tor, col = (6, "BOS"), (10, "TOR"), (21, "COL")
+        standings = scheduleStandings(2022, [
+            _game(bos, tor, 1, 2, "OT"), _game(col, bos, 4, 1), _game(col, tor, None, None)
+        ])
+        # TOR and COL have the same points, the order of the team ids breaks the tie
+        self.assertEqual(standings["W"], {"COL": {"conf": 1, "league": 2}})
+        self.assertEqual(standings["E"], {
+            "TOR": {"conf": 1, "league": 1}, "BOS": {"conf": 2, "league": 3}
+        })
+
+        # the later rounds are seeded with the standings of the season
+        standings = scheduleStandings(2022, getSchedule(2022))
+        self.assertEqual(sum(len(x) for x in standings.values()), 32)
+        self.assertEqual(standings["E"]["BOS"]["league"], 1)
+
+        # the alignment of the season is used, Detroit was in the western conference
+        standings = scheduleStandings(2006, getSchedule(2006))
+        self.assertIn("DET", standings["W"])
+        self.assertEqual(len(standings["E"]), 15)
+        with self.assertRaises(ValueError):
+            scheduleStandings(1990, getSchedule(1990))
+        standings = scheduleStandings(1990, getSchedule(1990), conferences={"BOS": "Wales"})
+        self.assertIn("BOS", standings["Wales"])
@@ -7,12 +7,25 @@ from os.path import dirname, abspath, join, exists
 from json import loads
 from collections import defaultdict
 from shutil import copytree, rmtree
+from scipy.stats import poisson
 from nhl_core.endpoints import MAX_GAME_NUMBER
 from nhl_model.poisson import (
+    AdjustedStrengthAccumulator,
     parseSchedule,
     calculateAvgGoals,
     calculateScores,
+    createPredictions,
+    createStrengthAccumulator,
+    DecayedStrengthAccumulator,
+    findMaxGoalsScored,
+    outcomeProbabilities,
+    skellamProbabilities,
     getSeasonEventsFromSchedules,
+    getSeasonStrengths,
+    parseSeasonEvents,
+    SeasonStrengths,
+    StrengthAccumulator,
+    WindowStrengthAccumulator,
 )
 
 BADSEASON = 2004
@@ -234,3 +247,258 @@ class PoissonTests(TestCase):
         # These schedules do NOT include the full expansion teams so the number
         # of games should be less than max
         self.assertLess(total, MAX_GAME_NUMBER)
+
+    def test_strength_accumulator(self):
+        '''Test that the accumulated strengths are equal to the values calculated
+        from the list of games as each game is added.'''
+        homeTeamEvents, awayTeamEvents = parseSchedule(self.jsonSchedule)
+        games = sorted(
+            [x for events in homeTeamEvents.values() for x in events], key=lambda x: x.gameId
+        )
+
+        accumulator = StrengthAccumulator()
+        self.assertEqual(accumulator.averageGoals(), (0.0, 0.0))
+        self.assertEqual(accumulator.maxGoals, 0)
+
+        parsedHomeTeamEvents = defaultdict(list)
+        parsedAwayTeamEvents = defaultdict(list)
+        for index, game in enumerate(games):
+            accumulator.addEvent(game)
+            parsedHomeTeamEvents[game.homeTeamId].append(game)
+            parsedAwayTeamEvents[game.awayTeamId].append(game)
+
+            # checking every game is slow (that is the point of the accumulator)
+            if index % 100 != 0 and index != len(games) - 1:
+                continue
+
+            with self.subTest(f"Ensure values are equal after {index+1} games", index=index):
+                self.assertEqual(accumulator.averageGoals(), calculateAvgGoals(parsedHomeTeamEvents))
+                self.assertEqual(accumulator.maxGoals, findMaxGoalsScored(parsedHomeTeamEvents))
+
+                teamIds = list(accumulator.teamIds)
+                self.assertEqual(
+                    accumulator.scores(teamIds),
+                    calculateScores(teamIds, parsedHomeTeamEvents, parsedAwayTeamEvents)
+                )
+
+        self.assertEqual(accumulator.teamIds, set(homeTeamEvents) | set(awayTeamEvents))
+
+    def test_recency_weighted_accumulators(self):
+        '''Test the decayed and window strengths against the values calculated
+        from the recent games of the team.'''
+        self.assertIsInstance(createStrengthAccumulator(), StrengthAccumulator)
+        self.assertIsInstance(createStrengthAccumulator(halfLife=5), DecayedStrengthAccumulator)
+        self.assertIsInstance(createStrengthAccumulator(window=5), WindowStrengthAccumulator)
+        with self.assertRaises(ValueError):
+            createStrengthAccumulator(halfLife=5, window=5)
+        with self.assertRaises(ValueError):
+            createStrengthAccumulator(halfLife=0)
+        with self.assertRaises(ValueError):
+            createStrengthAccumulator(window=0)
+
+        homeTeamEvents, _ = parseSchedule(self.jsonSchedule)
+        games = sorted(
+            [x for events in homeTeamEvents.values() for x in events], key=lambda x: x.gameId
+        )
+
+        halfLife = 4
+        window = 5
+        # a very small half life forces the sums to be rescaled
+        accumulators = [
+            StrengthAccumulator(),
+            DecayedStrengthAccumulator(halfLife),
+            WindowStrengthAccumulator(window),
+            DecayedStrengthAccumulator(0.05),
+        ]
+        for game in games:
+            for accumulator in accumulators:
+                accumulator.addEvent(game)
+
+        teamId = games[-1].homeTeamId
+        homeGames = [x for x in games if x.homeTeamId == teamId]
+        goalsFor = [x.homeTeamGoalsActual for x in homeGames]
+        goalsAgainst = [x.awayTeamGoalsActual for x in homeGames]
+
+        allGames, decayed, windowed, lastGame = accumulators
+
+        # the league averages are not weighted
+        for accumulator in accumulators:
+            self.assertEqual(accumulator.averageGoals(), allGames.averageGoals())
+
+        weights = [0.5 ** ((len(homeGames) - 1 - i) / halfLife) for i in range(len(homeGames))]
+        expected = (
+            sum(w * x for w, x in zip(weights, goalsFor)) / sum(weights),
+            sum(w * x for w, x in zip(weights, goalsAgainst)) / sum(weights),
+        )
+        for value, expectedValue in zip(decayed.homeAverages(teamId), expected):
+            self.assertAlmostEqual(value, expectedValue)
+
+        self.assertEqual(
+            windowed.homeAverages(teamId),
+            (sum(goalsFor[-window:]) / window, sum(goalsAgainst[-window:]) / window)
+        )
+
+        for value, expectedValue in zip(lastGame.homeAverages(teamId),
+                                        (goalsFor[-1], goalsAgainst[-1])):
+            self.assertAlmostEqual(value, expectedValue, places=4)
+
+        avgHomeGoals, avgAwayGoals = allGames.averageGoals()
+        scores = windowed.teamScores(teamId)
+        self.assertAlmostEqual(
+            scores["homeAttackStrength"], sum(goalsFor[-window:]) / window / avgHomeGoals
+        )
+        self.assertAlmostEqual(
+            scores["homeDefenseStrength"], sum(goalsAgainst[-window:]) / window / avgAwayGoals
+        )
+
+    def test_adjusted_accumulator(self):
+        '''Test that the converged adjusted strengths are the maximum likelihood solution
+        and that the warm started refit requires fewer iterations.'''
+        homeTeamEvents, _ = parseSchedule(self.jsonSchedule)
+        games = sorted(
+            [x for events in homeTeamEvents.values() for x in events], key=lambda x: x.gameId
+        )
+
+        self.assertIsInstance(
+            createStrengthAccumulator(adjusted=True), AdjustedStrengthAccumulator
+        )
+        with self.assertRaises(ValueError):
+            createStrengthAccumulator(window=5, adjusted=True)
+
+        accumulator = AdjustedStrengthAccumulator(shrinkage=0.0, tolerance=1e-10)
+        for game in games:
+            accumulator.addEvent(game)
+        coldIterations = accumulator.solve(maxIterations=1000)
+        self.assertLess(coldIterations, 1000)
+
+        # the expected goals of each team are equal to the actual goals at the solution
+        avgHomeGoals, avgAwayGoals = accumulator.averageGoals()
+        scores = accumulator.scores(accumulator.teamIds)
+        for teamId in accumulator.teamIds:
+            homeGames = [x for x in games if x.homeTeamId == teamId]
+            expectedGoals = sum(
+                avgHomeGoals * scores[teamId]["homeAttackStrength"] *
+                scores[x.awayTeamId]["awayDefenseStrength"] for x in homeGames
+            )
+            self.assertAlmostEqual(expectedGoals, sum(x.homeTeamGoalsActual for x in homeGames))
+
+            expectedGoals = sum(
+                avgAwayGoals * scores[x.awayTeamId]["awayAttackStrength"] *
+                scores[teamId]["homeDefenseStrength"] for x in homeGames
+            )
+            self.assertAlmostEqual(expectedGoals, sum(x.awayTeamGoalsActual for x in homeGames))
+
+        # refit after another game starts from the previous solution
+        accumulator.addEvent(games[0])
+        self.assertLess(accumulator.solve(maxIterations=1000), coldIterations)
+
+    def test_parse_season_events_recency(self):
+        '''Test that the strength mode changes the predictions, but not the games.'''
+        allHomeTeamEvents, _ = getSeasonEventsFromSchedules(
+            self.jsonScheduleTop, self.jsonSchedule
+        )
+        windowHomeTeamEvents, _ = getSeasonEventsFromSchedules(
+            self.jsonScheduleTop, self.jsonSchedule, window=5
+        )
+        decayedHomeTeamEvents, _ = parseSeasonEvents(TOPSEASON, halfLife=10)
+        adjustedHomeTeamEvents, _ = parseSeasonEvents(TOPSEASON, adjusted=True)
+
+        def _predictions(events):
+            return {
+                x.gameId: x.homeTeamGoalsPrediction for games in events.values() for x in games
+            }
+
+        allPredictions = _predictions(allHomeTeamEvents)
+        for events in (windowHomeTeamEvents, decayedHomeTeamEvents, adjustedHomeTeamEvents):
+            predictions = _predictions(events)
+            self.assertEqual(set(predictions), set(allPredictions))
+            self.assertNotEqual(predictions, allPredictions)
+
+    def test_create_predictions(self):
+        '''Test the vectorized predictions against the sums over each score.'''
+        maxGoals, homeGoals, awayGoals = 8, 3.2, 2.7
+        homeWin, awayWin, tie, pdfData = createPredictions(maxGoals, homeGoals, awayGoals)
+
+        homePMF = [poisson.pmf(i, mu=homeGoals) for i in range(maxGoals+1)]
+        awayPMF = [poisson.pmf(i, mu=awayGoals) for i in range(maxGoals+1)]
+        self.assertEqual(pdfData["home"], homePMF)
+        self.assertEqual(pdfData["away"], awayPMF)
+
+        expectedHomeWin = sum(homePMF[j] * awayPMF[i]
+                              for i in range(maxGoals+1) for j in range(i+1, maxGoals+1))
+        expectedAwayWin = sum(awayPMF[j] * homePMF[i]
+                              for i in range(maxGoals+1) for j in range(i+1, maxGoals+1))
+        expectedTie = sum(homePMF[i] * awayPMF[i] for i in range(maxGoals+1))
+
+        self.assertAlmostEqual(homeWin, expectedHomeWin, places=12)
+        self.assertAlmostEqual(awayWin, expectedAwayWin, places=12)
+        self.assertAlmostEqual(tie, expectedTie, places=12)
+
+    def test_outcome_probabilities_batch(self):
+        '''Test that a batch of games matches each game calculated on its own.'''
+        maxGoals = [5, 9, 7]
+        homeGoals = [2.5, 3.1, 0.8]
+        awayGoals = [2.9, 1.7, 4.2]
+
+        homeWin, awayWin, tie, homePMF, _ = outcomeProbabilities(maxGoals, homeGoals, awayGoals)
+        self.assertEqual(homePMF.shape, (3, 10))
+
+        for index, values in enumerate(zip(maxGoals, homeGoals, awayGoals)):
+            with self.subTest(f"Ensure game {index} matches", index=index):
+                single = createPredictions(*values)
+                self.assertAlmostEqual(homeWin[index], single[0], places=12)
+                self.assertAlmostEqual(awayWin[index], single[1], places=12)
+                self.assertAlmostEqual(tie[index], single[2], places=12)
+                self.assertEqual(homePMF[index, :values[0]+1].tolist(), single[3]["home"])
+                self.assertTrue(all(homePMF[index, values[0]+1:] == 0.0))
+
+    def test_skellam_probabilities(self):
+        '''Test that the Skellam probabilities are not truncated.'''
+        homeGoals = [2.5, 3.1]
+        awayGoals = [2.9, 1.7]
+
+        homeWin, awayWin, tie, homePMF, awayPMF = skellamProbabilities(
+            homeGoals, awayGoals, tailMass=1e-12
+        )
+        for index in range(len(homeGoals)):
+            self.assertAlmostEqual(homeWin[index] + awayWin[index] + tie[index], 1.0, places=12)
+            self.assertGreater(homePMF[index].sum(), 1.0 - 1e-12)
+            self.assertGreater(awayPMF[index].sum(), 1.0 - 1e-12)
+
+        # with a large number of goals the truncated values approach the analytic values
+        truncated = outcomeProbabilities(homePMF.shape[1] - 1, homeGoals, awayGoals)
+        for expected, actual in zip((homeWin, awayWin, tie), truncated[:3]):
+            self.assertTrue(all(abs(expected - actual) < 1e-9))
+
+    def test_season_strengths(self):
+        '''Test that the precomputed season end strengths match the schedule.'''
+        expected = SeasonStrengths.fromSchedule(self.jsonSchedule)
+        strengths = getSeasonStrengths(GOODSEASON)
+
+        self.assertEqual(strengths.scores, expected.scores)
+        self.assertEqual(strengths.averageGoals, expected.averageGoals)
+        self.assertEqual(strengths.maxGoals, expected.maxGoals)
+
+        homeTeamEvents, awayTeamEvents = parseSchedule(self.jsonSchedule)
+        self.assertEqual(strengths.averageGoals, calculateAvgGoals(homeTeamEvents))
+        self.assertEqual(strengths.scores, calculateScores(
+            list(set(homeTeamEvents) | set(awayTeamEvents)), homeTeamEvents, awayTeamEvents
+        ))
+
+        self.assertIsNone(getSeasonStrengths(1900))
+
+    def test_parse_season_events_cached(self):
+        '''Test that the parsed season matches the schedules and is cached.'''
+        parsedHomeTeamEvents, _ = parseSeasonEvents(TOPSEASON)
+        expectedHomeTeamEvents, _ = getSeasonEventsFromSchedules(
+            self.jsonScheduleTop, self.jsonSchedule
+        )
+
+        def _values(events):
+            return sorted(
+                (x.gameId, x.homeTeamWinPercent, x.awayTeamWinPercent, x.regulationTiePercent)
+                for games in events.values() for x in games
+            )
+
+        self.assertEqual(_values(parsedHomeTeamEvents), _values(expectedHomeTeamEvents))
+        self.assertIs(parseSeasonEvents(TOPSEASON)[0], parsedHomeTeamEvents)
@@ -0,0 +1,147 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import makedirs, remove
+from os.path import dirname, abspath, join, exists
+from json import loads, dumps
+from shutil import rmtree
+from nhl_model.dataset import newAPIFile
+from nhl_model.poisson import getSchedule
+from nhl_model.simulate import seasonPoints
+from nhl_model.schedules import (
+    GAME_DTYPE,
+    PERIOD_TYPES,
+    ScheduleArchive,
+    appendSeasonSchedule,
+    loadScheduleArchive,
+    loadSeasonSchedule,
+    packSchedules,
+    seasonScheduleFile,
+)
+
+
+_TEST_SCHEDULE_DIR = newAPIFile("1900-mock-schedules")
+_TEST_ARCHIVE_FILE = newAPIFile("1900-mock-schedules.npy")
+_TEST_INDEX_FILE = newAPIFile("1900-mock-schedules-index.json")
+_TEST_SEASON_SCHEDULE_DIR = newAPIFile("1900-mock-season-schedules")
+
+_SEASONS = (2005, 2006)
+
+# Number of the one goal games of 2005 that are marked as overtime losses
+_NUM_OVERTIME_LOSSES = 40
+
+
+def _scheduleFile(year):
+    currDir = dirname(abspath(__file__))
+    return join(dirname(currDir), "src", "nhl_model", "support", "schedules",
+                str(year), "schedule.json")
+
+
+class SchedulesTest(TestCase):
+    '''Test cases for the packed schedule archive and the season schedules.'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schedules = {}
+        for year in _SEASONS:
+            with open(_scheduleFile(year), "rb") as jsonFile:
+                cls.schedules[year] = loads(jsonFile.read())
+
+        # a game that has not been played yet
+        cls.schedules[2006][-1]["homeTeamGoalsActual"] = None
+        cls.schedules[2006][-1]["awayTeamGoalsActual"] = None
+
+        # the last period of the first one goal games of 2005 was overtime or a shootout
+        cls.overtimeLosers = {}
+        oneGoalGames = [x for x in cls.schedules[2005]
+                        if abs(x["homeTeamGoalsActual"] - x["awayTeamGoalsActual"]) == 1]
+        for index, game in enumerate(oneGoalGames):
+            game["lastPeriodType"] = "REG"
+            if index < _NUM_OVERTIME_LOSSES:
+                game["lastPeriodType"] = PERIOD_TYPES[2 + index % 2]
+                loser = game["homeTeamId"] if game["homeTeamGoalsActual"] < \
+                    game["awayTeamGoalsActual"] else game["awayTeamId"]
+                cls.overtimeLosers[loser] = cls.overtimeLosers.get(loser, 0) + 1
+
+        for year, schedule in cls.schedules.items():
+            makedirs(join(_TEST_SCHEDULE_DIR, str(year)), exist_ok=True)
+            with open(join(_TEST_SCHEDULE_DIR, str(year), "schedule.json"), "w") as jsonFile:
+                jsonFile.write(dumps(schedule))
+
+        cls.seasons = packSchedules(_TEST_SCHEDULE_DIR, _TEST_ARCHIVE_FILE, _TEST_INDEX_FILE)
+
+    @classmethod
+    def tearDownClass(cls):
+        rmtree(_TEST_SCHEDULE_DIR, ignore_errors=True)
+        rmtree(_TEST_SEASON_SCHEDULE_DIR, ignore_errors=True)
+        rmtree(dirname(seasonScheduleFile(1900)), ignore_errors=True)
+        for filename in (_TEST_ARCHIVE_FILE, _TEST_INDEX_FILE):
+            if exists(filename):
+                remove(filename)
+
+    def test_pack(self):
+        self.assertEqual(self.seasons, list(_SEASONS))
+
+        archive = ScheduleArchive(_TEST_ARCHIVE_FILE, _TEST_INDEX_FILE)
+        self.assertEqual(archive.seasons, list(_SEASONS))
+        self.assertEqual(archive.games.dtype, GAME_DTYPE)
+        self.assertEqual(len(archive.games), sum(len(x) for x in self.schedules.values()))
+
+        # each team is only stored once
+        self.assertEqual(len(archive.teams), len(set(archive.teams)))
+
+    def test_schedule(self):
+        archive = ScheduleArchive(_TEST_ARCHIVE_FILE, _TEST_INDEX_FILE)
+        for year, schedule in self.schedules.items():
+            with self.subTest(f"Ensure {year} matches the schedule file", year=year):
+                self.assertEqual(archive.schedule(year), schedule)
+
+        self.assertNotIn(2004, archive)
+        self.assertIsNone(archive.schedule(2004))
+        self.assertIsNone(archive.seasonGames(2004))
+
+    def test_overtime_losses(self):
+        archive = ScheduleArchive(_TEST_ARCHIVE_FILE, _TEST_INDEX_FILE)
+        schedule = archive.schedule(2005)
+        games = archive.seasonGames(2005)
+        self.assertEqual(int((games["lastPeriod"] >= 2).sum()), _NUM_OVERTIME_LOSSES)
+
+        # the loser of each overtime game receives a point
+        points = seasonPoints(schedule)
+        regulation = seasonPoints([
+            {k: v for k, v in x.items() if k != "lastPeriodType"} for x in schedule
+        ])
+        self.assertEqual(sum(points.values()) - sum(regulation.values()), _NUM_OVERTIME_LOSSES)
+        for teamId, teamPoints in points.items():
+            self.assertEqual(teamPoints - regulation[teamId], self.overtimeLosers.get(teamId, 0))
+
+    def test_season_games(self):
+        archive = ScheduleArchive(_TEST_ARCHIVE_FILE, _TEST_INDEX_FILE)
+        games = archive.seasonGames(2005)
+        self.assertEqual(games["gameId"].tolist(), [x["gameId"] for x in self.schedules[2005]])
+        self.assertEqual(
+            games["homeGoals"].tolist(), [x["homeTeamGoalsActual"] for x in self.schedules[2005]]
+        )
+
+    def test_load_missing_archive(self):
+        self.assertIsNone(loadScheduleArchive(newAPIFile("1900-missing.npy"), _TEST_INDEX_FILE))
+
+    def test_append_season_schedule(self):
+        schedule = self.schedules[2006]
+        self.assertIsNone(loadSeasonSchedule(2006, _TEST_SEASON_SCHEDULE_DIR))
+
+        # only the games that are not in the schedule are appended
+        self.assertEqual(appendSeasonSchedule(2006, schedule[:100], _TEST_SEASON_SCHEDULE_DIR), 100)
+        self.assertEqual(appendSeasonSchedule(2006, schedule[:200], _TEST_SEASON_SCHEDULE_DIR), 100)
+        self.assertEqual(loadSeasonSchedule(2006, _TEST_SEASON_SCHEDULE_DIR), schedule[:200])
+
+        # games without a result are skipped, the schedule is sorted by gameId
+        added = appendSeasonSchedule(2006, schedule[::-1], _TEST_SEASON_SCHEDULE_DIR)
+        self.assertEqual(added, len(schedule) - 201)
+        self.assertEqual(loadSeasonSchedule(2006, _TEST_SEASON_SCHEDULE_DIR), schedule[:-1])
+        self.assertEqual(appendSeasonSchedule(2006, schedule, _TEST_SEASON_SCHEDULE_DIR), 0)
+
+    def test_get_schedule_not_packaged(self):
+        self.assertIsNone(getSchedule(1900))
+        appendSeasonSchedule(1900, self.schedules[2005][:10])
+        self.assertEqual(getSchedule(1900), self.schedules[2005][:10])
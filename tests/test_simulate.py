@@ -0,0 +1,141 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase, mock
+import numpy as np
+from mock import MockResponse
+from nhl_model.poisson import getSchedule, skellamProbabilities
+from nhl_model.simulate import (
+    PLAYOFF_SPOTS,
+    SeasonModel,
+    createSeasonModel,
+    seasonConferences,
+    seasonPoints,
+    simulateSeason,
+)
+from nhl_model.snapshot import createSnapshot
+
+
+# Number of games of the 2022 schedule that are final in the mocked season schedule
+_NUM_PLAYED = 1000
+
+
+def _clubSchedule(game, final):
+    club = {"id": game["gameId"], "gameType": 2, "gameState": "OFF" if final else "FUT"}
+    for side in ("home", "away"):
+        club[f"{side}Team"] = {
+            "id": game[f"{side}TeamId"],
+            "abbrev": game[f"{side}TeamTriCode"],
+            "placeName": {"default": game[f"{side}TeamName"]},
+        }
+        if final:
+            club[f"{side}Team"]["score"] = game[f"{side}TeamGoalsActual"]
+    return club
+
+
+def mocked_requests_get(*args, **kwargs):
+    triCode = args[0].split("/")[-2]
+    games = [
+        _clubSchedule(game, index < _NUM_PLAYED) for index, game in enumerate(getSchedule(2022))
+        if triCode in (game["homeTeamTriCode"], game["awayTeamTriCode"])
+    ]
+    if not games:
+        return MockResponse(None, 404)
+    return MockResponse({"games": games}, 200)
+
+
+class SimulateTest(TestCase):
+    '''Test cases for the Monte Carlo season simulation.'''
+
+    def test_season_points(self):
+        games = [
+            {"homeTeamId": 1, "awayTeamId": 2, "homeTeamGoalsActual": 3, "awayTeamGoalsActual": 1},
+            {"homeTeamId": 2, "awayTeamId": 1, "homeTeamGoalsActual": 2, "awayTeamGoalsActual": 3,
+             "lastPeriodType": "OT"},
+            {"homeTeamId": 1, "awayTeamId": 3, "homeTeamGoalsActual": 2, "awayTeamGoalsActual": 2},
+            {"homeTeamId": 3, "awayTeamId": 2, "homeTeamGoalsActual": None,
+             "awayTeamGoalsActual": None},
+        ]
+        self.assertEqual(seasonPoints(games), {1: 5, 2: 1, 3: 1})
+
+    def test_season_conferences(self):
+        self.assertEqual(seasonConferences(2022, ["DET", "SEA"]), {"DET": "E", "SEA": "W"})
+        self.assertEqual(seasonConferences(2010, ["DET", "ATL"]), {"DET": "W", "ATL": "E"})
+        self.assertEqual(seasonConferences(2011, ["WPG"]), {"WPG": "E"})
+        with self.assertRaises(ValueError):
+            seasonConferences(1992, ["BOS"])
+
+    def test_outcome_thresholds(self):
+        model = SeasonModel([1, 2], ["AAA", "BBB"], ["E", "E"], [0, 0], [0, 1], [1, 0],
+                            [3.0, 2.0], [2.0, 0.0])
+        homeWin, awayWin, tie, _, _ = skellamProbabilities([3.0, 2.0], [2.0, 0.0])
+        total = homeWin + awayWin + tie
+        np.testing.assert_allclose(model.outcomeThresholds[0], homeWin / total)
+        np.testing.assert_allclose(model.outcomeThresholds[1], (homeWin + awayWin) / total)
+        np.testing.assert_allclose(
+            model.outcomeThresholds[2], (homeWin + awayWin + tie * np.array([0.6, 1.0])) / total
+        )
+        self.assertEqual(model.maxPoints, 4)
+
+    def test_completed_season(self):
+        # there are no remaining games, every simulation has the final standings
+        model = createSeasonModel(2006)
+        self.assertEqual(len(model.homeTeams), 0)
+
+        result = simulateSeason(model, 100, seed=1, workers=1, batchSize=30)
+        np.testing.assert_array_equal(result.meanPoints, model.currentPoints)
+        np.testing.assert_array_equal(result.pointsPercentile(10), model.currentPoints)
+        self.assertTrue(set(result.playoffOdds.tolist()) <= {0.0, 100.0})
+
+        self.assertIsNone(createSeasonModel(1900))
+
+    def test_simulate_season(self):
+        model = createSeasonModel(2022, numPlayed=1000)
+        self.assertEqual(model.numTeams, 32)
+        self.assertEqual(len(model.homeTeams), len(getSchedule(2022)) - 1000)
+
+        # the results are reproducible and do not depend on the number of workers
+        result = simulateSeason(model, 500, seed=7, workers=1, batchSize=200)
+        other = simulateSeason(model, 500, seed=7, workers=2, batchSize=200)
+        np.testing.assert_array_equal(result.pointsHistogram, other.pointsHistogram)
+        np.testing.assert_array_equal(result.rankHistogram, other.rankHistogram)
+        np.testing.assert_array_equal(result.playoffCounts, other.playoffCounts)
+
+        self.assertEqual(result.pointsHistogram.sum(axis=1).tolist(), [500] * 32)
+        self.assertEqual(result.rankHistogram.sum(axis=1).tolist(), [500] * 32)
+        self.assertTrue((result.meanPoints >= model.currentPoints).all())
+
+        # two conferences with the playoff spots filled in every simulation
+        self.assertEqual(set(model.conferences), {"E", "W"})
+        self.assertAlmostEqual(result.playoffOdds.sum(), 2 * PLAYOFF_SPOTS * 100.0)
+
+    def test_simulate_from_snapshot(self):
+        schedule = getSchedule(2022)
+        snapshot = createSnapshot(2022)
+        snapshot.update(schedule[:1000])
+
+        model = createSeasonModel(2022, snapshot=snapshot)
+        expected = createSeasonModel(2022, numPlayed=1000)
+        np.testing.assert_array_equal(model.currentPoints, expected.currentPoints)
+        np.testing.assert_array_equal(model.homeGoals, expected.homeGoals)
+
+    @mock.patch('nhl_model.schedules.get', side_effect=mocked_requests_get)
+    def test_simulate_unpackaged_season(self, mock_get):
+        # the schedule of a season that is not packaged only contains the final games
+        schedule = getSchedule(2022)
+        snapshot = createSnapshot(2022)
+        snapshot.update(schedule[:_NUM_PLAYED])
+
+        with mock.patch('nhl_model.simulate.getSchedule', return_value=schedule[:_NUM_PLAYED]):
+            # the remaining games are only pulled when requested
+            model = createSeasonModel(2023, snapshot=snapshot)
+            self.assertEqual(len(model.homeTeams), 0)
+            mock_get.assert_not_called()
+
+            model = createSeasonModel(2023, snapshot=snapshot, pullSchedule=True)
+
+        expected = createSeasonModel(2022, numPlayed=_NUM_PLAYED)
+        self.assertEqual(len(model.homeTeams), len(schedule) - _NUM_PLAYED)
+        np.testing.assert_array_equal(model.teamIds, expected.teamIds)
+        np.testing.assert_array_equal(model.currentPoints, expected.currentPoints)
+        np.testing.assert_array_equal(model.homeTeams, expected.homeTeams)
+        np.testing.assert_array_equal(model.homeGoals, expected.homeGoals)
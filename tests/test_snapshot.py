@@ -0,0 +1,131 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from json import loads
+from os import remove
+from os.path import abspath, dirname, exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from nhl_model.dataset import ingestBoxScores, newAPIFile
+from nhl_model.poisson import getSchedule, parseSeasonEvents
+from nhl_model.snapshot import (
+    PoissonSnapshot,
+    createSnapshot,
+    loadSnapshot,
+    updateSnapshot,
+)
+
+
+class SnapshotTest(TestCase):
+    '''Test cases for the incremental Poisson snapshot.'''
+
+    def test_predictions_match_season(self):
+        # the snapshot after the first games of the season predicts the next game
+        # the same as the parsed season
+        schedule = getSchedule(2006)
+        homeTeamEvents, _ = parseSeasonEvents(2006)
+        games = {x.gameId: x for events in homeTeamEvents.values() for x in events}
+
+        snapshot = createSnapshot(2006)
+        for numGames in (0, 1, 100, len(schedule) - 1):
+            snapshot.update(schedule[:numGames])
+            self.assertEqual(len(snapshot.gameIds), numGames)
+
+            game = games[schedule[numGames]["gameId"]]
+            prediction = snapshot.predict(game.homeTeamId, game.awayTeamId)
+            self.assertEqual(prediction["homeTeamGoalsPrediction"], game.homeTeamGoalsPrediction)
+            self.assertEqual(prediction["awayTeamGoalsPrediction"], game.awayTeamGoalsPrediction)
+            self.assertEqual(prediction["homeTeamWinPercent"], game.homeTeamWinPercent)
+            self.assertEqual(prediction["awayTeamWinPercent"], game.awayTeamWinPercent)
+            self.assertEqual(prediction["regulationTiePercent"], game.regulationTiePercent)
+
+        # games are only added once
+        self.assertEqual(snapshot.update(schedule), 1)
+        self.assertEqual(snapshot.update(schedule), 0)
+
+    def test_predict_by_tri_code(self):
+        snapshot = createSnapshot(2022)
+        self.assertEqual(snapshot.teamId("TOR"), 10)
+        self.assertEqual(snapshot.teamId("tor"), 10)
+        self.assertEqual(snapshot.teamId("10"), 10)
+        self.assertIsNone(snapshot.teamId("XXX"))
+
+        predictions = snapshot.predictGames([("TOR", "MTL"), (10, 8)])
+        self.assertEqual(predictions[0], predictions[1])
+        with self.assertRaises(ValueError):
+            snapshot.predict("XXX", "TOR")
+
+        self.assertIsNone(createSnapshot(1900))
+
+    def test_save_load(self):
+        filename = newAPIFile("1900-mock-snapshot.json")
+        snapshot = updateSnapshot(2006, getSchedule(2006)[:100], endDate="2007-04-08",
+                                  filename=filename)
+        loaded = loadSnapshot(2006, filename)
+        remove(filename)
+
+        self.assertEqual(loaded.json, snapshot.json)
+        self.assertEqual(loaded.asOf, "2007-04-08")
+        self.assertEqual(loaded.predict("TOR", "MTL"), snapshot.predict("TOR", "MTL"))
+        self.assertIsInstance(PoissonSnapshot.fromJson(snapshot.json), PoissonSnapshot)
+        self.assertIsNone(loadSnapshot(2006, filename))
+
+    def test_update_from_warehouse(self):
+        newFile = join(dirname(abspath(__file__)), "MockDataNew.json")
+        with open(newFile, "r") as jsonFile:
+            boxScores = loads(jsonFile.read())["boxScores"]
+
+        tmpDir = mkdtemp()
+        warehouseFile = join(tmpDir, "warehouse.db")
+        filename = join(tmpDir, "snapshot.json")
+        ingestBoxScores(boxScores, warehouseFile)
+
+        try:
+            snapshot = updateSnapshot(2022, endDate="2022-10-06", filename=filename,
+                                      warehouseFile=warehouseFile)
+            self.assertEqual(snapshot.gameIds, set())
+
+            snapshot = updateSnapshot(2022, filename=filename, warehouseFile=warehouseFile)
+            self.assertEqual(snapshot.gameIds, {2022020001})
+            self.assertEqual(snapshot.currentSeason.homeGoalsFor[18], 4)
+            self.assertTrue(exists(filename))
+        finally:
+            rmtree(tmpDir, ignore_errors=True)
+
+    def test_update_as_of(self):
+        filename = newAPIFile("1900-mock-snapshot.json")
+        snapshot = updateSnapshot(2006, [], endDate="2007-01-01", filename=filename)
+        self.assertEqual(snapshot.asOf, "2007-01-01")
+
+        # the snapshot does not move back to an earlier date
+        snapshot = updateSnapshot(2006, [], endDate="2006-12-01", filename=filename)
+        self.assertEqual(snapshot.asOf, "2007-01-01")
+        snapshot = updateSnapshot(2006, [], endDate="2007-02-01", filename=filename)
+        remove(filename)
+        self.assertEqual(snapshot.asOf, "2007-02-01")
+
+    def test_update_from_schedule_end_date(self):
+        newFile = join(dirname(abspath(__file__)), "MockDataNew.json")
+        with open(newFile, "r") as jsonFile:
+            boxScores = loads(jsonFile.read())["boxScores"]
+
+        tmpDir = mkdtemp()
+        warehouseFile = join(tmpDir, "warehouse.db")
+        filename = join(tmpDir, "snapshot.json")
+
+        try:
+            # the dates of the games are read from the warehouse
+            self.assertIsNone(updateSnapshot(2022, endDate="2022-10-07", fromSchedule=True,
+                                             filename=filename, warehouseFile=warehouseFile))
+            ingestBoxScores(boxScores, warehouseFile)
+
+            snapshot = updateSnapshot(2022, endDate="2022-10-06", fromSchedule=True,
+                                      filename=filename, warehouseFile=warehouseFile)
+            self.assertEqual(snapshot.gameIds, set())
+
+            snapshot = updateSnapshot(2022, endDate="2022-10-07", fromSchedule=True,
+                                      filename=filename, warehouseFile=warehouseFile)
+            self.assertEqual(snapshot.gameIds, {2022020001})
+            self.assertEqual(snapshot.asOf, "2022-10-07")
+        finally:
+            rmtree(tmpDir, ignore_errors=True)
@@ -0,0 +1,118 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os.path import dirname, abspath, join
+from json import loads
+from shutil import rmtree
+from tempfile import mkdtemp
+from nhl_model.dataset import ingestBoxScores, parseWarehouseRecordsNew, updateSeasonSchedule
+from nhl_model.warehouse import (
+    insertGames,
+    queryGameIds,
+    queryGamesByDate,
+    queryPlayerGames,
+    querySeasonSchedule,
+    queryTeamGames,
+)
+
+
+class WarehouseTests(TestCase):
+    '''Test cases for the warehouse of ingested games.'''
+
+    @classmethod
+    def setUpClass(cls):
+        '''Ingest the mock box scores into a temporary warehouse.'''
+        newFile = join(dirname(abspath(__file__)), "MockDataNew.json")
+        with open(newFile, "r") as jsonFile:
+            cls.boxScores = loads(jsonFile.read())["boxScores"]
+
+        cls.tmpDir = mkdtemp()
+        cls.filename = join(cls.tmpDir, "warehouse.db")
+        cls.numIngested = ingestBoxScores(cls.boxScores, cls.filename)
+
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        rmtree(cls.tmpDir, ignore_errors=True)
+        return super().tearDownClass()
+
+    def test_ingest_box_scores(self):
+        '''Games are only ingested once.'''
+        self.assertEqual(self.numIngested, 1)
+        self.assertEqual(queryGameIds(self.filename), {2022020001})
+        self.assertEqual(queryGameIds(self.filename, season=2021), set())
+        self.assertEqual(queryGameIds(self.filename, season=2022, endDate="2022-10-06"), set())
+        self.assertEqual(queryGameIds(self.filename, endDate="2022-10-07"), {2022020001})
+        self.assertEqual(ingestBoxScores(self.boxScores, self.filename), 0)
+
+    def test_parse_warehouse_records_not_final(self):
+        '''Games that are not complete are not parsed.'''
+        boxscore = dict(self.boxScores["1"])
+        boxscore["gameState"] = "FUT"
+        self.assertIsNone(parseWarehouseRecordsNew(boxscore))
+        self.assertIsNone(parseWarehouseRecordsNew({"message": "not found"}))
+
+    def test_query_season_schedule(self):
+        '''The season schedule matches the format of the schedule files, including the type
+        of the last period that is needed for the overtime loss points.'''
+        schedule = querySeasonSchedule(self.filename, 2022)
+        self.assertEqual(schedule, [{
+            "gameId": 2022020001,
+            "awayTeamId": 28,
+            "awayTeamName": "Sharks",
+            "awayTeamTriCode": "SJS",
+            "awayTeamGoalsActual": 1,
+            "homeTeamId": 18,
+            "homeTeamName": "Predators",
+            "homeTeamTriCode": "NSH",
+            "homeTeamGoalsActual": 4,
+            "lastPeriodType": "REG",
+        }])
+        self.assertEqual(querySeasonSchedule(self.filename, 2022, gameType=3), [])
+        self.assertEqual(querySeasonSchedule(self.filename, 2022, endDate="2022-10-07"), schedule)
+        self.assertEqual(querySeasonSchedule(self.filename, 2022, endDate="2022-10-06"), [])
+
+    def test_update_season_schedule(self):
+        '''Only the games that are not in the season schedule are appended.'''
+        filename = join(self.tmpDir, "warehouse-schedule.db")
+        scheduleDir = join(self.tmpDir, "schedules")
+
+        # the season of the game is not packaged
+        game, teams, _, _ = parseWarehouseRecordsNew(self.boxScores["1"])
+        insertGames(filename, [dict(game, season=2030)], teams, [], [])
+
+        self.assertEqual(updateSeasonSchedule(2030, filename, scheduleDir), 1)
+        self.assertEqual(updateSeasonSchedule(2030, filename, scheduleDir), 0)
+        self.assertEqual(
+            [x["gameId"] for x in querySeasonSchedule(filename, 2030)], [2022020001]
+        )
+
+        # packaged seasons and missing warehouses are skipped
+        self.assertEqual(updateSeasonSchedule(2022, self.filename, scheduleDir), 0)
+        self.assertEqual(
+            updateSeasonSchedule(2030, join(self.tmpDir, "missing.db"), scheduleDir), 0
+        )
+
+    def test_query_team_games(self):
+        '''Query the team games with the optional filters.'''
+        homeGames = queryTeamGames(self.filename, 18, season=2022, isHome=True, limit=10)
+        self.assertEqual(len(homeGames), 1)
+        self.assertEqual(homeGames[0]["goals"], 4)
+        self.assertEqual(homeGames[0]["goalsAgainst"], 1)
+        self.assertEqual(homeGames[0]["opponentId"], 28)
+        self.assertEqual(queryTeamGames(self.filename, 18, isHome=False), [])
+
+    def test_query_games_by_date(self):
+        games = queryGamesByDate(self.filename, "2022-10-07")
+        self.assertEqual([x["gameId"] for x in games], [2022020001])
+        self.assertEqual(queryGamesByDate(self.filename, "2022-10-08"), [])
+
+    def test_query_player_games(self):
+        '''Only players with time on ice are stored.'''
+        playerGames = queryPlayerGames(self.filename, teamId=18)
+        self.assertEqual(len([x for x in playerGames if x["position"] != "G"]), 18)
+        goalies = [x for x in playerGames if x["position"] == "G"]
+        self.assertEqual(len(goalies), 1)
+        self.assertEqual(goalies[0]["saves"], 30)
+        self.assertEqual(goalies[0]["shotsAgainst"], 31)
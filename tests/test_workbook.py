@@ -0,0 +1,64 @@
+# pylint: disable=invalid-name
+# pylint: disable=missing-function-docstring
+from unittest import TestCase
+from os import remove
+from os.path import dirname, abspath, join, exists
+import pandas as pd
+from nhl_model.dataset import newAPIFile
+from nhl_model.workbook import readDataset, ChunkedDatasetWriter
+
+
+class WorkbookTests(TestCase):
+    '''Test cases for reading and preparing the dataset workbooks.'''
+
+    def test_read_dataset_compact_dtypes(self):
+        '''Test that the dataset is read using the compact dtypes.'''
+        filename = join(dirname(abspath(__file__)), "mock_analysis.xlsx")
+        expectedDF = pd.read_excel(filename)
+        df = readDataset(filename)
+
+        self.assertEqual(list(expectedDF.columns), list(df.columns))
+        self.assertLess(df.memory_usage(deep=True).sum(),
+                        expectedDF.memory_usage(deep=True).sum() / 2)
+
+        for column in ("htTeamname", "htTricode", "atTeamname", "atTricode"):
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype)
+            self.assertEqual(expectedDF[column].tolist(), df[column].tolist())
+
+        self.assertEqual(df["htFaceoffwinpercentage"].dtype, "float32")
+        self.assertEqual(df["winner"].dtype, bool)
+        for column in ("htGoals", "htTeamid", "atShots"):
+            self.assertLessEqual(df[column].dtype.itemsize, 2)
+            self.assertEqual(expectedDF[column].tolist(), df[column].tolist())
+
+    def test_chunked_writer_missing_columns(self):
+        '''Test that columns missing from a later chunk are left empty.'''
+        filename = newAPIFile("1900-mock-chunked.xlsx")
+        writer = ChunkedDatasetWriter(filename)
+        writer.write(pd.DataFrame({"htGoals": [1, 2], "atGoals": [3, 4]}))
+        writer.write(pd.DataFrame({"htGoals": [5]}))
+        nullCounts = writer.close()
+
+        df = pd.read_excel(filename, index_col=0)
+        remove(filename)
+
+        self.assertEqual(list(df.columns), ["htGoals", "atGoals"])
+        self.assertEqual(df["htGoals"].tolist(), [1, 2, 5])
+        self.assertTrue(df["atGoals"].iloc[2:].isna().all())
+        self.assertEqual(nullCounts["atGoals"], 1)
+
+    def test_chunked_writer_unexpected_columns(self):
+        '''Test that a chunk with columns that are not in the header raises an error.'''
+        filename = newAPIFile("1900-mock-chunked.xlsx")
+        writer = ChunkedDatasetWriter(filename)
+        writer.write(pd.DataFrame({"htGoals": [1, 2]}))
+        with self.assertRaises(ValueError):
+            writer.write(pd.DataFrame({"htGoals": [5], "atGoals": [3]}))
+        self.assertFalse(exists(filename))
+
+        # the records written before the error are kept
+        writer.close()
+        df = pd.read_excel(filename, index_col=0)
+        remove(filename)
+        self.assertEqual(list(df.columns), ["htGoals"])
+        self.assertEqual(df["htGoals"].tolist(), [1, 2])